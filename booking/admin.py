@@ -1,10 +1,23 @@
+import time
+from datetime import date
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 
+from catalog.models import Hotel
+
+from .analytics import day_report, hotel_report, room_report
 from .models import (
+    ArchivedBooking,
     Booking,
+    BookingHold,
+    DailyRoomStat,
 )
 
 @admin.register(Booking)
@@ -21,6 +34,7 @@ class BookingAdmin(admin.ModelAdmin):
         'guest__email', 'guest__first_name', 'guest__last_name',
         'room__title'
     )
+    list_select_related = ('guest', 'room')
     readonly_fields = ('created_at', 'updated_at')
     date_hierarchy = 'check_in_date'
     list_per_page = 25
@@ -37,3 +51,124 @@ class BookingAdmin(admin.ModelAdmin):
             'fields': ('total_price',)
         }),
     )
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Ссылки на бронь остаются рабочими после переноса в архив
+        if (
+            str(object_id).isdigit()
+            and not Booking.objects.filter(pk=object_id).exists()
+            and ArchivedBooking.objects.filter(pk=object_id).exists()
+        ):
+            return HttpResponseRedirect(reverse(
+                'admin:booking_archivedbooking_change', args=(object_id,)))
+        return super().change_view(
+            request, object_id, form_url, extra_context)
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(admin.ModelAdmin):
+    """Архив бронирований: только просмотр, колонки как у BookingAdmin"""
+    list_display = (
+        'guest', 'room', 'check_in_date', 'check_out_date', 'guest_count',
+        'total_price'
+    )
+    list_select_related = ('guest', 'room')
+    list_filter = ('check_out_date', 'guest_count')
+    search_fields = BookingAdmin.search_fields + ('id',)
+    date_hierarchy = 'check_out_date'
+    list_per_page = 25
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BookingHold)
+class BookingHoldAdmin(admin.ModelAdmin):
+    """Удержания: просмотр и досрочное снятие"""
+    list_display = (
+        'guest', 'room', 'check_in_date', 'check_out_date', 'expires_at'
+    )
+    list_select_related = ('guest', 'room')
+    list_filter = ('expires_at',)
+    search_fields = ('guest__email', 'room__title')
+    list_per_page = 25
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRoomStat)
+class DailyRoomStatAdmin(admin.ModelAdmin):
+    """Сводка по дням: только просмотр и отчёт за год"""
+    list_display = ('date', 'room', 'nights', 'revenue', 'guests')
+    list_select_related = ('room',)
+    list_filter = ('date',)
+    date_hierarchy = 'date'
+    list_per_page = 50
+    show_full_result_count = False
+    change_list_template = 'admin/booking/dailyroomstat/change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                'report/',
+                self.admin_site.admin_view(self.report_view),
+                name='booking_dailyroomstat_report',
+            ),
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        """Загрузка, ADR и RevPAR по отелям, номерам и дням за год.
+
+        ?year= выбирает год, ?hotel= - отель для разбивки по номерам
+        и дням, ?format=json отдаёт данные в JSON. На HTML-странице
+        номера показываются только для выбранного отеля: таблица
+        на тысячу номеров рендерится дольше, чем считается.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        year = request.GET.get('year', '')
+        year = int(year) if year.isdigit() else date.today().year
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+        hotel = None
+        if request.GET.get('hotel', '').isdigit():
+            hotel = get_object_or_404(Hotel, pk=request.GET['hotel'])
+        as_json = request.GET.get('format') == 'json'
+        started = time.perf_counter()
+        report = {
+            'year': year,
+            'hotel': hotel.pk if hotel else None,
+            'hotels': hotel_report(start, end),
+            'rooms': (
+                room_report(start, end, hotel)
+                if as_json or hotel else []
+            ),
+            'days': day_report(start, end, hotel),
+        }
+        elapsed = time.perf_counter() - started
+        if as_json:
+            return JsonResponse(report)
+        return TemplateResponse(
+            request, 'admin/booking/dailyroomstat/report.html', {
+                **self.admin_site.each_context(request),
+                'title': f'Загрузка и выручка за {year} год',
+                'opts': self.model._meta,
+                'report': report,
+                'selected_hotel': hotel,
+                'elapsed_ms': elapsed * 1000,
+                'previous_year': year - 1,
+                'next_year': year + 1,
+            })
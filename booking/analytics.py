@@ -0,0 +1,265 @@
+"""Загрузка и выручка номеров по дням.
+
+Сводка DailyRoomStat хранит по строке на номер и проданную ночь.
+Она строится из рабочих и архивных броней: брони номера раскладываются
+на ночи не циклом по датам каждой брони, а разностными массивами
+(+значение в день заезда, -значение в день выезда) с одной префиксной
+суммой на номер, то есть за O(броней + дней).
+
+Сигналы броней пересчитывают только затронутый номер и даты, команда
+rollup_analytics перестраивает сводку целиком. Отчёты считают
+загрузку (occupancy), среднюю цену проданной ночи (ADR) и выручку
+на доступный номер (RevPAR); доступными считаются текущие номера
+отеля на каждый день периода.
+"""
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db import connections
+from django.db.models import Max, Min, Sum
+
+from catalog.models import Hotel, HotelRoom
+from hotel.constants import ANALYTICS_REBUILD_WINDOW_DAYS
+from hotel.sqlite_profile import immediate_atomic
+
+from .models import ArchivedBooking, Booking, DailyRoomStat
+
+
+BOOKING_FIELDS = (
+    'pk', 'room_id', 'check_in_date', 'check_out_date', 'total_price',
+    'guest_count',
+)
+ROLLUP_FIELDS = ('room', 'date', 'nights', 'revenue', 'guests')
+
+
+def rollup_rows(bookings, start, end):
+    """Строки сводки для ночей броней в интервале [start, end).
+
+    bookings - кортежи (room_id, check_in, check_out, total_price,
+    guest_count), строки - кортежи полей ROLLUP_FIELDS. Выручка брони
+    делится поровну между ночами, остаток от деления приходится
+    на первую ночь.
+    """
+    days = (end - start).days
+    arrays = {}
+    for room_id, check_in, check_out, total_price, guest_count in bookings:
+        nights = (check_out - check_in).days
+        first = max((check_in - start).days, 0)
+        last = min((check_out - start).days, days)
+        if nights <= 0 or first >= last:
+            continue
+        if room_id not in arrays:
+            arrays[room_id] = tuple([0] * (days + 1) for _ in range(3))
+        sold, revenue, guests = arrays[room_id]
+        rate, extra = divmod(total_price, nights)
+        sold[first] += 1
+        sold[last] -= 1
+        revenue[first] += rate
+        revenue[last] -= rate
+        guests[first] += guest_count
+        guests[last] -= guest_count
+        if extra and check_in >= start:
+            revenue[first] += extra
+            revenue[first + 1] -= extra
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    rows = []
+    for room_id, (sold, revenue, guests) in arrays.items():
+        rows.extend(
+            (room_id, day, nights, amount, people)
+            for day, nights, amount, people in zip(
+                dates, accumulate(sold), accumulate(revenue),
+                accumulate(guests))
+            if nights
+        )
+    return rows
+
+
+def insert_rows(rows, using='default', batch_size=5_000):
+    """Вставляет строки сводки через executemany.
+
+    Сотни тысяч строк без создания моделей и подготовки полей
+    bulk_create вставляются в несколько раз быстрее.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    adapt_date = connection.ops.adapt_datefield_value
+    meta = DailyRoomStat._meta
+    columns = ', '.join(
+        quote(meta.get_field(name).column) for name in ROLLUP_FIELDS)
+    placeholders = ', '.join(['%s'] * len(ROLLUP_FIELDS))
+    sql = (
+        f'INSERT INTO {quote(meta.db_table)} ({columns}) '
+        f'VALUES ({placeholders})'
+    )
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            cursor.executemany(sql, [
+                (room_id, adapt_date(day), nights, revenue, guests)
+                for room_id, day, nights, revenue, guests
+                in rows[offset:offset + batch_size]
+            ])
+
+
+def booked_stays(start, end, room_ids=None, using='default'):
+    """Брони, задевающие интервал, из рабочей таблицы и архива.
+
+    Во время переноса в архив бронь может оказаться в обеих таблицах,
+    поэтому они объединяются по pk.
+    """
+    stays = {}
+    for model in (ArchivedBooking, Booking):
+        queryset = model.objects.using(using).filter(
+            check_in_date__lt=end, check_out_date__gt=start)
+        if room_ids is not None:
+            queryset = queryset.filter(room_id__in=room_ids)
+        for pk, *stay in queryset.values_list(*BOOKING_FIELDS).iterator(
+                chunk_size=10_000):
+            stays[pk] = stay
+    return stays.values()
+
+
+def rebuild_rollup(start, end, room_ids=None, using='default',
+                   batch_size=5_000):
+    """Пересчитывает сводку за [start, end), возвращает число строк."""
+    rows = rollup_rows(booked_stays(start, end, room_ids, using), start, end)
+    with immediate_atomic(using=using):
+        stale = DailyRoomStat.objects.using(using).filter(
+            date__gte=start, date__lt=end)
+        if room_ids is not None:
+            stale = stale.filter(room_id__in=room_ids)
+        stale.delete()
+        insert_rows(rows, using, batch_size)
+    return len(rows)
+
+
+def rebuild_all(using='default', window=ANALYTICS_REBUILD_WINDOW_DAYS):
+    """Перестраивает сводку за все даты броней окнами по window дней.
+
+    Окна ограничивают размер массивов в памяти: номера * window.
+    """
+    spans = [
+        model.objects.using(using).aggregate(
+            start=Min('check_in_date'),
+            end=Max('check_out_date'),
+        )
+        for model in (ArchivedBooking, Booking)
+    ]
+    starts = [span['start'] for span in spans if span['start']]
+    if not starts:
+        DailyRoomStat.objects.using(using).all().delete()
+        return 0
+    start = min(starts)
+    end = max(span['end'] for span in spans if span['end'])
+    with immediate_atomic(using=using):
+        DailyRoomStat.objects.using(using).exclude(
+            date__gte=start, date__lt=end).delete()
+    created = 0
+    while start < end:
+        stop = min(start + timedelta(days=window), end)
+        created += rebuild_rollup(start, stop, using=using)
+        start = stop
+    return created
+
+
+def refresh_stays(stays, using='default'):
+    """Пересчитывает сводку по (room_id, check_in, check_out) броней."""
+    for room_id, check_in, check_out in set(stays):
+        if check_in < check_out:
+            rebuild_rollup(check_in, check_out, [room_id], using)
+
+
+def metrics(total, available):
+    """Показатели по (проданные ночи, выручка) и доступным ночам."""
+    sold, revenue = total or (0, 0)
+    return {
+        'sold': sold,
+        'available': available,
+        'revenue': revenue,
+        'occupancy': sold / available if available else 0.0,
+        'adr': revenue / sold if sold else 0.0,
+        'revpar': revenue / available if available else 0.0,
+    }
+
+
+def period_stats(start, end, hotel=None, using='default'):
+    stats = DailyRoomStat.objects.using(using).filter(
+        date__gte=start, date__lt=end)
+    rooms = HotelRoom.objects.using(using)
+    if hotel is not None:
+        stats = stats.filter(room__hotel=hotel)
+        rooms = rooms.filter(hotel=hotel)
+    return stats, rooms
+
+
+def room_totals(stats):
+    """{room_id: (проданные ночи, выручка)} одним GROUP BY по индексу."""
+    return {
+        room_id: (sold, revenue)
+        for room_id, sold, revenue in stats
+        .values('room')
+        .annotate(sold=Sum('nights'), revenue=Sum('revenue'))
+        .values_list('room', 'sold', 'revenue')
+        .order_by()
+    }
+
+
+def hotel_report(start, end, using='default'):
+    """Показатели каждого отеля за [start, end).
+
+    Итоги номеров складываются по связям номер-отель в Python: это
+    дешевле GROUP BY по соединению сводки с таблицей связей.
+    """
+    days = (end - start).days
+    stats, _ = period_stats(start, end, using=using)
+    totals = room_totals(stats)
+    hotels = {
+        pk: [title, 0, 0, 0]
+        for pk, title in Hotel.objects.using(using).values_list('pk', 'title')
+    }
+    links = HotelRoom.hotel.through.objects.using(using).values_list(
+        'hotel_id', 'hotelroom_id')
+    for hotel_id, room_id in links:
+        hotel = hotels[hotel_id]
+        sold, revenue = totals.get(room_id, (0, 0))
+        hotel[1] += 1
+        hotel[2] += sold
+        hotel[3] += revenue
+    return [
+        {'id': pk, 'title': title, 'rooms': rooms,
+         **metrics((sold, revenue), rooms * days)}
+        for pk, (title, rooms, sold, revenue) in hotels.items()
+    ]
+
+
+def room_report(start, end, hotel=None, using='default'):
+    """Показатели каждого номера (номеров отеля) за [start, end)."""
+    days = (end - start).days
+    stats, rooms = period_stats(start, end, hotel, using)
+    totals = room_totals(stats)
+    return [
+        {'id': pk, 'title': title, **metrics(totals.get(pk), days)}
+        for pk, title in rooms.values_list('pk', 'title')
+    ]
+
+
+def day_report(start, end, hotel=None, using='default'):
+    """Показатели по дням за [start, end), включая дни без продаж."""
+    stats, rooms = period_stats(start, end, hotel, using)
+    available = rooms.count()
+    totals = {
+        date: (sold, revenue)
+        for date, sold, revenue in stats
+        .values('date')
+        .annotate(sold=Sum('nights'), revenue=Sum('revenue'))
+        .values_list('date', 'sold', 'revenue')
+        .order_by()
+    }
+    return [
+        {'date': date,
+         **metrics(totals.get(date), available)}
+        for date in (
+            start + timedelta(days=offset)
+            for offset in range((end - start).days)
+        )
+    ]
+
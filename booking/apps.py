@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class BookingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'booking'
+
+    def ready(self):
+        from hotel.sqlite_profile import apply_sqlite_profile
+
+        from . import signals  # noqa: F401
+
+        connection_created.connect(
+            apply_sqlite_profile, dispatch_uid='hotel.sqlite_profile')
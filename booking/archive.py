@@ -0,0 +1,50 @@
+"""Перенос завершённых бронирований в архивную таблицу.
+
+Рабочая таблица Booking хранит только текущие и недавние брони, поэтому
+проверки доступности, админка и профиль не читают всю историю.
+Архивные брони читаются вместе с рабочими через MergedCursorPaginator.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from hotel.sqlite_profile import immediate_atomic
+
+from .models import ArchivedBooking, Booking, RoomNight
+from .signals import stay, stays_changed
+
+
+def archive_cutoff(days=None):
+    """Дата, раньше которой выехавшие брони уходят в архив."""
+    if days is None:
+        days = settings.BOOKING_ARCHIVE_RETENTION_DAYS
+    return timezone.now().date() - timedelta(days=days)
+
+
+def archive_bookings(before, batch_size=1_000, using='default'):
+    """Переносит брони с выездом раньше before пачками, возвращает число.
+
+    Каждая пачка переносится в своей транзакции: копия в архив
+    и удаление из рабочей таблицы вместе с ночами реестра. Сигналы
+    post_delete при переносе не отправляются: сводка от него не
+    меняется, а календари пересчитываются одной задачей на пачку.
+    """
+    moved = 0
+    while True:
+        with immediate_atomic(using=using):
+            batch = list(
+                Booking.objects.using(using)
+                .select_for_update()
+                .filter(check_out_date__lt=before)
+                .order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return moved
+            ArchivedBooking.objects.using(using).bulk_create(
+                ArchivedBooking.from_booking(booking) for booking in batch)
+            pks = [booking.pk for booking in batch]
+            RoomNight.objects.using(using).filter(booking_id__in=pks).delete()
+            Booking.objects.using(using).filter(pk__in=pks)._raw_delete(using)
+            stays_changed([stay(booking) for booking in batch], using)
+        moved += len(batch)
@@ -0,0 +1,153 @@
+"""Календарь занятости номеров для выбора дат.
+
+Занятые ночи номера за месяц хранятся одним целым (RoomCalendarMonth):
+бит d - 1 - ночь на d-е число. Полгода календаря номера - шесть чисел,
+поэтому ответ для страницы бронирования занимает десятки байт, а для
+сотни номеров - несколько килобайт.
+
+Маски пересчитываются по реестру RoomNight для месяцев изменённой
+брони после коммита и лежат в кеше. Календарь - подсказка для формы:
+окончательную проверку пересечений по-прежнему делает реестр.
+Удержания BookingHold живут минуты и в календарь не входят: о чужом
+удержании форма узнаёт при попытке удержать те же даты.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.core.cache import cache
+
+from hotel.constants import CALENDAR_CACHE_TIMEOUT
+from hotel.sqlite_profile import immediate_atomic
+
+from .models import RoomCalendarMonth, RoomNight
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def month_range(start, count):
+    return [add_months(start, offset) for offset in range(count)]
+
+
+def calendar_key(room_id, month):
+    return f'booking:calendar:{room_id}:{month:%Y-%m}'
+
+
+def booked_masks(room_ids=None, start=None, end=None, using='default'):
+    """{(room_id, месяц): маска} по реестру ночей за [start, end)."""
+    nights = RoomNight.objects.using(using).filter(booking__isnull=False)
+    if room_ids is not None:
+        nights = nights.filter(room_id__in=room_ids)
+    if start is not None:
+        nights = nights.filter(date__gte=start)
+    if end is not None:
+        nights = nights.filter(date__lt=end)
+    masks = defaultdict(int)
+    for room_id, night in nights.values_list('room_id', 'date').iterator(
+            chunk_size=10_000):
+        masks[room_id, month_start(night)] |= 1 << (night.day - 1)
+    return masks
+
+
+def save_masks(masks, pairs, using='default'):
+    """Записывает маски пар (номер, месяц) и кладёт их в кеш."""
+    zero = [pair for pair in pairs if not masks.get(pair)]
+    with immediate_atomic(using=using):
+        for room_id, month in zero:
+            RoomCalendarMonth.objects.using(using).filter(
+                room_id=room_id, month=month).delete()
+        RoomCalendarMonth.objects.using(using).bulk_create(
+            [
+                RoomCalendarMonth(room_id=room_id, month=month, booked=bits)
+                for (room_id, month), bits in masks.items()
+                if (room_id, month) in pairs and bits
+            ],
+            update_conflicts=True,
+            unique_fields=('room', 'month'),
+            update_fields=('booked',),
+        )
+    cache.set_many(
+        {
+            calendar_key(room_id, month): masks.get((room_id, month), 0)
+            for room_id, month in pairs
+        },
+        CALENDAR_CACHE_TIMEOUT,
+    )
+
+
+def refresh_calendars(stays, using='default'):
+    """Пересчитывает месяцы (room_id, check_in, check_out) броней."""
+    months = defaultdict(set)
+    for room_id, check_in, check_out in stays:
+        if check_in < check_out:
+            months[room_id].update(month_range(
+                month_start(check_in),
+                (check_out.year - check_in.year) * 12
+                + check_out.month - check_in.month + 1,
+            ))
+    for room_id, room_months in months.items():
+        first, last = min(room_months), max(room_months)
+        masks = booked_masks(
+            [room_id], first, add_months(last, 1), using)
+        save_masks(
+            masks, {(room_id, month) for month in room_months}, using)
+
+
+def rebuild_calendars(using='default'):
+    """Строит маски всех номеров заново, возвращает число месяцев."""
+    stale = set(
+        RoomCalendarMonth.objects.using(using)
+        .values_list('room_id', 'month'))
+    masks = booked_masks(using=using)
+    with immediate_atomic(using=using):
+        RoomCalendarMonth.objects.using(using).all().delete()
+        RoomCalendarMonth.objects.using(using).bulk_create(
+            (
+                RoomCalendarMonth(room_id=room_id, month=month, booked=bits)
+                for (room_id, month), bits in masks.items()
+            ),
+            batch_size=5_000,
+        )
+    cache.delete_many([
+        calendar_key(room_id, month) for room_id, month in stale | set(masks)
+    ])
+    return len(masks)
+
+
+def get_calendars(room_ids, start, count, using='default'):
+    """{room_id: [маска на каждый из count месяцев от start]}.
+
+    Маски читаются из кеша одним get_many, промахи - одним запросом.
+    """
+    months = month_range(start, count)
+    keys = {
+        (room_id, month): calendar_key(room_id, month)
+        for room_id in room_ids
+        for month in months
+    }
+    found = cache.get_many(keys.values())
+    missing = [pair for pair, key in keys.items() if key not in found]
+    if missing:
+        stored = dict(
+            ((room_id, month), bits)
+            for room_id, month, bits in RoomCalendarMonth.objects.using(using)
+            .filter(
+                room_id__in={room_id for room_id, _ in missing},
+                month__gte=months[0],
+                month__lte=months[-1],
+            )
+            .values_list('room_id', 'month', 'booked')
+        )
+        fresh = {keys[pair]: stored.get(pair, 0) for pair in missing}
+        cache.set_many(fresh, CALENDAR_CACHE_TIMEOUT)
+        found.update(fresh)
+    return {
+        room_id: [found[keys[room_id, month]] for month in months]
+        for room_id in room_ids
+    }
@@ -4,10 +4,22 @@ from django import forms
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
+from catalog.pricing import quote_stay
+from hotel.constants import IDEMPOTENCY_KEY_MAX_LENGTH
+
 from .models import Booking, HotelRoom
 
 
 class BookingCreateForm(forms.ModelForm):
+    # Ключ выдаётся при показе формы, токен удержания - при выборе дат.
+    # Оба выводятся шаблоном отдельно от кешируемой разметки crispy
+    idempotency_key = forms.CharField(
+        widget=forms.HiddenInput,
+        required=False,
+        max_length=IDEMPOTENCY_KEY_MAX_LENGTH,
+    )
+    hold = forms.UUIDField(widget=forms.HiddenInput, required=False)
+
     class Meta:
         model = Booking
         fields = [
@@ -32,6 +44,19 @@ class BookingCreateForm(forms.ModelForm):
             ),
         }
 
+    # Настройка crispy forms: один helper на класс, при рендеринге
+    # он не изменяется
+    helper = FormHelper()
+    helper.layout = Layout(
+        HTML('<div class="booking-form-title">Бронирование номера</div>'),
+        Field('check_in_date', css_class='form-field'),
+        Field('check_out_date', css_class='form-field'),
+        Field('guest_count', css_class='form-field'),
+        ButtonHolder(
+            Submit('submit', 'Забронировать', css_class='btn-book-submit')
+        )
+    )
+
     def __init__(self, *args, **kwargs):
         self.room = kwargs.pop('room', None)
         self.guest = kwargs.pop('guest', None)
@@ -41,18 +66,6 @@ class BookingCreateForm(forms.ModelForm):
         self.fields["check_in_date"].widget.attrs.setdefault("min", today)
         self.fields["check_out_date"].widget.attrs.setdefault("min", today)
 
-        # Настройка crispy forms
-        self.helper = FormHelper()
-        self.helper.layout = Layout(
-            HTML('<div class="booking-form-title">Бронирование номера</div>'),
-            Field('check_in_date', css_class='form-field'),
-            Field('check_out_date', css_class='form-field'),
-            Field('guest_count', css_class='form-field'),
-            ButtonHolder(
-                Submit('submit', 'Забронировать', css_class='btn-book-submit')
-            )
-        )
-
     def clean(self):
         cleaned_data = super().clean()
         if self.room and 'guest_count' in cleaned_data:
@@ -61,4 +74,15 @@ class BookingCreateForm(forms.ModelForm):
                                'Максимальное количество гостей: '
                                f'{self.room.max_number_of_guests}'
                                )
+        check_in = cleaned_data.get('check_in_date')
+        check_out = cleaned_data.get('check_out_date')
+        if self.room and check_in and check_out and check_in < check_out:
+            # Тот же расчёт, что в create_booking(), берётся из кеша
+            self.quote = quote_stay(self.room, check_in, check_out)
+            if not self.quote.allowed:
+                self.add_error(
+                    'check_out_date',
+                    'Минимальное число ночей при заезде в эту дату: '
+                    f'{self.quote.min_stay}'
+                )
         return cleaned_data
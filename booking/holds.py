@@ -0,0 +1,106 @@
+"""Удержания номеров: учёт конверсии и уборка истёкших.
+
+Удержание берётся, когда гость выбрал даты на странице бронирования,
+и снимается при создании брони. Ночи истёкшего удержания освобождает
+первая же запись на них, а строки удержаний пачками удаляет
+sweep_expired_holds (команда sweep_booking_holds).
+
+Доля конверсии - booking_hold_conversions_total{result="converted"}
+к booking_holds_total{result="taken"}. Отставание уборки считается
+по БД в момент выгрузки /metrics: уборщик работает отдельным процессом,
+и его счётчики в процесс сайта не попадают.
+"""
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from hotel.constants import BOOKING_HOLD_SWEEP_BATCH
+from hotel.metrics import registry
+from hotel.sqlite_profile import immediate_atomic
+
+from .models import BookingHold
+
+
+HOLDS = registry.counter(
+    'booking_holds_total', 'Попытки удержать номер по результату.',
+    ('result',),
+)
+HOLD_CONVERSIONS = registry.counter(
+    'booking_hold_conversions_total',
+    'Созданные брони по состоянию удержания гостя.',
+    ('result',),
+)
+
+
+def hold_result(hold, booking):
+    """Исход удержания hold для брони booking."""
+    if hold is None:
+        return 'missing'
+    if not hold.is_active:
+        return 'expired'
+    if (hold.check_in_date, hold.check_out_date) != (
+            booking.check_in_date, booking.check_out_date):
+        return 'changed'
+    return 'converted'
+
+
+def release_hold(booking, token, using='default'):
+    """Снимает удержание гостя перед записью брони, возвращает исход."""
+    hold = (
+        BookingHold.objects.using(using)
+        .filter(
+            token=token, guest_id=booking.guest_id, room_id=booking.room_id)
+        .first()
+    )
+    result = hold_result(hold, booking)
+    if hold is not None:
+        hold.delete()
+    return result
+
+
+def sweep_expired_holds(now=None, batch_size=BOOKING_HOLD_SWEEP_BATCH,
+                        using='default'):
+    """Удаляет истёкшие удержания пачками, возвращает их число.
+
+    Каждая пачка удаляется в своей короткой транзакции, чтобы уборка
+    не задерживала бронирования.
+    """
+    now = now or timezone.now()
+    swept = 0
+    while True:
+        with immediate_atomic(using=using):
+            batch = list(
+                BookingHold.objects.using(using).expired(now)
+                .order_by('expires_at')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                return swept
+            BookingHold.objects.using(using).filter(pk__in=batch).delete()
+        swept += len(batch)
+
+
+def sweep_lag(now=None, using='default'):
+    """(число истёкших неубранных удержаний, секунд с самого старого)."""
+    now = now or timezone.now()
+    stats = BookingHold.objects.using(using).expired(now).aggregate(
+        pending=Count('pk'), oldest=Min('expires_at'))
+    if not stats['pending']:
+        return 0, 0.0
+    return stats['pending'], (now - stats['oldest']).total_seconds()
+
+
+def hold_metrics():
+    """Отставание уборки удержаний для /metrics."""
+    pending, lag = sweep_lag()
+    return [
+        '# HELP booking_hold_sweep_pending Истёкшие неубранные удержания.',
+        '# TYPE booking_hold_sweep_pending gauge',
+        f'booking_hold_sweep_pending {pending}',
+        '# HELP booking_hold_sweep_lag_seconds '
+        'Возраст самого старого истёкшего удержания.',
+        '# TYPE booking_hold_sweep_lag_seconds gauge',
+        f'booking_hold_sweep_lag_seconds {lag}',
+    ]
+
+
+registry.add_collector(hold_metrics, cached=True)
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking.archive import archive_bookings, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит бронирования, выезд по которым был раньше окна '
+        'хранения, в архивную таблицу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Окно хранения в днях, по умолчанию '
+                 'BOOKING_ARCHIVE_RETENTION_DAYS.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1_000)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять каждые N секунд вместо однократного запуска.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            before = archive_cutoff(options['days'])
+            started = time.perf_counter()
+            moved = archive_bookings(before, options['batch_size'])
+            self.stdout.write(
+                f'В архив перенесено броней с выездом до {before}: {moved} '
+                f'за {time.perf_counter() - started:.1f} с'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
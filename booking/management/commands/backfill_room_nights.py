@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from booking.models import Booking, RoomNight
+
+
+class Command(BaseCommand):
+    help = 'Заполняет реестр ночей RoomNight по существующим бронированиям.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1_000)
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Очистить реестр и построить его заново.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            # Ночи удержаний принадлежат не броням, их не трогаем
+            RoomNight.objects.filter(booking__isnull=False).delete()
+        bookings = (
+            Booking.objects
+            .filter(room_nights__isnull=True)
+            .only('id', 'room_id', 'check_in_date', 'check_out_date')
+            .order_by('pk')
+        )
+        created = 0
+        conflicts = []
+        last_pk = 0
+        # Пачки выбираются по ключу, а не курсором: реестр меняется
+        # в процессе обхода
+        while True:
+            batch = list(
+                bookings.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            created += self.backfill(batch, conflicts)
+            last_pk = batch[-1].pk
+        self.stdout.write(f'Записано ночей: {created}')
+        for booking in conflicts:
+            self.stderr.write(
+                f'Бронирование {booking.pk} пересекается с другим: '
+                f'номер {booking.room_id}, '
+                f'{booking.check_in_date} - {booking.check_out_date}'
+            )
+
+    def backfill(self, batch, conflicts):
+        """Пишет пачку одним INSERT, при конфликте - по одной брони."""
+        try:
+            with transaction.atomic():
+                return len(RoomNight.objects.bulk_create(
+                    self.nights(batch)))
+        except IntegrityError:
+            pass
+        created = 0
+        for booking in batch:
+            try:
+                with transaction.atomic():
+                    created += len(RoomNight.objects.bulk_create(
+                        self.nights([booking])))
+            except IntegrityError:
+                conflicts.append(booking)
+        return created
+
+    @staticmethod
+    def nights(batch):
+        return [
+            RoomNight(room_id=booking.room_id, booking=booking, date=date)
+            for booking in batch
+            for date in booking.stay_dates()
+        ]
@@ -0,0 +1,88 @@
+import json
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from booking.analytics import (
+    day_report,
+    hotel_report,
+    rebuild_all,
+    rebuild_rollup,
+    room_report,
+)
+from catalog.models import Hotel
+
+
+REPORTS = {
+    'hotels': hotel_report,
+    'rooms': room_report,
+    'days': day_report,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает дневную сводку загрузки и выручки номеров '
+        'и выводит отчёт: загрузка, ADR и RevPAR по отелям, номерам '
+        'или дням за год.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Перестроить сводку: за --start/--end или за все даты.',
+        )
+        parser.add_argument('--start', type=date.fromisoformat)
+        parser.add_argument('--end', type=date.fromisoformat)
+        parser.add_argument(
+            '--report', choices=tuple(REPORTS), default=None,
+            help='Вывести отчёт за --year в JSON.',
+        )
+        parser.add_argument('--year', type=int, default=date.today().year)
+        parser.add_argument(
+            '--hotel', type=int, default=None,
+            help='id отеля для отчётов по номерам и дням.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.rebuild(options['start'], options['end'])
+        if options['report']:
+            self.report(options)
+
+    def rebuild(self, start, end):
+        started = time.perf_counter()
+        if start is None and end is None:
+            created = rebuild_all()
+        elif start is None or end is None or start >= end:
+            raise CommandError('Укажите --start раньше --end или ни одного.')
+        else:
+            created = rebuild_rollup(start, end)
+        self.stdout.write(
+            f'Строк сводки: {created} '
+            f'за {time.perf_counter() - started:.2f} с'
+        )
+
+    def report(self, options):
+        year = options['year']
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+        build = REPORTS[options['report']]
+        started = time.perf_counter()
+        if build is hotel_report:
+            rows = build(start, end)
+        else:
+            hotel = None
+            if options['hotel'] is not None:
+                hotel = Hotel.objects.filter(pk=options['hotel']).first()
+                if hotel is None:
+                    raise CommandError(f'Нет отеля {options["hotel"]}')
+            rows = build(start, end, hotel)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(json.dumps(
+            rows, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+        self.stderr.write(
+            f'Отчёт {options["report"]} за {year}: {len(rows)} строк '
+            f'за {elapsed * 1000:.0f} мс'
+        )
@@ -0,0 +1,203 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import HotelRoom
+from hotel.benchmarks import Rollback, percentile
+from hotel.queries import QueryRecorder
+
+
+User = get_user_model()
+
+SCENARIOS = (
+    'browse_list',
+    'room_detail',
+    'search_availability',
+    'create_booking',
+    'open_profile',
+)
+
+
+def find_regressions(results, baseline, tolerance):
+    """Сценарии, где p95 или число запросов хуже сохранённой базы."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        limit = previous['p95'] * (1 + tolerance)
+        if current['p95'] > limit:
+            regressions.append(
+                f"{name}: p95 {current['p95']:.1f} мс > "
+                f"{limit:.1f} мс (база {previous['p95']:.1f} мс)"
+            )
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f"{name}: запросов {current['queries']} > "
+                f"{previous['queries']}"
+            )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет сценарии через тестовый клиент Django и выводит '
+        'p50/p95/p99 и число SQL-запросов. С --baseline падает при '
+        'регрессии. Данные готовит команда seed_data; изменения, '
+        'сделанные сценариями, откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Сценарий для запуска, можно несколько раз. '
+                 'По умолчанию все.',
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--cold-cache', action='store_true',
+            help='Очищать кеш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON с базовыми результатами для проверки регрессий.',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            help='Сохранить результаты в JSON как новую базу.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 относительно базы, доля.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.today = timezone.now().date()
+        self.rooms = list(
+            HotelRoom.objects.order_by('pk').values_list('pk', 'slug'))
+        guest_id = (
+            User.objects.annotate(booking_count=Count('bookings'))
+            .order_by('-booking_count').values_list('pk', flat=True).first()
+        )
+        if not self.rooms or guest_id is None:
+            raise CommandError(
+                'Нет данных для замеров, сначала запустите seed_data.')
+        self.guest = User.objects.get(pk=guest_id)
+        results = {}
+        # Тестовый клиент ходит на хост testserver; сценарии от одного
+        # пользователя не должны упираться в контроль допуска
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        try:
+            with override_settings(ALLOWED_HOSTS=hosts, ADMISSION_LIMITS={}), \
+                    transaction.atomic():
+                for name in options['scenario'] or SCENARIOS:
+                    results[name] = self.run_scenario(name, options)
+                raise Rollback
+        except Rollback:
+            pass
+        self.report(results)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(f"База сохранена в {options['save_baseline']}")
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = find_regressions(
+                results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'Регрессия производительности:\n' + '\n'.join(regressions))
+            self.stdout.write('Регрессий относительно базы нет')
+
+    def run_scenario(self, name, options):
+        client = Client()
+        client.force_login(self.guest)
+        scenario = getattr(self, f'scenario_{name}')
+        timings = []
+        queries = 0
+        errors = 0
+        for iteration in range(options['warmup'] + options['iterations']):
+            if options['cold_cache']:
+                cache.clear()
+            recorder = QueryRecorder()
+            with recorder.record():
+                started = time.perf_counter()
+                response = scenario(client)
+                elapsed = time.perf_counter() - started
+            if iteration < options['warmup']:
+                continue
+            timings.append(elapsed * 1000)
+            queries = max(queries, len(recorder))
+            errors += response.status_code >= 400
+        timings.sort()
+        return {
+            'samples': len(timings),
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'p99': percentile(timings, 99),
+            'queries': queries,
+            'errors': errors,
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'сценарий':<22}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}"
+            f"{'SQL':>6}{'ошибки':>8}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<22}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                f"{result['p99']:>10.1f}{result['queries']:>6}"
+                f"{result['errors']:>8}"
+            )
+
+    def random_slug(self):
+        return self.random.choice(self.rooms)[1]
+
+    def scenario_browse_list(self, client):
+        return client.get(reverse('rooms'))
+
+    def scenario_room_detail(self, client):
+        return client.get(
+            reverse('room', kwargs={'slug': self.random_slug()}))
+
+    def scenario_search_availability(self, client):
+        check_in = self.today + timedelta(days=self.random.randint(1, 60))
+        return client.get(reverse('rooms'), {
+            'check_in': check_in,
+            'check_out': check_in + timedelta(
+                days=self.random.randint(1, 10)),
+            'guests': self.random.randint(1, 3),
+        })
+
+    def scenario_create_booking(self, client):
+        # Даты далеко в будущем, чтобы сценарий мерил создание, а не
+        # в основном отказы по конфликту
+        check_in = self.today + timedelta(days=self.random.randint(400, 4000))
+        return client.post(
+            reverse('create_booking', kwargs={'slug': self.random_slug()}),
+            {
+                'check_in_date': check_in,
+                'check_out_date': check_in + timedelta(
+                    days=self.random.randint(1, 7)),
+                'guest_count': 1,
+            },
+        )
+
+    def scenario_open_profile(self, client):
+        return client.get(reverse('profile'))
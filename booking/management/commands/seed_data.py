@@ -0,0 +1,213 @@
+import random
+import secrets
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from booking.analytics import rebuild_all
+from booking.availability import rebuild_calendars
+from booking.models import Booking, RoomNight
+from catalog.cache import HOTEL_LIST_VERSION, ROOM_LIST_VERSION, bump_versions
+from catalog.facets import invalidate_facet_index
+from catalog.models import Hotel, HotelRoom, RoomRate
+from catalog.pricing import nightly_prices
+from catalog.search import get_search_backend
+
+
+User = get_user_model()
+
+# Объёмы при масштабе 1
+HOTELS = 10
+ROOMS = 100
+PROFILES = 200
+BOOKINGS = 2_000
+
+CITIES = {
+    'RU': ('Москва', 'Санкт-Петербург', 'Казань', 'Сочи', 'Калининград'),
+    'USA': ('New York', 'Chicago', 'Boston', 'Miami', 'Seattle'),
+}
+ROOM_KINDS = ('Стандарт', 'Комфорт', 'Полулюкс', 'Люкс', 'Семейный')
+SEED_PASSWORD = 'seed-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими отелями, номерами, пользователями '
+        'и бронированиями. Объём задаётся множителем --scale.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help=(
+                f'Множитель объёма: при 1 - {HOTELS} отелей, {ROOMS} '
+                f'номеров, {PROFILES} пользователей, {BOOKINGS} броней.'
+            ),
+        )
+        parser.add_argument('--batch-size', type=int, default=2_000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Метка прогона делает названия уникальными при повторном запуске
+        self.run = secrets.token_hex(3)
+        started = time.perf_counter()
+        with transaction.atomic():
+            hotels = self.seed_hotels(max(int(HOTELS * scale), 1))
+            rooms = self.seed_rooms(max(int(ROOMS * scale), 1), hotels)
+            rates = self.seed_rates(rooms)
+            guests = self.seed_profiles(max(int(PROFILES * scale), 1))
+            bookings, nights = self.seed_bookings(
+                max(int(BOOKINGS * scale), 1), rooms, guests)
+        # bulk_create не отправляет сигналы, поэтому индексы и кеш
+        # каталога, календари и сводка аналитики обновляются явно
+        get_search_backend().rebuild()
+        invalidate_facet_index()
+        bump_versions([ROOM_LIST_VERSION, HOTEL_LIST_VERSION])
+        rebuild_all()
+        rebuild_calendars()
+        self.stdout.write(
+            f'Создано отелей: {len(hotels)}, номеров: {len(rooms)}, '
+            f'тарифов: {rates}, '
+            f'пользователей: {len(guests)}, броней: {bookings}, '
+            f'ночей: {nights} за {time.perf_counter() - started:.1f} с'
+        )
+
+    def seed_hotels(self, count):
+        hotels = []
+        for number in range(count):
+            country = self.random.choice(tuple(CITIES))
+            hotels.append(Hotel(
+                title=f'seed-{self.run}-hotel-{number}',
+                country=country,
+                city=self.random.choice(CITIES[country]),
+            ))
+        return Hotel.objects.bulk_create(hotels, batch_size=self.batch_size)
+
+    def seed_rooms(self, count, hotels):
+        rooms = HotelRoom.objects.bulk_create(
+            (
+                HotelRoom(
+                    title=f'{ROOM_KINDS[number % len(ROOM_KINDS)]} '
+                          f'{self.run}-{number}',
+                    slug=f'seed-{self.run}-room-{number}',
+                    max_number_of_guests=self.random.randint(1, 5),
+                    description=(
+                        f'{ROOM_KINDS[number % len(ROOM_KINDS)]} номер '
+                        f'с видом на город, вариант {number}'
+                    ),
+                    price=self.random.randrange(1_000, 20_000, 100),
+                    main_img=f'seed-{self.run}-room-{number}/room.jpg',
+                )
+                for number in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        through = HotelRoom.hotel.through
+        through.objects.bulk_create(
+            (
+                through(hotelroom_id=room.pk, hotel_id=hotel.pk)
+                for room in rooms
+                for hotel in self.random.sample(
+                    hotels, min(len(hotels), self.random.randint(1, 2)))
+            ),
+            batch_size=self.batch_size,
+        )
+        return rooms
+
+    def seed_rates(self, rooms):
+        """Летний сезон с ценой выходных и праздники с минимальным сроком."""
+        year = timezone.now().year
+        rates = []
+        for room in rooms:
+            for offset in (0, 1):
+                rates.append(RoomRate(
+                    room=room,
+                    title='Лето',
+                    start_date=date(year + offset, 6, 1),
+                    end_date=date(year + offset, 9, 1),
+                    price=room.price * 13 // 10,
+                    weekend_price=room.price * 3 // 2,
+                ))
+                rates.append(RoomRate(
+                    room=room,
+                    title='Новый год',
+                    start_date=date(year + offset, 12, 28),
+                    end_date=date(year + offset + 1, 1, 9),
+                    price=room.price * 2,
+                    min_stay=3,
+                    priority=1,
+                ))
+        RoomRate.objects.bulk_create(rates, batch_size=self.batch_size)
+        # Цены броней считаются по тем же тарифам в памяти
+        self.rates = {room.pk: [] for room in rooms}
+        for rate in sorted(rates, key=lambda rate: rate.priority):
+            self.rates[rate.room_id].append((
+                rate.start_date, rate.end_date, rate.price,
+                rate.weekend_price, rate.min_stay,
+            ))
+        return len(rates)
+
+    def seed_profiles(self, count):
+        # Хеш считается один раз: PBKDF2 на каждого занял бы минуты
+        password = make_password(SEED_PASSWORD)
+        return User.objects.bulk_create(
+            (
+                User(
+                    email=f'seed-{self.run}-{number}@example.com',
+                    first_name='Гость',
+                    last_name=f'Синтетический {number}',
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def seed_bookings(self, count, rooms, guests):
+        """Непересекающиеся брони: по шкале дней каждого номера подряд."""
+        today = timezone.now().date()
+        per_room = max(count // len(rooms), 1)
+        created = nights = 0
+        batch = []
+        for room in rooms:
+            day = today - timedelta(days=365)
+            for _ in range(per_room):
+                day += timedelta(days=self.random.randint(0, 3))
+                stay = self.random.randint(1, 7)
+                batch.append(Booking(
+                    guest=self.random.choice(guests),
+                    room=room,
+                    check_in_date=day,
+                    check_out_date=day + timedelta(days=stay),
+                    guest_count=self.random.randint(
+                        1, room.max_number_of_guests),
+                    total_price=sum(nightly_prices(
+                        room.price, self.rates[room.pk], day, stay)[0]),
+                ))
+                day += timedelta(days=stay)
+            if len(batch) >= self.batch_size:
+                nights += self.flush(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            nights += self.flush(batch)
+            created += len(batch)
+        return created, nights
+
+    def flush(self, batch):
+        Booking.objects.bulk_create(batch)
+        room_nights = [
+            RoomNight(room_id=booking.room_id, booking=booking, date=date)
+            for booking in batch
+            for date in booking.stay_dates()
+        ]
+        RoomNight.objects.bulk_create(room_nights, batch_size=self.batch_size)
+        return len(room_nights)
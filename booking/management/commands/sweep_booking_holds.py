@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking.holds import sweep_expired_holds, sweep_lag
+from hotel.constants import BOOKING_HOLD_SWEEP_BATCH
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет истёкшие удержания номеров пачками. С --interval '
+        'работает фоновым уборщиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BOOKING_HOLD_SWEEP_BATCH)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять каждые N секунд вместо однократного запуска.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            pending, lag = sweep_lag()
+            started = time.perf_counter()
+            swept = sweep_expired_holds(batch_size=options['batch_size'])
+            self.stdout.write(
+                f'Удалено истёкших удержаний: {swept} '
+                f'за {time.perf_counter() - started:.2f} с, '
+                f'отставание {lag:.0f} с'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
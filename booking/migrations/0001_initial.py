@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:03
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('check_in_date', models.DateField(verbose_name='Дата заселения')),
+                ('check_out_date', models.DateField(verbose_name='Дата выезда')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('guest_count', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1, 'Минимум 1 гость')], verbose_name='Количество гостей')),
+                ('total_price', models.PositiveIntegerField(blank=True, verbose_name='Общая стоимость')),
+                ('guest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL, verbose_name='Гость')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='catalog.hotelroom', verbose_name='Номер')),
+            ],
+            options={
+                'verbose_name': 'бронирование',
+                'verbose_name_plural': 'Бронирования',
+                'ordering': ('-created_at',),
+                'unique_together': {('room', 'check_in_date', 'check_out_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_room_night'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['guest', 'check_out_date'], name='booking_guest_checkout_idx'),
+        ),
+    ]
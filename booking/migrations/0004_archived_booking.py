@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0001_initial'),
+        ('booking', '0003_booking_guest_check_out_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('check_in_date', models.DateField(verbose_name='Дата заселения')),
+                ('check_out_date', models.DateField(verbose_name='Дата выезда')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('guest_count', models.PositiveSmallIntegerField(verbose_name='Количество гостей')),
+                ('total_price', models.PositiveIntegerField(verbose_name='Общая стоимость')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('guest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL, verbose_name='Гость')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to='catalog.hotelroom', verbose_name='Номер')),
+            ],
+            options={
+                'verbose_name': 'архивное бронирование',
+                'verbose_name_plural': 'Архив бронирований',
+                'ordering': ('-check_out_date',),
+                'indexes': [models.Index(fields=['guest', 'check_out_date'], name='archive_guest_checkout_idx')],
+            },
+        ),
+    ]
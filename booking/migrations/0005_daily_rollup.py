@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('booking', '0004_archived_booking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRoomStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ночь')),
+                ('nights', models.PositiveSmallIntegerField(default=1, verbose_name='Продано ночей')),
+                ('revenue', models.PositiveIntegerField(default=0, verbose_name='Выручка')),
+                ('guests', models.PositiveSmallIntegerField(default=0, verbose_name='Гостей')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='catalog.hotelroom', verbose_name='Номер')),
+            ],
+            options={
+                'verbose_name': 'сводка номера за день',
+                'verbose_name_plural': 'Сводки номеров по дням',
+                'ordering': ('date', 'room'),
+                'indexes': [models.Index(fields=['date', 'room', 'nights', 'revenue'], name='daily_stat_report_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyroomstat',
+            constraint=models.UniqueConstraint(fields=('room', 'date'), name='unique_daily_room_stat'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('booking', '0005_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomCalendarMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('booked', models.PositiveIntegerField(default=0, verbose_name='Занятые ночи')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_months', to='catalog.hotelroom', verbose_name='Номер')),
+            ],
+            options={
+                'verbose_name': 'календарь номера за месяц',
+                'verbose_name_plural': 'Календари номеров',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='roomcalendarmonth',
+            constraint=models.UniqueConstraint(fields=('room', 'month'), name='unique_room_calendar_month'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:04
+
+import booking.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_room_rates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('booking', '0007_booking_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Токен')),
+                ('check_in_date', models.DateField(verbose_name='Дата заселения')),
+                ('check_out_date', models.DateField(verbose_name='Дата выезда')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('expires_at', models.DateTimeField(default=booking.models.hold_expiry, verbose_name='Истекает')),
+            ],
+            options={
+                'verbose_name': 'удержание номера',
+                'verbose_name_plural': 'Удержания номеров',
+                'ordering': ('expires_at',),
+            },
+        ),
+        migrations.AlterField(
+            model_name='roomnight',
+            name='booking',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='room_nights', to='booking.booking', verbose_name='Бронирование'),
+        ),
+        migrations.AddField(
+            model_name='bookinghold',
+            name='guest',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_holds', to=settings.AUTH_USER_MODEL, verbose_name='Гость'),
+        ),
+        migrations.AddField(
+            model_name='bookinghold',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='catalog.hotelroom', verbose_name='Номер'),
+        ),
+        migrations.AddField(
+            model_name='roomnight',
+            name='hold',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='room_nights', to='booking.bookinghold', verbose_name='Удержание'),
+        ),
+        migrations.AddConstraint(
+            model_name='roomnight',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('booking__isnull', False), ('hold__isnull', True)), models.Q(('booking__isnull', True), ('hold__isnull', False)), _connector='OR'), name='room_night_booking_or_hold'),
+        ),
+        migrations.AddIndex(
+            model_name='bookinghold',
+            index=models.Index(fields=['room', 'check_in_date', 'check_out_date'], name='booking_hold_stay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookinghold',
+            index=models.Index(fields=['expires_at'], name='booking_hold_expiry_idx'),
+        ),
+    ]
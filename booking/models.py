@@ -1,15 +1,35 @@
-from django.db import models
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, models
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from catalog.models import HotelRoom
+from catalog.pricing import quote_stay
+from hotel.constants import BOOKING_HOLD_TTL, IDEMPOTENCY_KEY_MAX_LENGTH
+from hotel.sqlite_profile import immediate_atomic
 
 
 User = get_user_model()
 
 
+class BookingConflictError(ValidationError):
+    """Номер уже занят хотя бы на одну из ночей брони."""
+
+    def __init__(self, message='Номер уже забронирован на выбранные даты'):
+        super().__init__(message, code='conflict')
+
+
+class BookingBusyError(ValidationError):
+    """Блокировка номера не получена за все попытки."""
+
+    def __init__(self, message='Номер сейчас бронируют, повторите попытку'):
+        super().__init__(message, code='busy')
+
+
 class Booking(models.Model):
 
     guest = models.ForeignKey(
@@ -36,17 +56,40 @@ class Booking(models.Model):
         'Общая стоимость',
         blank=True
     )
+    # Повтор отправки формы с тем же ключом возвращает созданную бронь
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=IDEMPOTENCY_KEY_MAX_LENGTH,
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'бронирование'
         verbose_name_plural = 'Бронирования'
         ordering = ('-created_at',)
         unique_together = ('room', 'check_in_date', 'check_out_date')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('guest', 'idempotency_key'),
+                name='unique_booking_idempotency_key',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('guest', 'check_out_date'),
+                name='booking_guest_checkout_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Бронирование: {self.guest} / {self.room}'
 
     def clean(self):
+        # Без одной из дат форма уже показала ошибку поля
+        if self.check_in_date is None or self.check_out_date is None:
+            return super().clean()
         if self.check_in_date >= self.check_out_date:
             raise ValidationError(
                 'Дата выезда должна быть позже даты заселения')
@@ -54,13 +97,315 @@ class Booking(models.Model):
             raise ValidationError('Дата заселения не может быть в прошлом')
         return super().clean()
 
+    @property
+    def nights(self):
+        return (self.check_out_date - self.check_in_date).days
+
+    def stay_dates(self):
+        """Даты ночей проживания: от заезда включительно до выезда."""
+        return [
+            self.check_in_date + timedelta(days=offset)
+            for offset in range(self.nights)
+        ]
+
     def save(self, *args, **kwargs):
         if self.guest_count > self.room.max_number_of_guests:
             raise ValidationError(
                 'Значение не может быть больше чем в связанной модели')
         if not self.total_price:
-            self.total_price = (
-                (self.check_out_date - self.check_in_date).days
-                * self.room.price
-            )
-        return super().save(*args, **kwargs)
+            self.total_price = quote_stay(
+                self.room, self.check_in_date, self.check_out_date).total
+        # Бронь и её ночи в реестре сохраняются атомарно: при конфликте
+        # откатывается и сама бронь
+        adding = self._state.adding
+        try:
+            with immediate_atomic():
+                super().save(*args, **kwargs)
+                self.reserve_nights(replace=not adding)
+        except IntegrityError as error:
+            if adding:
+                self._state.adding = True
+                self.pk = None
+            raise BookingConflictError() from error
+
+    def reserve_nights(self, replace=True):
+        """Записывает ночи брони в реестр RoomNight.
+
+        Уникальный индекс (room, date) отклоняет пересечение на уровне БД,
+        поэтому проверка занимает O(ночей) и не зависит от гонок.
+        """
+        if replace:
+            self.room_nights.all().delete()
+        release_expired_nights(
+            self.room_id, self.check_in_date, self.check_out_date)
+        RoomNight.objects.bulk_create(
+            RoomNight(room_id=self.room_id, booking=self, date=date)
+            for date in self.stay_dates()
+        )
+
+
+class BookingHoldQuerySet(models.QuerySet):
+
+    def active(self, now=None):
+        return self.filter(expires_at__gt=now or timezone.now())
+
+    def expired(self, now=None):
+        return self.filter(expires_at__lte=now or timezone.now())
+
+
+def hold_expiry():
+    return timezone.now() + timedelta(seconds=BOOKING_HOLD_TTL)
+
+
+class BookingHold(models.Model):
+    """Временное удержание ночей номера на время заполнения формы.
+
+    Ночи удержания записываются в реестр RoomNight, поэтому с бронями
+    и другими удержаниями они пересекаются по тому же уникальному
+    индексу. Истёкшие удержания освобождаются при записи на их ночи
+    и удаляются командой sweep_booking_holds.
+    """
+
+    token = models.UUIDField(
+        'Токен', default=uuid.uuid4, unique=True, editable=False)
+    guest = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Гость',
+        related_name='booking_holds'
+    )
+    room = models.ForeignKey(
+        HotelRoom,
+        on_delete=models.CASCADE,
+        verbose_name='Номер',
+        related_name='holds'
+    )
+    check_in_date = models.DateField('Дата заселения')
+    check_out_date = models.DateField('Дата выезда')
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    expires_at = models.DateTimeField('Истекает', default=hold_expiry)
+
+    objects = BookingHoldQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'удержание номера'
+        verbose_name_plural = 'Удержания номеров'
+        ordering = ('expires_at',)
+        indexes = [
+            models.Index(
+                fields=('room', 'check_in_date', 'check_out_date'),
+                name='booking_hold_stay_idx',
+            ),
+            models.Index(
+                fields=('expires_at',), name='booking_hold_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f'Удержание: {self.guest} / {self.room}'
+
+    @property
+    def is_active(self):
+        return self.expires_at > timezone.now()
+
+    @property
+    def nights(self):
+        return (self.check_out_date - self.check_in_date).days
+
+    def stay_dates(self):
+        return [
+            self.check_in_date + timedelta(days=offset)
+            for offset in range(self.nights)
+        ]
+
+
+class RoomNight(models.Model):
+    """Реестр занятых ночей: одна строка на номер и ночь.
+
+    Ночь занята либо бронью, либо удержанием BookingHold.
+    """
+
+    room = models.ForeignKey(
+        HotelRoom,
+        on_delete=models.CASCADE,
+        verbose_name='Номер',
+        related_name='room_nights'
+    )
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        verbose_name='Бронирование',
+        related_name='room_nights',
+        null=True,
+        blank=True,
+    )
+    hold = models.ForeignKey(
+        BookingHold,
+        on_delete=models.CASCADE,
+        verbose_name='Удержание',
+        related_name='room_nights',
+        null=True,
+        blank=True,
+    )
+    date = models.DateField('Ночь')
+
+    class Meta:
+        verbose_name = 'ночь номера'
+        verbose_name_plural = 'Ночи номеров'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('room', 'date'), name='unique_room_night'
+            ),
+            models.CheckConstraint(
+                check=(
+                    models.Q(booking__isnull=False, hold__isnull=True)
+                    | models.Q(booking__isnull=True, hold__isnull=False)
+                ),
+                name='room_night_booking_or_hold',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.room_id} / {self.date}'
+
+
+def release_expired_nights(room_id, check_in, check_out, using='default'):
+    """Освобождает ночи истёкших удержаний номера в [check_in, check_out).
+
+    Само удержание остаётся до прохода sweep_booking_holds.
+    """
+    RoomNight.objects.using(using).filter(
+        room_id=room_id,
+        date__gte=check_in,
+        date__lt=check_out,
+        hold__expires_at__lte=timezone.now(),
+    ).delete()
+
+
+class RoomCalendarMonth(models.Model):
+    """Занятые ночи номера за месяц битовой маской.
+
+    Бит d - 1 установлен, если занята ночь на d-е число. Маски строятся
+    по реестру RoomNight модулем booking.availability; месяцы без
+    занятых ночей не хранятся.
+    """
+
+    room = models.ForeignKey(
+        HotelRoom,
+        on_delete=models.CASCADE,
+        verbose_name='Номер',
+        related_name='calendar_months'
+    )
+    month = models.DateField('Месяц')
+    booked = models.PositiveIntegerField('Занятые ночи', default=0)
+
+    class Meta:
+        verbose_name = 'календарь номера за месяц'
+        verbose_name_plural = 'Календари номеров'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('room', 'month'), name='unique_room_calendar_month'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.room_id} / {self.month:%Y-%m}'
+
+
+class ArchivedBooking(models.Model):
+    """Бронирование, перенесённое из рабочей таблицы после выезда.
+
+    Первичный ключ совпадает с pk исходной брони, поэтому ссылки
+    и курсоры истории остаются уникальными для обеих таблиц.
+    """
+
+    id = models.PositiveBigIntegerField(primary_key=True)
+    guest = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Гость',
+        related_name='archived_bookings'
+    )
+    room = models.ForeignKey(
+        HotelRoom,
+        on_delete=models.CASCADE,
+        verbose_name='Номер',
+        related_name='archived_bookings'
+    )
+    check_in_date = models.DateField('Дата заселения')
+    check_out_date = models.DateField('Дата выезда')
+    created_at = models.DateTimeField('Дата создания')
+    updated_at = models.DateTimeField('Дата обновления')
+    guest_count = models.PositiveSmallIntegerField('Количество гостей')
+    total_price = models.PositiveIntegerField('Общая стоимость')
+    archived_at = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'архивное бронирование'
+        verbose_name_plural = 'Архив бронирований'
+        ordering = ('-check_out_date',)
+        indexes = [
+            models.Index(
+                fields=('guest', 'check_out_date'),
+                name='archive_guest_checkout_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Архивное бронирование: {self.guest} / {self.room}'
+
+    @property
+    def nights(self):
+        return (self.check_out_date - self.check_in_date).days
+
+    @classmethod
+    def from_booking(cls, booking):
+        return cls(
+            id=booking.pk,
+            guest_id=booking.guest_id,
+            room_id=booking.room_id,
+            check_in_date=booking.check_in_date,
+            check_out_date=booking.check_out_date,
+            created_at=booking.created_at,
+            updated_at=booking.updated_at,
+            guest_count=booking.guest_count,
+            total_price=booking.total_price,
+        )
+
+
+class DailyRoomStat(models.Model):
+    """Дневная сводка номера: строка на каждую проданную ночь.
+
+    Строится из рабочих и архивных броней модулем booking.analytics,
+    поэтому переживает перенос броней в архив.
+    """
+
+    room = models.ForeignKey(
+        HotelRoom,
+        on_delete=models.CASCADE,
+        verbose_name='Номер',
+        related_name='daily_stats'
+    )
+    date = models.DateField('Ночь')
+    nights = models.PositiveSmallIntegerField('Продано ночей', default=1)
+    revenue = models.PositiveIntegerField('Выручка', default=0)
+    guests = models.PositiveSmallIntegerField('Гостей', default=0)
+
+    class Meta:
+        verbose_name = 'сводка номера за день'
+        verbose_name_plural = 'Сводки номеров по дням'
+        ordering = ('date', 'room')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('room', 'date'), name='unique_daily_room_stat'
+            ),
+        ]
+        indexes = [
+            # Отчёты за период читают только индекс
+            models.Index(
+                fields=('date', 'room', 'nights', 'revenue'),
+                name='daily_stat_report_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.room_id} / {self.date}'
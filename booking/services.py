@@ -0,0 +1,215 @@
+"""Создание брони: транзакция, блокировка номера, идемпотентность.
+
+Блокировка зависит от СУБД. SQLite открывает транзакцию через
+BEGIN IMMEDIATE: блокировка записи берётся сразу, и проверка ключа
+идемпотентности и запись брони не пересекаются с другими писателями.
+СУБД с SELECT ... FOR UPDATE блокируют строку номера, поэтому брони
+одного номера идут по очереди, а разных номеров - параллельно.
+Окончательно пересечения отклоняет уникальный индекс реестра RoomNight.
+
+Ошибки ожидания блокировки (SQLite "database is locked", взаимные
+блокировки и сбои сериализации) повторяются с экспоненциальной
+паузой, после последней попытки - BookingBusyError.
+"""
+import random
+import time
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, transaction
+
+from catalog.models import HotelRoom
+from catalog.pricing import quote_stay
+from hotel.constants import (
+    BOOKING_RETRY_ATTEMPTS,
+    BOOKING_RETRY_BACKOFF,
+    BOOKING_RETRY_BACKOFF_MAX,
+)
+from hotel.metrics import registry
+from hotel.sqlite_profile import immediate_atomic
+from tasks.queue import enqueue
+
+from .holds import HOLD_CONVERSIONS, HOLDS, release_hold
+from .models import (
+    Booking,
+    BookingBusyError,
+    BookingConflictError,
+    BookingHold,
+    RoomNight,
+    release_expired_nights,
+)
+from .tasks import send_booking_confirmation
+
+
+BOOKING_RETRIES = registry.counter(
+    'booking_lock_retries_total',
+    'Повторы создания брони после ошибки блокировки.',
+)
+
+# Фрагменты сообщений СУБД об ожидании блокировки
+LOCK_ERRORS = (
+    'database is locked',
+    'database table is locked',
+    'deadlock',
+    'could not serialize',
+    'lock wait timeout',
+    'lock timeout',
+)
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return any(fragment in message for fragment in LOCK_ERRORS)
+
+
+@contextmanager
+def booking_atomic(room, using='default'):
+    """Транзакция, в которой брони номера room создаются по очереди."""
+    connection = transaction.get_connection(using)
+    if connection.vendor == 'sqlite':
+        with immediate_atomic(using=using):
+            yield
+        return
+    with transaction.atomic(using=using):
+        if connection.features.has_select_for_update:
+            list(
+                HotelRoom.objects.using(using).select_for_update()
+                .filter(pk=room.pk).values_list('pk', flat=True))
+        yield
+
+
+def replayed_booking(booking, using='default'):
+    """Бронь, уже созданная гостем по ключу booking, или None."""
+    if not booking.idempotency_key:
+        return None
+    existing = (
+        Booking.objects.using(using)
+        .filter(
+            guest_id=booking.guest_id,
+            idempotency_key=booking.idempotency_key,
+        )
+        .first()
+    )
+    if existing is None:
+        return None
+    if (existing.room_id, existing.check_in_date, existing.check_out_date,
+            existing.guest_count) != (
+            booking.room_id, booking.check_in_date, booking.check_out_date,
+            booking.guest_count):
+        raise ValidationError(
+            'Форма уже отправлена с другими данными, обновите страницу',
+            code='idempotency',
+        )
+    return existing
+
+
+def run_locked(room, action, using='default'):
+    """Выполняет action() в booking_atomic с повтором при блокировке."""
+    # Внутри чужой транзакции повтор невозможен: она уже прервана
+    attempts = (
+        1 if transaction.get_connection(using).in_atomic_block
+        else BOOKING_RETRY_ATTEMPTS
+    )
+    for attempt in range(attempts):
+        try:
+            with booking_atomic(room, using):
+                return action()
+        except OperationalError as error:
+            if not is_lock_error(error):
+                raise
+            if attempt + 1 == attempts:
+                raise BookingBusyError() from error
+            BOOKING_RETRIES.inc()
+            # Случайная доля паузы разводит повторы конкурентов
+            pause = min(
+                BOOKING_RETRY_BACKOFF * 2 ** attempt,
+                BOOKING_RETRY_BACKOFF_MAX,
+            )
+            time.sleep(pause * random.uniform(0.5, 1))
+
+
+def take_hold(room, guest, check_in_date, check_out_date, using='default'):
+    """Удерживает ночи номера за гостем на BOOKING_HOLD_TTL секунд.
+
+    Прежние удержания гостя на этот номер снимаются. Если ночи заняты
+    бронью или чужим удержанием - BookingConflictError, прежние
+    удержания тогда остаются.
+    """
+    hold = BookingHold(
+        room=room,
+        guest=guest,
+        check_in_date=check_in_date,
+        check_out_date=check_out_date,
+    )
+
+    def save_hold():
+        BookingHold.objects.using(using).filter(
+            room=room, guest=guest).delete()
+        release_expired_nights(
+            room.pk, check_in_date, check_out_date, using)
+        hold.pk = None
+        hold.save(using=using)
+        RoomNight.objects.using(using).bulk_create(
+            RoomNight(room_id=room.pk, hold=hold, date=date)
+            for date in hold.stay_dates()
+        )
+        return hold
+
+    try:
+        hold = run_locked(room, save_hold, using)
+    except IntegrityError as error:
+        HOLDS.inc(result='conflict')
+        raise BookingConflictError() from error
+    HOLDS.inc(result='taken')
+    return hold
+
+
+def create_booking(room, guest, check_in_date, check_out_date, guest_count,
+                   idempotency_key=None, hold_token=None, using='default'):
+    """Создаёт бронь и возвращает (бронь, создана ли она сейчас).
+
+    Повтор с тем же idempotency_key возвращает прежнюю бронь
+    с created=False. Удержание hold_token гостя снимается в той же
+    транзакции. Пересечение с чужой бронью - BookingConflictError,
+    не полученная за BOOKING_RETRY_ATTEMPTS попыток блокировка -
+    BookingBusyError.
+    """
+    booking = Booking(
+        room=room,
+        guest=guest,
+        check_in_date=check_in_date,
+        check_out_date=check_out_date,
+        guest_count=guest_count,
+        idempotency_key=idempotency_key or None,
+    )
+    booking.clean()
+    # Цена считается до транзакции, чтобы не держать в ней блокировку
+    booking.total_price = quote_stay(
+        room, check_in_date, check_out_date, using).total
+    return run_locked(
+        room, lambda: save_booking(booking, hold_token, using), using)
+
+
+def save_booking(booking, hold_token=None, using='default'):
+    # Повтор после ошибки блокировки начинается с несохранённой брони
+    booking.pk = None
+    booking._state.adding = True
+    existing = replayed_booking(booking, using)
+    if existing is not None:
+        return existing, False
+    hold = hold_token and release_hold(booking, hold_token, using)
+    try:
+        booking.save(using=using)
+    except BookingConflictError:
+        # Параллельный запрос с тем же ключом успел раньше
+        existing = replayed_booking(booking, using)
+        if existing is None:
+            raise
+        return existing, False
+    # Письмо уходит из воркера и только после коммита брони
+    enqueue(
+        send_booking_confirmation, booking.pk,
+        dedup_key=f'booking:confirmation:{booking.pk}', using=using,
+    )
+    HOLD_CONVERSIONS.inc(result=hold or 'none')
+    return booking, True
@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from tasks.queue import enqueue
+
+from .models import ArchivedBooking, Booking
+from .tasks import refresh_booked_stays
+
+
+def stay(booking):
+    return booking.room_id, booking.check_in_date, booking.check_out_date
+
+
+def stays_changed(stays, using):
+    """Ставит пересчёт календарей и сводки по датам броней в очередь.
+
+    Задача пишется в той же транзакции, что и бронь, и выполняется
+    воркером после коммита, вне запроса.
+    """
+    enqueue(refresh_booked_stays, stays, using=using)
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_stay(sender, instance, raw=False, using='default',
+                          **kwargs):
+    if not raw and instance.pk:
+        instance._previous_stay = (
+            Booking.objects.using(using).filter(pk=instance.pk)
+            .values_list('room_id', 'check_in_date', 'check_out_date')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    stays = [stay(instance)]
+    previous = instance.__dict__.pop('_previous_stay', None)
+    if previous:
+        stays.append(previous)
+    stays_changed(stays, using)
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=ArchivedBooking)
+def booking_deleted(sender, instance, using='default', **kwargs):
+    # archive_bookings удаляет брони без сигналов и ставит пересчёт
+    # одной задачей на пачку
+    stays_changed([stay(instance)], using)
@@ -0,0 +1,43 @@
+"""Задачи очереди после изменения броней.
+
+Аргументы приходят из JSON, поэтому даты - строки ISO.
+"""
+from datetime import date
+
+from django.core.mail import send_mail
+
+from .analytics import refresh_stays
+from .availability import refresh_calendars
+from .models import Booking
+
+
+def refresh_booked_stays(stays):
+    """Пересчитывает календари и сводку по [room_id, заезд, выезд]."""
+    stays = [
+        (room_id, date.fromisoformat(check_in), date.fromisoformat(check_out))
+        for room_id, check_in, check_out in stays
+    ]
+    refresh_calendars(stays)
+    refresh_stays(stays)
+
+
+def send_booking_confirmation(booking_id):
+    """Письмо гостю о созданной брони; удалённая бронь пропускается."""
+    booking = (
+        Booking.objects.select_related('guest', 'room')
+        .filter(pk=booking_id).first()
+    )
+    if booking is None:
+        return
+    send_mail(
+        f'Бронирование номера {booking.room.title}',
+        (
+            f'Номер {booking.room.title} забронирован '
+            f'с {booking.check_in_date:%d.%m.%Y} '
+            f'по {booking.check_out_date:%d.%m.%Y}.\n'
+            f'Гостей: {booking.guest_count}, '
+            f'стоимость: {booking.total_price} ₽.'
+        ),
+        None,
+        [booking.guest.email],
+    )
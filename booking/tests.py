@@ -1,3 +1,996 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.analytics import (
+    day_report,
+    hotel_report,
+    rebuild_rollup,
+    rollup_rows,
+    room_report,
+)
+from booking.archive import archive_bookings
+from booking.availability import add_months, get_calendars
+from booking.models import (
+    ArchivedBooking,
+    Booking,
+    BookingBusyError,
+    BookingConflictError,
+    BookingHold,
+    DailyRoomStat,
+    RoomCalendarMonth,
+    RoomNight,
+)
+from booking.holds import (
+    HOLD_CONVERSIONS,
+    HOLDS,
+    sweep_expired_holds,
+    sweep_lag,
+)
+from booking.services import BOOKING_RETRIES, create_booking, take_hold
+from booking.views import BOOKING_RESULTS
+from catalog.models import Hotel, HotelRoom
+from hotel.metrics import registry
+from tasks.models import Task
+from tasks.queue import run_pending_tasks
+from user.views import PersonalAccountView
+
+
+User = get_user_model()
+
+
+def create_room(title='room', price=1000, guests=2):
+    return HotelRoom.objects.create(
+        title=title,
+        max_number_of_guests=guests,
+        description=f'Описание {title}',
+        price=price,
+        main_img=f'{title}/room.jpg',
+    )
+
+
+def create_guest(email='guest@example.com'):
+    return User.objects.create(
+        email=email, first_name='Гость', last_name='Тестовый')
+
+
+class RoomNightLedgerTest(TestCase):
+    """Тесты реестра занятых ночей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.room = create_room()
+        cls.guest = create_guest()
+
+    def book(self, start, end, room=None):
+        return Booking.objects.create(
+            guest=self.guest,
+            room=room or self.room,
+            check_in_date=self.today + timedelta(days=start),
+            check_out_date=self.today + timedelta(days=end),
+            guest_count=1,
+        )
+
+    def test_booking_reserves_each_night(self):
+        """Тест что бронь занимает каждую ночь проживания"""
+        booking = self.book(1, 4)
+        self.assertEqual(
+            list(booking.room_nights.values_list('date', flat=True)),
+            booking.stay_dates(),
+        )
+        self.assertEqual(booking.total_price, 3 * self.room.price)
+
+    def test_overlapping_booking_is_rejected(self):
+        """Тест что пересекающаяся бронь отклоняется и не сохраняется"""
+        self.book(1, 4)
+        with self.assertRaises(BookingConflictError):
+            self.book(3, 6)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(RoomNight.objects.count(), 3)
+
+    def test_adjacent_bookings_are_allowed(self):
+        """Тест что бронь с заездом в день выезда допустима"""
+        self.book(1, 4)
+        self.book(4, 6)
+        self.assertEqual(RoomNight.objects.count(), 5)
+
+    def test_update_moves_nights(self):
+        """Тест что изменение дат переносит ночи в реестре"""
+        booking = self.book(1, 4)
+        booking.check_in_date = self.today + timedelta(days=10)
+        booking.check_out_date = self.today + timedelta(days=12)
+        booking.save()
+        self.book(1, 4)
+        self.assertEqual(RoomNight.objects.count(), 5)
+
+    def test_delete_releases_nights(self):
+        """Тест что удаление брони освобождает ночи"""
+        self.book(1, 4).delete()
+        self.assertFalse(RoomNight.objects.exists())
+        self.book(1, 4)
+
+    def test_backfill_command(self):
+        """Тест заполнения реестра по существующим броням"""
+        self.book(1, 4)
+        self.book(5, 7)
+        RoomNight.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_room_nights', stdout=out)
+        self.assertEqual(RoomNight.objects.count(), 5)
+        self.assertIn('5', out.getvalue())
+
+    @override_settings(QUERY_BUDGET_ENFORCE=True)
+    def test_create_view_fits_query_budget(self):
+        """Тест что создание брони укладывается в бюджет запросов"""
+        self.client.force_login(self.guest)
+        url = reverse('create_booking', kwargs={'slug': self.room.slug})
+        self.client.get(url)
+        response = self.client.post(url, {
+            'check_in_date': self.today + timedelta(days=2),
+            'check_out_date': self.today + timedelta(days=3),
+            'guest_count': 1,
+            'idempotency_key': 'budget',
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def test_view_reports_conflict(self):
+        """Тест что представление показывает ошибку конфликта в форме"""
+        self.book(1, 4)
+        conflicts = BOOKING_RESULTS.value(result='conflict')
+        self.client.force_login(self.guest)
+        response = self.client.post(
+            reverse('create_booking', kwargs={'slug': self.room.slug}),
+            {
+                'check_in_date': self.today + timedelta(days=2),
+                'check_out_date': self.today + timedelta(days=3),
+                'guest_count': 1,
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(
+            BOOKING_RESULTS.value(result='conflict'), conflicts + 1)
+
+
+class BookingServiceMixin:
+
+    def book(self, start=1, end=3, key='key', guest=None):
+        return create_booking(
+            room=self.room,
+            guest=guest or self.guest,
+            check_in_date=self.today + timedelta(days=start),
+            check_out_date=self.today + timedelta(days=end),
+            guest_count=1,
+            idempotency_key=key,
+        )
+
+    def post(self, key, start=1, end=3):
+        return self.client.post(
+            reverse('create_booking', kwargs={'slug': self.room.slug}),
+            {
+                'check_in_date': self.today + timedelta(days=start),
+                'check_out_date': self.today + timedelta(days=end),
+                'guest_count': 1,
+                'idempotency_key': key,
+            }
+        )
+
+
+class BookingServiceTest(BookingServiceMixin, TestCase):
+    """Тесты сервиса создания брони"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.room = create_room()
+        cls.guest = create_guest()
+
+    def test_repeated_key_returns_same_booking(self):
+        """Тест что повтор с тем же ключом не создаёт вторую бронь"""
+        booking, created = self.book()
+        self.assertTrue(created)
+        self.assertEqual(booking.total_price, 2 * self.room.price)
+        replay, created = self.book()
+        self.assertFalse(created)
+        self.assertEqual(replay.pk, booking.pk)
+        self.assertEqual(Booking.objects.count(), 1)
+        # Ключи разных гостей не пересекаются
+        with self.assertRaises(BookingConflictError):
+            self.book(guest=create_guest('other@example.com'))
+
+    def test_key_reuse_with_other_data_is_rejected(self):
+        """Тест что ключ нельзя использовать для других дат"""
+        self.book()
+        with self.assertRaises(ValidationError) as error:
+            self.book(5, 7)
+        self.assertEqual(error.exception.code, 'idempotency')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_double_submit_creates_one_booking(self):
+        """Тест что повторная отправка формы ведёт на ту же бронь"""
+        self.client.force_login(self.guest)
+        page = self.client.get(
+            reverse('create_booking', kwargs={'slug': self.room.slug}))
+        key = page.context['idempotency_key']
+        self.assertContains(page, f'name="idempotency_key" value="{key}"')
+        replayed = BOOKING_RESULTS.value(result='replayed')
+        for _ in range(2):
+            self.assertEqual(self.post(key).status_code, 302)
+        self.assertEqual(Booking.objects.get().idempotency_key, key)
+        self.assertEqual(
+            BOOKING_RESULTS.value(result='replayed'), replayed + 1)
+
+    def test_confirmation_is_sent_once(self):
+        """Тест что письмо о брони уходит из очереди один раз"""
+        booking, _ = self.book()
+        self.book()
+        self.assertEqual(mail.outbox, [])
+        run_pending_tasks()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.guest.email])
+        self.assertIn(self.room.title, mail.outbox[0].subject)
+        self.assertEqual(
+            Task.objects.filter(
+                name='booking.tasks.send_booking_confirmation',
+                args=[booking.pk],
+            ).count(),
+            1,
+        )
+
+    def test_other_operational_errors_are_raised(self):
+        """Тест что прочие ошибки БД не повторяются"""
+        with mock.patch.object(
+                Booking, 'save',
+                side_effect=OperationalError('no such table')), \
+                mock.patch('booking.services.time.sleep') as sleep:
+            with self.assertRaises(OperationalError):
+                self.book()
+        sleep.assert_not_called()
+
+
+class BookingRetryTest(BookingServiceMixin, TransactionTestCase):
+    """Тесты повторов: TestCase держит транзакцию, в ней повтор невозможен"""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.room = create_room()
+        self.guest = create_guest()
+
+    def test_lock_errors_are_retried(self):
+        """Тест повтора транзакции при занятой блокировке"""
+        retries = BOOKING_RETRIES.value()
+        original = Booking.save
+        failures = iter([OperationalError('database is locked')] * 2)
+
+        def save(booking, *args, **kwargs):
+            error = next(failures, None)
+            if error is not None:
+                # Ошибка после INSERT: повтор начинается с чистой брони
+                original(booking, *args, **kwargs)
+                raise error
+            return original(booking, *args, **kwargs)
+
+        with mock.patch.object(Booking, 'save', save), \
+                mock.patch('booking.services.time.sleep') as sleep:
+            booking, created = self.book()
+        self.assertTrue(created)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(BOOKING_RETRIES.value(), retries + 2)
+        self.assertEqual(Booking.objects.get().pk, booking.pk)
+        self.assertEqual(RoomNight.objects.count(), 2)
+
+    @mock.patch('booking.services.BOOKING_RETRY_ATTEMPTS', 5)
+    def test_busy_room_is_reported_on_form(self):
+        """Тест ошибки формы, если блокировка так и не получена"""
+        busy = BOOKING_RESULTS.value(result='busy')
+        self.client.force_login(self.guest)
+        with mock.patch.object(
+                Booking, 'save',
+                side_effect=OperationalError('database is locked')), \
+                mock.patch('booking.services.time.sleep') as sleep:
+            response = self.post('busy')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sleep.call_count, 4)
+        self.assertIn(
+            'Номер сейчас бронируют, повторите попытку',
+            response.context['form'].non_field_errors(),
+        )
+        self.assertEqual(BOOKING_RESULTS.value(result='busy'), busy + 1)
+
+
+class BookingArchiveTest(TestCase):
+    """Тесты переноса броней в архив и чтения истории"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.room = create_room()
+        cls.guest = create_guest()
+        for start in range(-100, 0, 10):
+            Booking.objects.create(
+                guest=cls.guest,
+                room=cls.room,
+                check_in_date=cls.today + timedelta(days=start),
+                check_out_date=cls.today + timedelta(days=start + 2),
+                guest_count=1,
+            )
+
+    def test_command_moves_old_bookings_in_batches(self):
+        """Тест переноса старых броней вместе с освобождением ночей"""
+        out = StringIO()
+        refreshes = Task.objects.filter(
+            name='booking.tasks.refresh_booked_stays')
+        queued = refreshes.count()
+        call_command('archive_bookings', days=50, batch_size=2, stdout=out)
+        self.assertIn('5', out.getvalue())
+        # Одна задача пересчёта на пачку, а не на каждую бронь
+        self.assertEqual(refreshes.count(), queued + 3)
+        self.assertEqual(ArchivedBooking.objects.count(), 5)
+        self.assertEqual(Booking.objects.count(), 5)
+        self.assertFalse(Booking.objects.filter(
+            check_out_date__lt=self.today - timedelta(days=50)).exists())
+        self.assertEqual(RoomNight.objects.count(), 10)
+        self.assertEqual(
+            archive_bookings(self.today - timedelta(days=50)), 0)
+
+    def test_profile_history_merges_archive(self):
+        """Тест что история профиля листает обе таблицы по порядку"""
+        expected = list(
+            Booking.objects.order_by('-check_out_date')
+            .values_list('pk', flat=True))
+        archive_bookings(self.today - timedelta(days=50))
+        self.client.force_login(self.guest)
+        seen = []
+        params = {}
+        with mock.patch.object(PersonalAccountView, 'paginate_by', 4):
+            while True:
+                response = self.client.get(reverse('profile'), params)
+                seen += [
+                    booking.pk
+                    for booking in response.context['bookings_isnt_active']]
+                page = response.context['page_obj']
+                if not page.has_next():
+                    break
+                params = {'cursor': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+    def test_admin_redirects_archived_booking(self):
+        """Тест что ссылка на перенесённую бронь ведёт в архив"""
+        booking = Booking.objects.order_by('check_out_date').first()
+        archive_bookings(self.today - timedelta(days=50))
+        admin = User.objects.create(
+            email='admin@example.com', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:booking_booking_change', args=(booking.pk,)))
+        self.assertRedirects(
+            response,
+            reverse('admin:booking_archivedbooking_change',
+                    args=(booking.pk,)),
+        )
+
+
+class BookingHoldTest(TestCase):
+    """Тесты временных удержаний номеров"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.room = create_room()
+        cls.guest = create_guest()
+        cls.other = create_guest('other@example.com')
+
+    def dates(self, start, end):
+        return (
+            self.today + timedelta(days=start),
+            self.today + timedelta(days=end),
+        )
+
+    def hold(self, start=1, end=3, guest=None):
+        return take_hold(
+            self.room, guest or self.guest, *self.dates(start, end))
+
+    def book(self, start=1, end=3, guest=None, hold=None):
+        return create_booking(
+            self.room, guest or self.guest, *self.dates(start, end),
+            guest_count=1, hold_token=hold and hold.token,
+        )
+
+    def expire(self, *holds):
+        BookingHold.objects.filter(pk__in=[hold.pk for hold in holds]).update(
+            expires_at=timezone.now() - timedelta(minutes=5))
+
+    def available(self, start=1, end=3):
+        return HotelRoom.objects.available(*self.dates(start, end)).exists()
+
+    def test_hold_blocks_other_guests(self):
+        """Тест что удержание закрывает ночи для других гостей"""
+        conflicts = HOLDS.value(result='conflict')
+        self.hold()
+        with self.assertRaises(BookingConflictError):
+            self.hold(2, 4, guest=self.other)
+        with self.assertRaises(BookingConflictError):
+            self.book(2, 4, guest=self.other)
+        self.assertEqual(HOLDS.value(result='conflict'), conflicts + 1)
+        self.assertFalse(self.available())
+        self.assertTrue(self.available(3, 5))
+        # Календарь показывает только брони
+        self.assertEqual(
+            get_calendars([self.room.pk], self.today.replace(day=1), 2),
+            {self.room.pk: [0, 0]},
+        )
+
+    def test_hold_converts_to_booking(self):
+        """Тест что бронь занимает ночи удержания гостя"""
+        converted = HOLD_CONVERSIONS.value(result='converted')
+        hold = self.hold()
+        booking, created = self.book(hold=hold)
+        self.assertTrue(created)
+        self.assertFalse(BookingHold.objects.exists())
+        self.assertEqual(
+            list(RoomNight.objects.values_list('booking', flat=True)),
+            [booking.pk, booking.pk],
+        )
+        self.assertEqual(
+            HOLD_CONVERSIONS.value(result='converted'), converted + 1)
+
+    def test_new_hold_replaces_previous(self):
+        """Тест что при смене дат прежнее удержание гостя снимается"""
+        self.hold()
+        hold = self.hold(5, 7)
+        self.assertEqual(list(BookingHold.objects.all()), [hold])
+        self.assertTrue(self.available())
+        # Удержание на занятые даты не снимает прежнее
+        self.book(1, 3, guest=self.other)
+        with self.assertRaises(BookingConflictError):
+            self.hold(2, 4)
+        self.assertEqual(list(BookingHold.objects.all()), [hold])
+
+    def test_expired_hold_frees_nights(self):
+        """Тест что истёкшее удержание не мешает бронированию"""
+        hold = self.hold()
+        self.expire(hold)
+        self.assertTrue(self.available())
+        booking, _ = self.book(guest=self.other)
+        self.assertEqual(booking.room_nights.count(), 2)
+        # Строка удержания остаётся до уборки, гость узнаёт об истечении
+        expired = HOLD_CONVERSIONS.value(result='expired')
+        with self.assertRaises(BookingConflictError):
+            self.book(hold=hold)
+        self.assertEqual(HOLD_CONVERSIONS.value(result='expired'), expired)
+        self.assertEqual(BookingHold.objects.count(), 1)
+
+    def test_sweeper_removes_expired_holds_in_batches(self):
+        """Тест уборки истёкших удержаний пачками и отставания уборки"""
+        holds = [
+            self.hold(start, start + 1, guest=create_guest(f'{start}@e.com'))
+            for start in range(1, 6)
+        ]
+        active = self.hold(10, 12)
+        self.expire(*holds)
+        pending, lag = sweep_lag()
+        self.assertEqual(pending, 5)
+        self.assertGreaterEqual(lag, 300)
+        registry.clear_collected()
+        self.assertIn('booking_hold_sweep_pending 5', registry.expose())
+        out = StringIO()
+        call_command('sweep_booking_holds', batch_size=2, stdout=out)
+        self.assertIn('Удалено истёкших удержаний: 5', out.getvalue())
+        self.assertEqual(list(BookingHold.objects.all()), [active])
+        self.assertEqual(RoomNight.objects.count(), 2)
+        self.assertEqual(sweep_lag(), (0, 0.0))
+        self.assertEqual(sweep_expired_holds(), 0)
+
+    @override_settings(QUERY_BUDGET_ENFORCE=True)
+    def test_form_holds_dates_and_books(self):
+        """Тест удержания из формы и брони по нему в бюджете запросов"""
+        url = reverse('hold_room', kwargs={'slug': self.room.slug})
+        check_in, check_out = self.dates(2, 4)
+        data = {
+            'check_in_date': check_in,
+            'check_out_date': check_out,
+            'guest_count': 1,
+        }
+        self.assertEqual(self.client.post(url, data).status_code, 403)
+        self.client.force_login(self.other)
+        self.assertEqual(
+            self.client.post(url, {**data, 'guest_count': 9}).status_code,
+            400,
+        )
+        self.assertEqual(self.client.post(url, data).status_code, 201)
+        self.client.force_login(self.guest)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('error', response.json())
+
+        self.client.force_login(self.other)
+        page = self.client.get(
+            reverse('create_booking', kwargs={'slug': self.room.slug}))
+        self.assertContains(page, 'data-hold-url="' + url)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 201)
+        token = response.json()['hold']
+        response = self.client.post(
+            reverse('create_booking', kwargs={'slug': self.room.slug}),
+            {**data, 'hold': token, 'idempotency_key': 'hold'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(BookingHold.objects.exists())
+        self.assertEqual(Booking.objects.get().guest, self.other)
+
+
+class AnalyticsRollupTest(TestCase):
+    """Тесты дневной сводки загрузки и выручки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = date(2026, 3, 1)
+        cls.hotel = Hotel.objects.create(
+            title='Аналитика', country='RU', city='Москва')
+        cls.room = create_room('analytics', price=1000)
+        cls.other = create_room('analytics-other', price=2000)
+        cls.room.hotel.add(cls.hotel)
+        cls.guest = create_guest()
+
+    def book(self, start, end, room=None, **kwargs):
+        booking = Booking.objects.create(
+            guest=self.guest,
+            room=room or self.room,
+            check_in_date=self.today + timedelta(days=start),
+            check_out_date=self.today + timedelta(days=end),
+                guest_count=kwargs.pop('guest_count', 1),
+            **kwargs,
+        )
+        run_pending_tasks()
+        return booking
+
+    def stats(self, room=None):
+        return list(
+            DailyRoomStat.objects.filter(room=room or self.room)
+            .values_list('date', 'nights', 'revenue', 'guests'))
+
+    def test_rollup_rows_split_revenue_and_clip_window(self):
+        """Тест деления выручки по ночам и обрезки по окну"""
+        day = self.today
+        stays = [
+            (1, day, day + timedelta(days=3), 1000, 2),
+            (1, day + timedelta(days=3), day + timedelta(days=5), 500, 1),
+            (2, day - timedelta(days=2), day + timedelta(days=2), 401, 1),
+        ]
+        rows = rollup_rows(stays, day, day + timedelta(days=4))
+        self.assertEqual(sorted(rows), [
+            (1, day, 1, 334, 2),
+            (1, day + timedelta(days=1), 1, 333, 2),
+            (1, day + timedelta(days=2), 1, 333, 2),
+            (1, day + timedelta(days=3), 1, 250, 1),
+            (2, day, 1, 100, 1),
+            (2, day + timedelta(days=1), 1, 100, 1),
+        ])
+
+    def test_booking_changes_update_rollup(self):
+        """Тест пересчёта сводки при создании, переносе и удалении брони"""
+        booking = self.book(0, 2, guest_count=2)
+        self.assertEqual(self.stats(), [
+            (self.today, 1, 1000, 2),
+            (self.today + timedelta(days=1), 1, 1000, 2),
+        ])
+        booking.room = self.other
+        booking.check_in_date = self.today + timedelta(days=5)
+        booking.check_out_date = self.today + timedelta(days=6)
+        booking.save()
+        run_pending_tasks()
+        self.assertEqual(self.stats(), [])
+        self.assertEqual(self.stats(self.other), [
+            (self.today + timedelta(days=5), 1, 2000, 2)])
+        booking.delete()
+        run_pending_tasks()
+        self.assertFalse(DailyRoomStat.objects.exists())
+
+    def test_archiving_keeps_rollup(self):
+        """Тест что перенос в архив не меняет сводку"""
+        self.book(0, 3)
+        expected = self.stats()
+        archive_bookings(self.today + timedelta(days=10))
+        run_pending_tasks()
+        self.assertEqual(ArchivedBooking.objects.count(), 1)
+        self.assertEqual(self.stats(), expected)
+        self.assertEqual(
+            rebuild_rollup(self.today, self.today + timedelta(days=3)), 3)
+        self.assertEqual(self.stats(), expected)
+
+    def test_reports(self):
+        """Тест загрузки, ADR и RevPAR по отелям, номерам и дням"""
+        self.book(0, 2)
+        self.book(3, 4, total_price=1600)
+        self.book(0, 1, room=self.other)
+        start, end = self.today, self.today + timedelta(days=4)
+        hotels = {row['id']: row for row in hotel_report(start, end)}
+        self.assertEqual(hotels[self.hotel.pk]['rooms'], 1)
+        self.assertEqual(hotels[self.hotel.pk]['sold'], 3)
+        self.assertEqual(hotels[self.hotel.pk]['available'], 4)
+        self.assertEqual(hotels[self.hotel.pk]['occupancy'], 0.75)
+        self.assertEqual(hotels[self.hotel.pk]['adr'], 3600 / 3)
+        self.assertEqual(hotels[self.hotel.pk]['revpar'], 900)
+        rooms = {row['id']: row for row in room_report(start, end)}
+        self.assertEqual(rooms[self.other.pk]['revenue'], 2000)
+        self.assertEqual(
+            [row['id'] for row in room_report(start, end, self.hotel)],
+            [self.room.pk],
+        )
+        days = day_report(start, end, self.hotel)
+        self.assertEqual(
+            [row['sold'] for row in days], [1, 1, 0, 1])
+        self.assertEqual(days[2]['adr'], 0)
+
+    def test_command_rebuilds_and_reports(self):
+        """Тест полной перестройки сводки и вывода отчёта командой"""
+        self.book(0, 2)
+        self.book(1, 3, room=self.other)
+        expected = sorted(DailyRoomStat.objects.values_list(
+            'room', 'date', 'nights', 'revenue', 'guests'))
+        DailyRoomStat.objects.all().delete()
+        DailyRoomStat.objects.create(
+            room=self.room, date=date(2020, 1, 1), revenue=1)
+        out = StringIO()
+        call_command('rollup_analytics', rebuild=True, stdout=out)
+        self.assertIn('4', out.getvalue())
+        self.assertEqual(sorted(DailyRoomStat.objects.values_list(
+            'room', 'date', 'nights', 'revenue', 'guests')), expected)
+        out = StringIO()
+        call_command(
+            'rollup_analytics', report='hotels', year=2026, stdout=out,
+            stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            [row['sold'] for row in report if row['id'] == self.hotel.pk],
+            [2])
+
+    def test_admin_report(self):
+        """Тест отчёта в админке: HTML и JSON"""
+        self.book(0, 2)
+        admin = User.objects.create(
+            email='admin@example.com', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        url = reverse('admin:booking_dailyroomstat_report')
+        response = self.client.get(url, {'year': 2026})
+        self.assertContains(response, self.hotel.title)
+        self.assertEqual(response.context['report']['rooms'], [])
+        response = self.client.get(
+            url, {'year': 2026, 'hotel': self.hotel.pk, 'format': 'json'})
+        report = response.json()
+        self.assertEqual(len(report['days']), 365)
+        self.assertEqual(
+            [(row['id'], row['sold']) for row in report['rooms']],
+            [(self.room.pk, 2)],
+        )
+        self.client.force_login(self.guest)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class RoomCalendarTest(TestCase):
+    """Тесты календаря занятости номеров"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = create_room('calendar')
+        cls.other = create_room('calendar-other')
+        cls.guest = create_guest()
+
+    def setUp(self):
+        cache.clear()
+        self.month = timezone.localdate().replace(day=1)
+
+    def book(self, start, end, room=None):
+        booking = Booking.objects.create(
+            guest=self.guest,
+            room=room or self.room,
+            check_in_date=self.month + timedelta(days=start),
+            check_out_date=self.month + timedelta(days=end),
+            guest_count=1,
+        )
+        run_pending_tasks()
+        return booking
+
+    def masks(self, room=None, months=2):
+        return get_calendars(
+            [(room or self.room).pk], self.month, months)[
+                (room or self.room).pk]
+
+    def test_booking_changes_update_masks(self):
+        """Тест масок при создании, переносе через месяц и удалении"""
+        booking = self.book(1, 4)
+        self.assertEqual(self.masks(), [0b1110, 0])
+        next_month = add_months(self.month, 1)
+        booking.check_in_date = next_month - timedelta(days=1)
+        booking.check_out_date = next_month + timedelta(days=2)
+        booking.save()
+        run_pending_tasks()
+        last_day = (next_month - timedelta(days=1)).day
+        self.assertEqual(self.masks(), [1 << (last_day - 1), 0b11])
+        self.assertEqual(RoomCalendarMonth.objects.count(), 2)
+        booking.delete()
+        run_pending_tasks()
+        self.assertEqual(self.masks(), [0, 0])
+        self.assertFalse(RoomCalendarMonth.objects.exists())
+
+    def test_masks_are_cached(self):
+        """Тест что повторное чтение календарей не ходит в БД"""
+        self.book(0, 2)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.masks()
+        with self.assertNumQueries(0):
+            self.masks()
+
+    def test_room_endpoint(self):
+        """Тест JSON календаря номера"""
+        self.book(0, 2)
+        url = reverse('room_calendar', kwargs={'slug': self.room.slug})
+        response = self.client.get(url, {'months': 3})
+        self.assertEqual(response.json(), {
+            'start': f'{self.month:%Y-%m}', 'months': [0b11, 0, 0]})
+        self.assertLess(len(response.content), 100)
+        self.assertIn('max-age', response['Cache-Control'])
+        response = self.client.get(url, {'start': 'май'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse('room_calendar', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_endpoint(self):
+        """Тест календарей нескольких номеров одним запросом"""
+        self.book(0, 1)
+        self.book(1, 2, room=self.other)
+        url = reverse('room_calendars')
+        params = {
+            'room': [self.room.slug, self.other.slug, 'missing'],
+            'months': 1,
+        }
+        self.client.get(url, params)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, params)
+        self.assertEqual(response.json()['rooms'], {
+            self.room.slug: [0b1], self.other.slug: [0b10]})
+
+    def test_rebuild_command(self):
+        """Тест построения календарей заново по реестру ночей"""
+        self.book(0, 3)
+        self.book(5, 6, room=self.other)
+        expected = sorted(RoomCalendarMonth.objects.values_list(
+            'room', 'month', 'booked'))
+        RoomCalendarMonth.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_room_calendars', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(sorted(RoomCalendarMonth.objects.values_list(
+            'room', 'month', 'booked')), expected)
+
+    def test_booking_page_links_calendar(self):
+        """Тест что форма бронирования подключает календарь"""
+        self.client.force_login(self.guest)
+        response = self.client.get(
+            reverse('create_booking', kwargs={'slug': self.room.slug}))
+        self.assertContains(
+            response,
+            reverse('room_calendar', kwargs={'slug': self.room.slug}))
+        self.assertContains(response, 'booking_calendar.js')
+
+
+class SeedAndBenchmarkTest(TestCase):
+    """Тесты генератора данных и сценарных замеров"""
+
+    def setUp(self):
+        call_command(
+            'seed_data', scale=0.05, seed=1, stdout=StringIO())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_seed_creates_consistent_data(self):
+        """Тест объёмов и согласованности реестра ночей"""
+        self.assertEqual(Hotel.objects.count(), 1)
+        self.assertEqual(HotelRoom.objects.count(), 5)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Booking.objects.count(), 100)
+        nights = sum(booking.nights for booking in Booking.objects.all())
+        self.assertEqual(RoomNight.objects.count(), nights)
+        self.assertFalse(Booking.objects.filter(
+            guest_count__gt=F('room__max_number_of_guests')).exists())
+
+    def test_benchmarks_report_and_detect_regressions(self):
+        """Тест отчёта перцентилей и проверки по базе"""
+        baseline = os.path.join(self.directory, 'baseline.json')
+        out = StringIO()
+        call_command(
+            'run_benchmarks', iterations=3, warmup=1,
+            save_baseline=baseline, stdout=out,
+        )
+        with open(baseline) as file:
+            results = json.load(file)
+        self.assertEqual(results['browse_list']['samples'], 3)
+        self.assertEqual(results['create_booking']['errors'], 0)
+        self.assertIn('open_profile', out.getvalue())
+        for result in results.values():
+            result['queries'] = 0
+        with open(baseline, 'w') as file:
+            json.dump(results, file)
+        with self.assertRaisesMessage(CommandError, 'Регрессия'):
+            call_command(
+                'run_benchmarks', iterations=1, warmup=0,
+                scenario=['room_detail'], baseline=baseline,
+                stdout=StringIO(),
+            )
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """Нагрузочный тест параллельных бронирований одного номера"""
+
+    threads = 8
+
+    def test_only_one_overlapping_booking_wins(self):
+        """Тест что из пересекающихся броней проходит ровно одна"""
+        today = timezone.now().date()
+        room = create_room()
+        guests = [
+            create_guest(f'guest{number}@example.com')
+            for number in range(self.threads)
+        ]
+        barrier = threading.Barrier(self.threads)
+        results = []
+
+        def book(guest, offset):
+            barrier.wait()
+            try:
+                for _ in range(50):
+                    try:
+                        Booking.objects.create(
+                            guest=guest,
+                            room=room,
+                            check_in_date=today + timedelta(days=offset),
+                            check_out_date=today + timedelta(days=offset + 3),
+                            guest_count=1,
+                        )
+                        results.append('ok')
+                        return
+                    except BookingConflictError:
+                        results.append('conflict')
+                        return
+                    except OperationalError:
+                        # SQLite отдаёт "database is locked" под нагрузкой
+                        continue
+                results.append('locked')
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=book, args=(guest, number % 2))
+            for number, guest in enumerate(guests)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(results), self.threads)
+        self.assertEqual(results.count('ok'), 1)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(RoomNight.objects.count(), 3)
+
+
+class ConcurrentBookingServiceTest(TransactionTestCase):
+    """Нагрузочный тест сервиса бронирования на одном номере"""
+
+    threads = 8
+    nights = 10
+
+    def run_threads(self, target, args):
+        barrier = threading.Barrier(len(args))
+
+        def run(*arguments):
+            barrier.wait()
+            try:
+                target(*arguments)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=run, args=arguments)
+            for arguments in args
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    @mock.patch('booking.services.BOOKING_RETRY_ATTEMPTS', 100)
+    @mock.patch('booking.services.BOOKING_RETRY_BACKOFF', 0.001)
+    def test_one_winner_per_night(self):
+        """Тест что каждую ночь получает ровно один поток"""
+        today = timezone.now().date()
+        room = create_room()
+        guests = [
+            create_guest(f'guest{number}@example.com')
+            for number in range(self.threads)
+        ]
+        results = []
+
+        def book(guest, seed):
+            offsets = list(range(self.nights))
+            random.Random(seed).shuffle(offsets)
+            for offset in offsets:
+                try:
+                    booking, _ = create_booking(
+                        room=room,
+                        guest=guest,
+                        check_in_date=today + timedelta(days=offset + 1),
+                        check_out_date=today + timedelta(days=offset + 2),
+                        guest_count=1,
+                        idempotency_key=f'{guest.pk}-{offset}',
+                    )
+                    results.append(('ok', booking.check_in_date))
+                except BookingConflictError:
+                    results.append(('conflict', offset))
+                except BookingBusyError:
+                    results.append(('busy', offset))
+
+        self.run_threads(
+            book, [(guest, number) for number, guest in enumerate(guests)])
+
+        outcomes = [outcome for outcome, _ in results]
+        self.assertEqual(len(results), self.threads * self.nights)
+        self.assertNotIn('busy', outcomes)
+        winners = sorted(
+            night for outcome, night in results if outcome == 'ok')
+        self.assertEqual(winners, [
+            today + timedelta(days=offset + 1)
+            for offset in range(self.nights)
+        ])
+        self.assertEqual(
+            sorted(Booking.objects.values_list('check_in_date', flat=True)),
+            winners,
+        )
+        self.assertEqual(RoomNight.objects.count(), self.nights)
+
+    @mock.patch('booking.services.BOOKING_RETRY_ATTEMPTS', 100)
+    @mock.patch('booking.services.BOOKING_RETRY_BACKOFF', 0.001)
+    def test_parallel_replays_create_one_booking(self):
+        """Тест что параллельные повторы одной формы дают одну бронь"""
+        today = timezone.now().date()
+        room = create_room()
+        guest = create_guest()
+        results = []
+
+        def book():
+            results.append(create_booking(
+                room=room,
+                guest=guest,
+                check_in_date=today + timedelta(days=1),
+                check_out_date=today + timedelta(days=4),
+                guest_count=1,
+                idempotency_key='double-submit',
+            ))
+
+        self.run_threads(book, [()] * self.threads)
+
+        self.assertEqual(len(results), self.threads)
+        self.assertEqual(len({booking.pk for booking, _ in results}), 1)
+        self.assertEqual([created for _, created in results].count(True), 1)
+        self.assertEqual(Booking.objects.count(), 1)
@@ -5,4 +5,7 @@ from . import views
 
 urlpatterns = [
     path('create/<slug:slug>/', views.BookingCreateView.as_view(), name='create_booking'),
+    path('hold/<slug:slug>/', views.hold_room, name='hold_room'),
+    path('calendar/', views.room_calendars, name='room_calendars'),
+    path('calendar/<slug:slug>/', views.room_calendar, name='room_calendar'),
 ]
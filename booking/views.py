@@ -1,12 +1,37 @@
+import uuid
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import (
     CreateView,
 )
 from django.urls import reverse_lazy
 
+from .availability import get_calendars, month_start
 from .forms import BookingCreateForm
-from .models import Booking
+from .models import Booking, BookingBusyError, BookingConflictError
+from .services import create_booking, take_hold
+from catalog.forms import StayDatesForm
 from catalog.models import HotelRoom
+from catalog.pricing import quote_stay, room_rates
+from hotel.constants import (
+    CALENDAR_BATCH_LIMIT,
+    CALENDAR_DEFAULT_MONTHS,
+    CALENDAR_HTTP_MAX_AGE,
+    CALENDAR_MAX_MONTHS,
+)
+from hotel.metrics import registry
+
+
+BOOKING_RESULTS = registry.counter(
+    'booking_requests_total', 'Попытки бронирования по результату.',
+    ('result',),
+)
 
 
 class BookingCreateView(CreateView):
@@ -16,10 +41,32 @@ class BookingCreateView(CreateView):
     success_url = reverse_lazy('profile')
 
     def get_room(self):
-        return get_object_or_404(
-            HotelRoom,
-            slug=self.kwargs['slug']
-        )
+        if not hasattr(self, 'room'):
+            self.room = get_object_or_404(
+                HotelRoom,
+                slug=self.kwargs['slug']
+            )
+        return self.room
+
+    def get_initial(self):
+        # Даты, выбранные на странице номера: ?check_in=&check_out=
+        initial = super().get_initial()
+        stay = StayDatesForm(self.request.GET)
+        if stay.is_valid():
+            initial['check_in_date'] = stay.cleaned_data['check_in']
+            initial['check_out_date'] = stay.cleaned_data['check_out']
+        return initial
+
+    def get_quote(self, form):
+        """Стоимость на даты формы, её же спишет create_booking()."""
+        if hasattr(form, 'quote'):
+            # Посчитана при проверке отправленной формы
+            return form.quote
+        check_in = form.initial.get('check_in_date')
+        check_out = form.initial.get('check_out_date')
+        if check_in and check_out:
+            return quote_stay(self.get_room(), check_in, check_out)
+        return None
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -30,11 +77,126 @@ class BookingCreateView(CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['room'] = self.get_room()
+        context['rates'] = room_rates(context['room'])
+        context['quote'] = self.get_quote(context['form'])
+        context['calendar_months'] = CALENDAR_DEFAULT_MONTHS
+        # При повторном показе формы ключ сохраняется: бронь по нему
+        # не создана или создана с теми же данными
+        context['idempotency_key'] = (
+            context['form']['idempotency_key'].value() or uuid.uuid4().hex)
         return context
 
     def form_valid(self, form):
-        booking = form.save(commit=False)
-        booking.room = form.room
-        booking.guest = form.guest
-        booking.save()
-        return super().form_valid(form)
+        data = form.cleaned_data
+        try:
+            booking, created = create_booking(
+                room=form.room,
+                guest=form.guest,
+                check_in_date=data['check_in_date'],
+                check_out_date=data['check_out_date'],
+                guest_count=data['guest_count'],
+                idempotency_key=data['idempotency_key'],
+                hold_token=data['hold'],
+            )
+        except ValidationError as error:
+            BOOKING_RESULTS.inc(result=booking_error_result(error))
+            form.add_error(None, error)
+            return self.form_invalid(form)
+        BOOKING_RESULTS.inc(result='created' if created else 'replayed')
+        self.object = booking
+        return HttpResponseRedirect(self.get_success_url())
+
+
+@require_POST
+def hold_room(request, slug):
+    """Удерживает выбранные в форме даты номера, пока гость её заполняет."""
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'error': 'Войдите, чтобы забронировать номер'}, status=403)
+    room = get_object_or_404(HotelRoom, slug=slug)
+    form = BookingCreateForm(request.POST, room=room, guest=request.user)
+    if not form.is_valid():
+        return JsonResponse(
+            {'errors': form.errors.get_json_data()}, status=400)
+    try:
+        hold = take_hold(
+            room,
+            request.user,
+            form.cleaned_data['check_in_date'],
+            form.cleaned_data['check_out_date'],
+        )
+    except BookingConflictError as error:
+        return JsonResponse({'error': error.messages[0]}, status=409)
+    except BookingBusyError as error:
+        return JsonResponse({'error': error.messages[0]}, status=503)
+    # Стоимость выбранных дат показывается до отправки формы
+    return JsonResponse({
+        'hold': hold.token,
+        'expires_at': hold.expires_at,
+        'total': form.quote.total,
+        'nights': form.quote.nights,
+    }, status=201)
+
+
+def booking_error_result(error):
+    if isinstance(error, BookingConflictError):
+        return 'conflict'
+    if isinstance(error, BookingBusyError):
+        return 'busy'
+    return 'invalid'
+
+
+def calendar_period(request):
+    """Первый месяц (?start=ГГГГ-ММ) и число месяцев (?months=)."""
+    start = request.GET.get('start')
+    months = request.GET.get('months', '')
+    try:
+        start = (
+            date.fromisoformat(f'{start}-01') if start
+            else month_start(timezone.localdate())
+        )
+    except ValueError:
+        return None, None
+    months = int(months) if months.isdigit() else CALENDAR_DEFAULT_MONTHS
+    return start, min(max(months, 1), CALENDAR_MAX_MONTHS)
+
+
+def calendar_response(start, data):
+    response = JsonResponse({'start': f'{start:%Y-%m}', **data})
+    patch_cache_control(response, public=True, max_age=CALENDAR_HTTP_MAX_AGE)
+    return response
+
+
+def invalid_period():
+    return JsonResponse(
+        {'error': 'start должен быть в формате ГГГГ-ММ'}, status=400)
+
+
+@require_GET
+def room_calendar(request, slug):
+    """Занятые ночи номера: маска на месяц, бит d - 1 - d-е число."""
+    room_id = get_object_or_404(
+        HotelRoom.objects.values_list('pk', flat=True), slug=slug)
+    start, months = calendar_period(request)
+    if start is None:
+        return invalid_period()
+    return calendar_response(start, {
+        'months': get_calendars([room_id], start, months)[room_id],
+    })
+
+
+@require_GET
+def room_calendars(request):
+    """Календари нескольких номеров: ?room=слаг&room=слаг..."""
+    slugs = request.GET.getlist('room')[:CALENDAR_BATCH_LIMIT]
+    start, months = calendar_period(request)
+    if start is None:
+        return invalid_period()
+    rooms = dict(
+        HotelRoom.objects.filter(slug__in=slugs).values_list('pk', 'slug'))
+    calendars = get_calendars(list(rooms), start, months)
+    return calendar_response(start, {
+        'rooms': {
+            rooms[room_id]: masks for room_id, masks in calendars.items()
+        },
+    })
@@ -1,12 +1,21 @@
 from django.contrib import admin
 
-from catalog.models import Hotel, HotelRoom
+from catalog.models import Hotel, HotelRoom, RoomRate
 
 
 class HotelRoomInstanceInline(admin.StackedInline):
     model = HotelRoom
 
 
+class RoomRateInline(admin.TabularInline):
+    model = RoomRate
+    extra = 0
+    fields = (
+        'title', 'start_date', 'end_date', 'price', 'weekend_price',
+        'min_stay', 'priority',
+    )
+
+
 @admin.register(Hotel)
 class HotelAdmin(admin.ModelAdmin):
     list_display = ('title', 'country', 'city')
@@ -17,3 +26,16 @@ class HotelAdmin(admin.ModelAdmin):
 class HotelRoomAdmin(admin.ModelAdmin):
     list_display = ('title', 'max_number_of_guests', 'price')
     list_filter = ('hotel', 'max_number_of_guests', 'price')
+    inlines = (RoomRateInline,)
+
+
+@admin.register(RoomRate)
+class RoomRateAdmin(admin.ModelAdmin):
+    list_display = (
+        'room', 'title', 'start_date', 'end_date', 'price', 'weekend_price',
+        'min_stay', 'priority',
+    )
+    list_select_related = ('room',)
+    list_filter = ('start_date', 'min_stay')
+    search_fields = ('room__title', 'title')
+    date_hierarchy = 'start_date'
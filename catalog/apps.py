@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def setup_search_index(sender, using='default', **kwargs):
+    from .search import get_search_backend
+
+    get_search_backend(using).setup()
 
 
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(setup_search_index, sender=self)
@@ -0,0 +1,116 @@
+"""Async-версии представлений каталога для ASGI.
+
+Подключаются через hotel.urls_async, который hotel.asgi задаёт для
+запросов ASGI. Логика фильтров, кеша и пагинации общая с синхронными
+представлениями, отличаются только чтение из БД и рендеринг.
+
+Ограничения Django 4.2: async ORM выполняет SQL через sync_to_async,
+поэтому выигрыш в том, что ожидание БД не держит поток воркера,
+а не в отсутствии потоков. Шаблоны рендерятся прямо в цикле событий:
+всё, что читает шаблон, загружено заранее.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+
+from hotel.constants import CATALOG_FRAGMENT_CACHE_TIMEOUT
+
+from .cache import attach_room_versions
+from .facets import aget_facet_index
+from .models import Hotel
+from .views import HotelList, HotelRoomDetailView, HotelRoomListView
+
+
+def fragment_cache():
+    # Тот же кеш, что у тега {% cache %}
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+class AsyncRenderMixin:
+
+    def render_page(self, context):
+        started = time.perf_counter()
+        content = render_to_string(
+            self.get_template_names(), context, self.request)
+        self.request.template_render_time = time.perf_counter() - started
+        return HttpResponse(content)
+
+
+class AsyncHotelRoomListView(AsyncRenderMixin, HotelRoomListView):
+
+    async def get(self, request, *args, **kwargs):
+        form = self.get_search_form()
+        # Список отелей нужен полю формы и при проверке, и при выводе
+        form.use_hotels([hotel async for hotel in Hotel.objects.all()])
+        self.object_list = self.get_queryset()
+        paginator = self.get_cursor_paginator(
+            self.object_list, self.get_paginate_by(self.object_list))
+        page = await paginator.aget_page(request.GET.get(self.cursor_kwarg))
+        rooms = attach_room_versions(page.object_list)
+        await sync_to_async(self.attach_quotes)(rooms)
+        room_ids = self.get_facet_room_ids_queryset()
+        if room_ids is not None:
+            room_ids = [pk async for pk in room_ids]
+        facets = self.get_facet_selection().facets(
+            await aget_facet_index(), room_ids)
+        return self.render_page({
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'object_list': rooms,
+            'rooms': rooms,
+            'query_params': self.get_query_params(),
+            'search_form': form,
+            'facets': facets,
+            'fragment_cache_timeout': CATALOG_FRAGMENT_CACHE_TIMEOUT,
+        })
+
+
+class AsyncHotelRoomDetailView(AsyncRenderMixin, HotelRoomDetailView):
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.object = await self.get_queryset().aget(slug=kwargs['slug'])
+        except self.model.DoesNotExist:
+            raise Http404('Номер не найден')
+        attach_room_versions([self.object])
+        fragment = make_template_fragment_key(
+            'room_hotels', [self.object.pk, self.object.cache_version])
+        # Отели нужны шаблону только при промахе фрагмента
+        if fragment_cache().get(fragment) is None:
+            await sync_to_async(prefetch_related_objects)(
+                [self.object], 'hotel')
+        return self.render_page({
+            'view': self,
+            'object': self.object,
+            'room': self.object,
+            'fragment_cache_timeout': CATALOG_FRAGMENT_CACHE_TIMEOUT,
+            **await sync_to_async(self.get_pricing)(),
+        })
+
+
+class AsyncHotelList(AsyncRenderMixin, HotelList):
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        paginator = self.get_cursor_paginator(
+            self.object_list, self.get_paginate_by(self.object_list))
+        page = await paginator.aget_page(request.GET.get(self.cursor_kwarg))
+        return self.render_page({
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'object_list': page.object_list,
+            'hotels': page.object_list,
+            'query_params': self.get_query_params(),
+        })
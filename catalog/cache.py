@@ -0,0 +1,189 @@
+"""Кеширование страниц и фрагментов каталога.
+
+Ключи кеша содержат версии: общую версию списка номеров, списка отелей
+и версию каждого номера. Сигналы увеличивают только затронутые версии,
+поэтому старые записи просто перестают читаться и вытесняются по TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from hotel.async_auth import aload_session_and_user
+from hotel.constants import CATALOG_PAGE_CACHE_TIMEOUT
+from hotel.metrics import format_labels, registry
+
+
+ROOM_LIST_VERSION = 'catalog:version:rooms'
+HOTEL_LIST_VERSION = 'catalog:version:hotels'
+
+
+def room_version_key(slug):
+    return f'catalog:version:room:{slug}'
+
+
+def get_versions(keys):
+    """Текущие версии по ключам; отсутствующие создаются."""
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        # Версия от времени, а не 1: после вытеснения ключа версии
+        # старые страницы не должны снова стать актуальными
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    # Ключ, вытесненный сразу после add, даёт новую версию - промах
+    return [versions.get(key) or time.time_ns() for key in keys]
+
+
+def bump_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def attach_room_versions(rooms):
+    """Проставляет номерам cache_version одним обращением к кешу."""
+    rooms = list(rooms)
+    versions = get_versions([room_version_key(room.slug) for room in rooms])
+    for room, version in zip(rooms, versions):
+        room.cache_version = version
+    return rooms
+
+
+class CacheStats:
+    """Счётчики попаданий и промахов по представлениям в процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def record(self, name, hit):
+        with self._lock:
+            (self.hits if hit else self.misses)[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {'hits': self.hits[name], 'misses': self.misses[name]}
+                for name in set(self.hits) | set(self.misses)
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+
+
+cache_stats = CacheStats()
+
+
+def cache_metrics():
+    """Попадания в кеш страниц и их доля для /metrics."""
+    name = 'catalog_page_cache_requests_total'
+    ratio = 'catalog_page_cache_hit_ratio'
+    requests = [
+        f'# HELP {name} Обращения к кешу страниц каталога.',
+        f'# TYPE {name} counter',
+    ]
+    ratios = [
+        f'# HELP {ratio} Доля попаданий в кеш страниц каталога.',
+        f'# TYPE {ratio} gauge',
+    ]
+    for view, stats in sorted(cache_stats.snapshot().items()):
+        for result in ('hits', 'misses'):
+            labels = format_labels(('view', 'result'), (view, result))
+            requests.append(f'{name}{labels} {stats[result]}')
+        total = stats['hits'] + stats['misses']
+        labels = format_labels(('view',), (view,))
+        ratios.append(f'{ratio}{labels} {stats["hits"] / total}')
+    return requests + ratios
+
+
+registry.add_collector(cache_metrics)
+
+
+class PageCacheMixin:
+    """Кеширует отрендеренную страницу по пути, состоянию входа и версиям.
+
+    Отключается атрибутом page_cache = False или именем URL в настройке
+    CATALOG_PAGE_CACHE_DISABLED.
+    """
+
+    page_cache = True
+    page_cache_timeout = CATALOG_PAGE_CACHE_TIMEOUT
+
+    def get_cache_version_keys(self):
+        raise NotImplementedError
+
+    def page_cache_enabled(self, request):
+        url_name = request.resolver_match.url_name
+        return (
+            self.page_cache
+            and request.method == 'GET'
+            and url_name not in getattr(
+                settings, 'CATALOG_PAGE_CACHE_DISABLED', ())
+        )
+
+    def get_page_cache_key(self, request):
+        auth = 'auth' if request.user.is_authenticated else 'anon'
+        versions = get_versions(self.get_cache_version_keys())
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return 'catalog:page:{}:{}:{}:{}'.format(
+            request.resolver_match.url_name, auth, path,
+            '.'.join(str(version) for version in versions),
+        )
+
+    def get_cached_response(self, request):
+        """Ключ страницы и ответ из кеша (или None при промахе)."""
+        name = request.resolver_match.url_name
+        key = self.get_page_cache_key(request)
+        cached = cache.get(key)
+        cache_stats.record(name, hit=cached is not None)
+        if cached is None:
+            return key, None
+        content, content_type = cached
+        return key, HttpResponse(content, content_type=content_type)
+
+    def cache_response(self, request, key, response):
+        if hasattr(response, 'render') and not response.is_rendered:
+            started = time.perf_counter()
+            response.render()
+            request.template_render_time = time.perf_counter() - started
+        if response.status_code == 200 and not response.cookies:
+            cache.set(
+                key,
+                (response.content, response['Content-Type']),
+                self.page_cache_timeout,
+            )
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        if not self.page_cache_enabled(request):
+            return super().dispatch(request, *args, **kwargs)
+        key, cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+        response = super().dispatch(request, *args, **kwargs)
+        return self.cache_response(request, key, response)
+
+    async def adispatch(self, request, *args, **kwargs):
+        # Ключ зависит от входа пользователя; кеш страниц в памяти
+        # процесса, обращения к нему идут без перехода в поток
+        await aload_session_and_user(request)
+        if not self.page_cache_enabled(request):
+            return await super().dispatch(request, *args, **kwargs)
+        key, cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+        response = await super().dispatch(request, *args, **kwargs)
+        return self.cache_response(request, key, response)
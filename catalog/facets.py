@@ -0,0 +1,207 @@
+"""Фасетные фильтры каталога со счётчиками.
+
+Индекс фасетов строится одним запросом: для каждого фасета - номера
+по значениям. Каждый фасет кешируется отдельной записью и сбрасывается
+сигналами при изменении номеров и отелей. Счётчики считаются
+пересечением множеств номеров в памяти, без GROUP BY на каждый фасет,
+и только по номерам, прошедшим остальные фильтры списка.
+"""
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+
+from hotel.constants import FACET_INDEX_CACHE_TIMEOUT, PRICE_BANDS
+
+from .models import Hotel, HotelRoom
+
+
+FACET_CACHE_KEY = 'catalog:facet:{}'
+
+# Имена GET-параметров не пересекаются с полями AvailabilitySearchForm
+FACETS = (
+    ('country', 'Страна'),
+    ('location', 'Город'),
+    ('price', 'Цена за ночь'),
+    ('capacity', 'Гостей'),
+)
+
+
+@dataclass
+class FacetValue:
+    value: str
+    label: str
+    count: int
+    selected: bool
+
+
+def price_band(price):
+    for key, low, high, _ in PRICE_BANDS:
+        if price >= low and (high is None or price < high):
+            return key
+    return None
+
+
+def facet_cache_keys():
+    return {facet: FACET_CACHE_KEY.format(facet) for facet, _ in FACETS}
+
+
+def facet_index_rows():
+    return HotelRoom.objects.order_by().values_list(
+        'pk', 'price', 'max_number_of_guests',
+        'hotel__country', 'hotel__city',
+    )
+
+
+def build_facet_index(rows=None):
+    """Одним запросом собирает {фасет: {значение: frozenset(id номеров)}}."""
+    if rows is None:
+        rows = facet_index_rows()
+    index = {facet: {} for facet, _ in FACETS}
+    for room_id, price, guests, country, city in rows:
+        values = [('price', price_band(price)), ('capacity', str(guests))]
+        if country:
+            values += [('country', country), ('location', city)]
+        for facet, value in values:
+            if value is not None:
+                index[facet].setdefault(value, set()).add(room_id)
+    return {
+        facet: {value: frozenset(ids) for value, ids in values.items()}
+        for facet, values in index.items()
+    }
+
+
+def cached_facet_index():
+    keys = facet_cache_keys()
+    cached = cache.get_many(keys.values())
+    if len(cached) < len(keys):
+        return None
+    return {facet: cached[key] for facet, key in keys.items()}
+
+
+def cache_facet_index(index):
+    cache.set_many(
+        {key: index[facet] for facet, key in facet_cache_keys().items()},
+        FACET_INDEX_CACHE_TIMEOUT,
+    )
+
+
+def get_facet_index():
+    index = cached_facet_index()
+    if index is None:
+        index = build_facet_index()
+        cache_facet_index(index)
+    return index
+
+
+async def aget_facet_index():
+    index = cached_facet_index()
+    if index is None:
+        index = build_facet_index([row async for row in facet_index_rows()])
+        cache_facet_index(index)
+    return index
+
+
+def invalidate_facet_index():
+    cache.delete_many(facet_cache_keys().values())
+
+
+class FacetSelection:
+    """Выбранные значения фасетов из GET-параметров.
+
+    Внутри фасета значения объединяются через ИЛИ, между фасетами - И.
+    """
+
+    def __init__(self, params):
+        self.selected = {
+            facet: frozenset(value for value in params.getlist(facet) if value)
+            for facet, _ in FACETS
+        }
+
+    def __bool__(self):
+        return any(self.selected.values())
+
+    def matched(self, index, facet):
+        """Номера с любым из выбранных значений фасета; None - не выбран."""
+        chosen = self.selected[facet]
+        if not chosen:
+            return None
+        values = index[facet]
+        return frozenset().union(
+            *(values[value] for value in chosen if value in values))
+
+    def counts(self, index=None, room_ids=None):
+        """Счётчики по значениям каждого фасета с учётом прочих фасетов.
+
+        room_ids - номера, прошедшие остальные фильтры списка, например
+        поиск по датам; None - весь каталог.
+        """
+        index = get_facet_index() if index is None else index
+        matched = {facet: self.matched(index, facet) for facet, _ in FACETS}
+        counts = {}
+        for facet, _ in FACETS:
+            # Свой фасет не сужает собственные счётчики
+            rooms = None if room_ids is None else frozenset(room_ids)
+            for other, _ in FACETS:
+                if other != facet and matched[other] is not None:
+                    rooms = (
+                        matched[other] if rooms is None
+                        else rooms & matched[other])
+            facet_counts = counts[facet] = {}
+            for value, ids in index[facet].items():
+                count = len(ids if rooms is None else ids & rooms)
+                if count:
+                    facet_counts[value] = count
+        return counts
+
+    def facets(self, index=None, room_ids=None):
+        counts = self.counts(index, room_ids)
+        labels = {
+            'country': dict(Hotel.COUNTRY_CHOICES),
+            'price': {key: label for key, _, _, label in PRICE_BANDS},
+        }
+        order = {
+            'price': [key for key, _, _, _ in PRICE_BANDS],
+        }
+        result = []
+        for facet, title in FACETS:
+            values = counts[facet]
+            keys = order.get(facet) or sorted(
+                set(values) | self.selected[facet])
+            result.append((facet, title, [
+                FacetValue(
+                    value=key,
+                    label=labels.get(facet, {}).get(key, key),
+                    count=values.get(key, 0),
+                    selected=key in self.selected[facet],
+                )
+                for key in keys
+                if key in values or key in self.selected[facet]
+            ]))
+        return result
+
+    def filter_queryset(self, queryset):
+        selected = self.selected
+        if selected['price']:
+            bands = Q()
+            for key, low, high, _ in PRICE_BANDS:
+                if key in selected['price']:
+                    band = Q(price__gte=low)
+                    if high is not None:
+                        band &= Q(price__lt=high)
+                    bands |= band
+            queryset = queryset.filter(bands) if bands else queryset.none()
+        if selected['capacity']:
+            queryset = queryset.filter(max_number_of_guests__in=[
+                int(value) for value in selected['capacity'] if value.isdigit()
+            ])
+        if selected['country'] or selected['location']:
+            links = HotelRoom.hotel.through.objects.filter(
+                hotelroom=OuterRef('pk'))
+            if selected['country']:
+                queryset = queryset.filter(Exists(
+                    links.filter(hotel__country__in=selected['country'])))
+            if selected['location']:
+                queryset = queryset.filter(Exists(
+                    links.filter(hotel__city__in=selected['location'])))
+        return queryset
@@ -0,0 +1,92 @@
+from django import forms
+from django.utils import timezone
+
+from hotel.constants import CITY_MAX_LENGTH, MAX_GUESTS_VALUE
+
+from .models import Hotel
+
+
+class HotelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField, который может работать по уже загруженным отелям."""
+
+    hotels = None
+
+    def to_python(self, value):
+        if self.hotels is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            return self.hotels[str(value)]
+        except KeyError:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
+class StayDatesForm(forms.Form):
+    """Даты проживания: поиск свободных номеров и расчёт стоимости."""
+
+    check_in = forms.DateField(
+        label='Дата заселения',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    check_out = forms.DateField(
+        label='Дата выезда',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        today = timezone.now().date().isoformat()
+        self.fields['check_in'].widget.attrs.setdefault('min', today)
+        self.fields['check_out'].widget.attrs.setdefault('min', today)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get('check_in')
+        check_out = cleaned_data.get('check_out')
+        if check_in and check_out and check_in >= check_out:
+            raise forms.ValidationError(
+                'Дата выезда должна быть позже даты заселения')
+        return cleaned_data
+
+
+class AvailabilitySearchForm(StayDatesForm):
+    guests = forms.IntegerField(
+        label='Гостей',
+        min_value=1,
+        max_value=MAX_GUESTS_VALUE,
+        initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    hotel = HotelChoiceField(
+        label='Отель',
+        queryset=Hotel.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    city = forms.CharField(
+        label='Город',
+        max_length=CITY_MAX_LENGTH,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+
+    def use_hotels(self, hotels):
+        """Проверка и вывод поля hotel по загруженным отелям, без БД."""
+        field = self.fields['hotel']
+        field.hotels = {str(hotel.pk): hotel for hotel in hotels}
+        field.choices = [('', field.empty_label)] + [
+            (hotel.pk, field.label_from_instance(hotel)) for hotel in hotels
+        ]
+
+    def filter_queryset(self, queryset):
+        """Применяет параметры поиска к queryset номеров."""
+        data = self.cleaned_data
+        queryset = queryset.available(
+            data['check_in'], data['check_out'], data['guests']
+        )
+        if data.get('hotel') or data.get('city'):
+            queryset = queryset.in_hotel(data.get('hotel'), data.get('city'))
+        return queryset
@@ -0,0 +1,130 @@
+"""Производные изображения номеров: уменьшенные копии и WebP.
+
+Копии лежат рядом с оригиналом и называются детерминированно,
+поэтому шаблонный тег строит srcset без обращений к хранилищу:
+room/photo.jpg -> room/photo.640w.jpg, room/photo.640w.webp.
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from hotel.constants import (
+    IMAGE_DERIVATIVE_CACHE_TIMEOUT,
+    IMAGE_DERIVATIVE_QUALITY,
+    IMAGE_DERIVATIVE_WIDTHS,
+    IMAGE_WEBP_QUALITY,
+)
+
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+}
+
+
+def derivative_name(name, width, extension=None):
+    stem, original_extension = posixpath.splitext(name)
+    return f'{stem}.{width}w{extension or original_extension.lower()}'
+
+
+def derivative_names(name):
+    """Пары (ширина, имя) для исходного формата и для WebP."""
+    return [
+        (width, derivative_name(name, width), derivative_name(name, width, '.webp'))
+        for width in IMAGE_DERIVATIVE_WIDTHS
+    ]
+
+
+def derivatives_cache_key(name):
+    return f'catalog:image-derivatives:{name}'
+
+
+def has_derivatives(name, storage=None):
+    """Готовы ли копии изображения; результат проверки кешируется."""
+    key = derivatives_cache_key(name)
+    ready = cache.get(key)
+    if ready is None:
+        storage = storage or default_storage
+        ready = storage.exists(derivative_names(name)[-1][2])
+        cache.set(key, ready, IMAGE_DERIVATIVE_CACHE_TIMEOUT)
+    return ready
+
+
+def encode(image, pil_format):
+    buffer = BytesIO()
+    if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {'optimize': True}
+    if pil_format == 'JPEG':
+        options.update(quality=IMAGE_DERIVATIVE_QUALITY, progressive=True)
+    elif pil_format == 'WEBP':
+        options = {'quality': IMAGE_WEBP_QUALITY, 'method': 4}
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def write(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def generate_derivatives(name, storage=None, force=False):
+    """Создаёт копии изображения и возвращает отчёт о размерах.
+
+    Отчёт: {'name', 'original', 'variants': {имя: байт}}. Если копии уже
+    есть и force не задан, изображение не перекодируется.
+    """
+    storage = storage or default_storage
+    report = {'name': name, 'original': 0, 'variants': {}}
+    names = derivative_names(name)
+    if not force and storage.exists(names[-1][2]):
+        return report
+    extension = posixpath.splitext(name)[1].lower()
+    pil_format = PIL_FORMATS.get(extension)
+    if pil_format is None:
+        logger.warning('Неподдерживаемый формат изображения: %s', name)
+        return report
+    try:
+        with storage.open(name, 'rb') as original:
+            source = Image.open(original)
+            source = ImageOps.exif_transpose(source)
+            source.load()
+        report['original'] = storage.size(name)
+    except FileNotFoundError:
+        logger.debug('Изображение %s отсутствует в хранилище', name)
+        return report
+    except (OSError, ValueError):
+        logger.warning('Не удалось прочитать изображение %s', name)
+        return report
+    for width, same_format_name, webp_name in names:
+        image = source.copy()
+        # thumbnail не увеличивает изображение, только уменьшает
+        image.thumbnail((width, width * 4), Image.LANCZOS)
+        for variant_name, variant_format in (
+            (same_format_name, pil_format),
+            (webp_name, 'WEBP'),
+        ):
+            content = encode(image, variant_format)
+            write(storage, variant_name, content)
+            report['variants'][variant_name] = len(content)
+    cache.set(derivatives_cache_key(name), True, IMAGE_DERIVATIVE_CACHE_TIMEOUT)
+    return report
+
+
+def delete_derivatives(name, storage=None):
+    storage = storage or default_storage
+    for _, same_format_name, webp_name in derivative_names(name):
+        for variant_name in (same_format_name, webp_name):
+            if storage.exists(variant_name):
+                storage.delete(variant_name)
+    cache.delete(derivatives_cache_key(name))
@@ -0,0 +1,111 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking.models import Booking
+from catalog.models import HotelRoom
+from hotel.benchmarks import Rollback
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет поиск свободных номеров на синтетических данных. '
+        'Данные создаются в транзакции и откатываются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10_000)
+        parser.add_argument('--bookings', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                self.seed(options)
+                self.measure(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, options):
+        started = time.perf_counter()
+        rooms = HotelRoom.objects.bulk_create(
+            (
+                HotelRoom(
+                    title=f'bench-room-{number}',
+                    slug=f'bench-room-{number}',
+                    max_number_of_guests=random.randint(1, 5),
+                    description='',
+                    price=random.randint(1_000, 20_000),
+                    main_img='bench/room.jpg',
+                )
+                for number in range(options['rooms'])
+            ),
+            batch_size=options['batch_size'],
+        )
+        guest = User.objects.create(
+            email='bench@example.com', first_name='Bench', last_name='Bench'
+        )
+        today = timezone.now().date()
+        # Брони не пересекаются внутри номера: идём по шкале дней подряд
+        per_room = max(options['bookings'] // len(rooms), 1)
+        batch = []
+        for room in rooms:
+            day = today - timedelta(days=365)
+            for _ in range(per_room):
+                day += timedelta(days=random.randint(0, 3))
+                nights = random.randint(1, 7)
+                batch.append(Booking(
+                    guest=guest,
+                    room=room,
+                    check_in_date=day,
+                    check_out_date=day + timedelta(days=nights),
+                    guest_count=1,
+                    total_price=nights * room.price,
+                ))
+                day += timedelta(days=nights)
+            if len(batch) >= options['batch_size']:
+                Booking.objects.bulk_create(batch)
+                batch = []
+        Booking.objects.bulk_create(batch)
+        self.stdout.write(
+            f'Создано номеров: {len(rooms)}, броней: '
+            f'{Booking.objects.count()} за '
+            f'{time.perf_counter() - started:.1f} с'
+        )
+
+    def measure(self, repeat):
+        today = timezone.now().date()
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            check_in = today + timedelta(days=random.randint(0, 60))
+            check_out = check_in + timedelta(days=random.randint(1, 10))
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                queryset = HotelRoom.objects.available(
+                    check_in, check_out, random.randint(1, 3)
+                )
+                total = queryset.count()
+                list(queryset[:10])
+                timings.append(time.perf_counter() - started)
+            queries = max(queries, len(captured))
+        timings.sort()
+        self.stdout.write(
+            f'Свободно номеров (последний запрос): {total}\n'
+            f'Запросов на поиск: {queries}\n'
+            f'p50: {timings[len(timings) // 2] * 1000:.1f} мс, '
+            f'max: {timings[-1] * 1000:.1f} мс'
+        )
@@ -0,0 +1,97 @@
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import HotelRoom, RoomRate
+from catalog.pricing import WEEKEND_NIGHTS, quote_rooms
+from hotel.benchmarks import percentile
+from hotel.queries import QueryRecorder
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает расчёт стоимости проживания для N номеров на M ночей: '
+        'запрос тарифов на номер и цикл по ночам против quote_rooms '
+        '(один запрос, срезы массива) без кеша и с кешем.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=1_000)
+        parser.add_argument('--nights', type=int, default=30)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument(
+            '--check-in', type=date.fromisoformat,
+            default=date(date.today().year, 6, 20),
+            help='Дата заезда, по умолчанию 20 июня: сезон и выходные.',
+        )
+
+    def handle(self, *args, **options):
+        rooms = list(HotelRoom.objects.order_by('pk')[:options['rooms']])
+        if not rooms:
+            raise CommandError(
+                'Нет номеров для замеров, сначала запустите seed_data.')
+        check_in = options['check_in']
+        check_out = check_in + timedelta(days=options['nights'])
+        scenarios = {
+            'по ночам': lambda: self.per_night(rooms, check_in, check_out),
+            'quote_rooms': lambda: self.batched(rooms, check_in, check_out),
+            'quote_rooms + кеш': lambda: quote_rooms(
+                rooms, check_in, check_out),
+        }
+        self.stdout.write(
+            f'{len(rooms)} номеров x {options["nights"]} ночей с {check_in}')
+        self.stdout.write(f"{'способ':<20}{'SQL':>6}{'p50 мс':>10}")
+        results = {}
+        for name, run in scenarios.items():
+            timings = []
+            queries = 0
+            for _ in range(options['iterations']):
+                recorder = QueryRecorder()
+                with recorder.record():
+                    started = time.perf_counter()
+                    results[name] = run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries = len(recorder)
+            timings.sort()
+            self.stdout.write(
+                f'{name:<20}{queries:>6}{percentile(timings, 50):>10.1f}')
+        totals = {
+            name: {room_id: quote.total if hasattr(quote, 'total') else quote
+                   for room_id, quote in result.items()}
+            for name, result in results.items()
+        }
+        distinct = {tuple(sorted(total.items())) for total in totals.values()}
+        if len(distinct) > 1:
+            raise CommandError('Способы расчёта дали разные суммы')
+
+    @staticmethod
+    def batched(rooms, check_in, check_out):
+        cache.clear()
+        return quote_rooms(rooms, check_in, check_out)
+
+    @staticmethod
+    def per_night(rooms, check_in, check_out):
+        """Прямолинейный расчёт: тарифы каждого номера и цена каждой ночи."""
+        totals = {}
+        for room in rooms:
+            rates = list(
+                RoomRate.objects.filter(
+                    room=room, start_date__lt=check_out,
+                    end_date__gt=check_in)
+                .order_by('priority', 'start_date', 'pk'))
+            total = 0
+            night = check_in
+            while night < check_out:
+                price = room.price
+                for rate in rates:
+                    if rate.start_date <= night < rate.end_date:
+                        price = rate.price
+                        if (rate.weekend_price is not None
+                                and night.weekday() in WEEKEND_NIGHTS):
+                            price = rate.weekend_price
+                total += price
+                night += timedelta(days=1)
+            totals[room.pk] = total
+        return totals
@@ -0,0 +1,67 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from catalog.images import generate_derivatives
+from catalog.models import HotelRoom
+from hotel.constants import IMAGE_DERIVATIVE_WIDTHS
+
+
+def megabytes(size):
+    return f'{size / 1024 / 1024:.1f} МБ'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт уменьшенные копии и WebP для изображений номеров '
+        'и выводит отчёт о сэкономленном объёме.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Количество процессов, по умолчанию - по числу ядер.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перекодировать изображения с уже готовыми копиями.',
+        )
+
+    def handle(self, *args, **options):
+        names = sorted(set(
+            HotelRoom.objects.exclude(main_img='')
+            .values_list('main_img', flat=True)
+        ))
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=django.setup
+        ) as pool:
+            reports = list(pool.map(
+                generate_derivatives,
+                names,
+                [None] * len(names),
+                [options['force']] * len(names),
+                chunksize=8,
+            ))
+        self.report(reports)
+
+    def report(self, reports):
+        # Экономия считается для карточки каталога: WebP средней ширины
+        card_width = IMAGE_DERIVATIVE_WIDTHS[len(IMAGE_DERIVATIVE_WIDTHS) // 2]
+        processed = [report for report in reports if report['variants']]
+        original = sum(report['original'] for report in processed)
+        card = sum(
+            size
+            for report in processed
+            for name, size in report['variants'].items()
+            if name.endswith(f'.{card_width}w.webp')
+        )
+        self.stdout.write(
+            f'Изображений: {len(reports)}, обработано: {len(processed)}, '
+            f'пропущено: {len(reports) - len(processed)}'
+        )
+        self.stdout.write(
+            f'Оригиналы: {megabytes(original)}, '
+            f'карточки {card_width}w WebP: {megabytes(card)}, '
+            f'экономия: {megabytes(original - card)}'
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс номеров и отелей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        started = time.perf_counter()
+        with transaction.atomic(using=options['database']):
+            backend.setup()
+            indexed = backend.rebuild(options['batch_size'])
+        self.stdout.write(
+            f'Проиндексировано номеров: {indexed} за '
+            f'{time.perf_counter() - started:.2f} с'
+        )
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:03
+
+import catalog.models
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hotel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=40, unique=True, verbose_name='Название')),
+                ('country', models.CharField(choices=[('RU', 'Russia'), ('USA', 'United States of America')], max_length=5, verbose_name='Страна')),
+                ('city', models.CharField(max_length=40, verbose_name='Город')),
+            ],
+            options={
+                'verbose_name': 'отель',
+                'verbose_name_plural': 'Отели',
+                'ordering': ('country', 'title'),
+            },
+        ),
+        migrations.CreateModel(
+            name='HotelRoom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=40, unique=True, verbose_name='Название')),
+                ('slug', models.SlugField(blank=True, max_length=40, unique=True, verbose_name='Слаг')),
+                ('max_number_of_guests', models.PositiveSmallIntegerField(validators=[django.core.validators.MaxValueValidator(5, 'Превышено количество гостей, введите значение меньше или равное 5')], verbose_name='Максимальное количество гостей')),
+                ('description', models.TextField(max_length=1000, verbose_name='Описание')),
+                ('price', models.PositiveIntegerField(verbose_name='Цена за ночь')),
+                ('main_img', models.ImageField(upload_to=catalog.models.hotel_room_directory_path)),
+                ('hotel', models.ManyToManyField(to='catalog.hotel', verbose_name='Отели')),
+            ],
+            options={
+                'verbose_name': 'номер',
+                'verbose_name_plural': 'Номера',
+                'ordering': ('title',),
+            },
+        ),
+    ]
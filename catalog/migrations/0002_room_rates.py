@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-18 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, max_length=40, verbose_name='Название')),
+                ('start_date', models.DateField(verbose_name='Первая ночь')),
+                ('end_date', models.DateField(verbose_name='Действует до (не включая)')),
+                ('price', models.PositiveIntegerField(verbose_name='Цена за ночь')),
+                ('weekend_price', models.PositiveIntegerField(blank=True, null=True, verbose_name='Цена ночи на субботу и воскресенье')),
+                ('min_stay', models.PositiveSmallIntegerField(default=1, verbose_name='Минимум ночей при заезде в период')),
+                ('priority', models.PositiveSmallIntegerField(default=0, verbose_name='Приоритет')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='catalog.hotelroom', verbose_name='Номер')),
+            ],
+            options={
+                'verbose_name': 'тариф',
+                'verbose_name_plural': 'Тарифы',
+                'ordering': ('room', 'start_date'),
+                'indexes': [models.Index(fields=['room', 'start_date', 'end_date'], name='room_rate_period_idx')],
+            },
+        ),
+    ]
@@ -2,7 +2,9 @@ from slugify import slugify
 from django.urls import reverse
 
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator
+from django.utils import timezone
 
 from hotel.constants import (
     COUNTRY_MAX_LENGTH,
@@ -42,6 +44,44 @@ def hotel_room_directory_path(instance, filename):
     return '{0}/{1}'.format(instance.slug, filename)
 
 
+class HotelRoomQuerySet(models.QuerySet):
+
+    def available(self, check_in, check_out, guests=None):
+        """Номера, свободные на все ночи в интервале [check_in, check_out).
+
+        Пересечение проверяется коррелированными подзапросами
+        NOT EXISTS по составным индексам (room, check_in_date,
+        check_out_date) бронирований и действующих удержаний.
+        """
+        def overlapping(related_name):
+            model = self.model._meta.get_field(related_name).related_model
+            return model.objects.filter(
+                room=models.OuterRef('pk'),
+                check_in_date__lt=check_out,
+                check_out_date__gt=check_in,
+            )
+
+        queryset = self.filter(
+            ~models.Exists(overlapping('bookings')),
+            ~models.Exists(
+                overlapping('holds').filter(expires_at__gt=timezone.now())),
+        )
+        if guests:
+            queryset = queryset.filter(max_number_of_guests__gte=guests)
+        return queryset
+
+    def in_hotel(self, hotel=None, city=None):
+        """Номера указанного отеля и/или города без дублей от M2M join."""
+        links = self.model.hotel.through.objects.filter(
+            hotelroom=models.OuterRef('pk')
+        )
+        if hotel is not None:
+            links = links.filter(hotel=hotel)
+        if city:
+            links = links.filter(hotel__city__iexact=city)
+        return self.filter(models.Exists(links))
+
+
 class HotelRoom(models.Model):
 
     title = models.CharField(
@@ -65,6 +105,8 @@ class HotelRoom(models.Model):
     price = models.PositiveIntegerField('Цена за ночь')
     main_img = models.ImageField(upload_to=hotel_room_directory_path)
 
+    objects = HotelRoomQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'номер'
         verbose_name_plural = 'Номера'
@@ -80,3 +122,54 @@ class HotelRoom(models.Model):
 
     def get_absolute_url(self):
         return reverse('room', kwargs={'slug': self.slug})
+
+
+class RoomRate(models.Model):
+    """Цена номера на период: сезон, выходные и минимальный срок.
+
+    Период - ночи с start_date по end_date, не включая end_date. Если
+    периоды пересекаются, ночь берёт цену периода с большим priority,
+    при равном - начавшегося позже. Ночи вне периодов стоят
+    HotelRoom.price.
+    """
+
+    room = models.ForeignKey(
+        HotelRoom,
+        on_delete=models.CASCADE,
+        verbose_name='Номер',
+        related_name='rates'
+    )
+    title = models.CharField(
+        'Название', max_length=TITLE_MAX_LENGTH, blank=True
+    )
+    start_date = models.DateField('Первая ночь')
+    end_date = models.DateField('Действует до (не включая)')
+    price = models.PositiveIntegerField('Цена за ночь')
+    weekend_price = models.PositiveIntegerField(
+        'Цена ночи на субботу и воскресенье', null=True, blank=True
+    )
+    min_stay = models.PositiveSmallIntegerField(
+        'Минимум ночей при заезде в период', default=1
+    )
+    priority = models.PositiveSmallIntegerField('Приоритет', default=0)
+
+    class Meta:
+        verbose_name = 'тариф'
+        verbose_name_plural = 'Тарифы'
+        ordering = ('room', 'start_date')
+        indexes = [
+            models.Index(
+                fields=('room', 'start_date', 'end_date'),
+                name='room_rate_period_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.title or "Тариф"}: {self.start_date} - {self.end_date}'
+
+    def clean(self):
+        if self.start_date and self.end_date and (
+                self.start_date >= self.end_date):
+            raise ValidationError(
+                'Окончание тарифа должно быть позже начала')
+        return super().clean()
@@ -0,0 +1,141 @@
+"""Расчёт стоимости проживания по тарифам RoomRate.
+
+Цены ночей номера собираются в массив: сначала базовая цена номера,
+затем поверх - срезы периодов тарифов в порядке приоритета, а цены
+выходных ложатся срезами с шагом 7. Тарифы всех номеров читаются одним
+запросом, стоимость - сумма массива, без цикла Python по ночам.
+
+Расчёты кешируются по номеру, базовой цене, датам и общей версии
+тарифов: тарифы меняются редко, и одна версия на все номера избавляет
+от чтения версии каждого номера. Одна и та же функция считает цену
+в каталоге и в брони, поэтому показанная и списанная суммы совпадают.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from hotel.constants import QUOTE_CACHE_TIMEOUT
+
+from .cache import bump_versions, get_versions
+from .models import RoomRate
+
+
+# Ночи на субботу и воскресенье: заезд в пятницу и субботу
+WEEKEND_NIGHTS = (4, 5)
+
+RATE_FIELDS = (
+    'room_id', 'start_date', 'end_date', 'price', 'weekend_price',
+    'min_stay',
+)
+
+
+@dataclass(frozen=True)
+class Quote:
+    total: int
+    nights: int
+    min_stay: int = 1
+
+    @property
+    def allowed(self):
+        return self.nights >= self.min_stay
+
+    @property
+    def per_night(self):
+        return self.total / self.nights if self.nights else 0
+
+
+RATES_VERSION = 'catalog:version:rates'
+
+
+def quote_key(room, version, check_in, check_out):
+    return (
+        f'catalog:quote:{room.pk}:{room.price}:{version}:'
+        f'{check_in:%Y%m%d}:{check_out:%Y%m%d}'
+    )
+
+
+def invalidate_quotes():
+    bump_versions([RATES_VERSION])
+
+
+def nightly_prices(base_price, rates, check_in, nights):
+    """Цены каждой ночи и минимальный срок для заезда check_in.
+
+    rates - кортежи (start_date, end_date, price, weekend_price,
+    min_stay) в порядке возрастания приоритета.
+    """
+    prices = [base_price] * nights
+    min_stay = 1
+    for start, end, price, weekend_price, rate_min_stay in rates:
+        first = max((start - check_in).days, 0)
+        last = min((end - check_in).days, nights)
+        if first >= last:
+            continue
+        prices[first:last] = [price] * (last - first)
+        if weekend_price is not None:
+            weekday = (check_in + timedelta(days=first)).weekday()
+            for weekend in WEEKEND_NIGHTS:
+                offset = first + (weekend - weekday) % 7
+                prices[offset:last:7] = (
+                    [weekend_price] * len(range(offset, last, 7)))
+        if first == 0:
+            min_stay = rate_min_stay
+    return prices, min_stay
+
+
+def quote_rooms(rooms, check_in, check_out, using='default'):
+    """{room.pk: Quote} для номеров на ночи [check_in, check_out).
+
+    Кеш читается одним get_many, тарифы промахов - одним запросом.
+    """
+    rooms = list(rooms)
+    nights = (check_out - check_in).days
+    if nights <= 0:
+        return {room.pk: Quote(0, 0) for room in rooms}
+    version, = get_versions([RATES_VERSION])
+    keys = {
+        room.pk: quote_key(room, version, check_in, check_out)
+        for room in rooms
+    }
+    found = cache.get_many(keys.values())
+    quotes = {
+        room_id: found[key] for room_id, key in keys.items() if key in found
+    }
+    missing = [room for room in rooms if room.pk not in quotes]
+    if not missing:
+        return quotes
+    rates = defaultdict(list)
+    for room_id, *rate in (
+            RoomRate.objects.using(using)
+            .filter(
+                room_id__in=[room.pk for room in missing],
+                start_date__lt=check_out,
+                end_date__gt=check_in,
+            )
+            .order_by('priority', 'start_date', 'pk')
+            .values_list(*RATE_FIELDS)):
+        rates[room_id].append(rate)
+    fresh = {}
+    for room in missing:
+        prices, min_stay = nightly_prices(
+            room.price, rates[room.pk], check_in, nights)
+        quotes[room.pk] = fresh[keys[room.pk]] = Quote(
+            sum(prices), nights, min_stay)
+    cache.set_many(fresh, QUOTE_CACHE_TIMEOUT)
+    return quotes
+
+
+def quote_stay(room, check_in, check_out, using='default'):
+    return quote_rooms([room], check_in, check_out, using)[room.pk]
+
+
+def room_rates(room, since=None, using='default'):
+    """Действующие и будущие тарифы номера для таблицы цен."""
+    return list(
+        RoomRate.objects.using(using)
+        .filter(room=room, end_date__gt=since or timezone.localdate())
+        .order_by('start_date', 'priority', 'pk')
+    )
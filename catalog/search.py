@@ -0,0 +1,255 @@
+"""Полнотекстовый поиск по номерам и отелям.
+
+Индекс хранит по документу на номер: название, описание и названия
+с городами связанных отелей. Бэкенд выбирается настройкой
+CATALOG_SEARCH_BACKEND, по умолчанию - по типу базы данных.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from hotel.constants import SEARCH_RESULTS_LIMIT, SEARCH_SNIPPET_TOKENS
+
+from .models import HotelRoom
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Маркеры совпадений в сниппете: текст экранируется целиком,
+# а маркеры заменяются на <mark> уже после экранирования
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+
+@dataclass
+class SearchResult:
+    room: HotelRoom
+    rank: float
+    snippet: str
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MATCH_START, '<mark>')
+        .replace(MATCH_END, '</mark>')
+    )
+
+
+def room_documents(room_ids, using='default'):
+    """Документы индекса для номеров: (id, title, description, hotels)."""
+    rooms = (
+        HotelRoom.objects.using(using).filter(pk__in=room_ids)
+        .prefetch_related('hotel')
+    )
+    for room in rooms:
+        hotels = ' '.join(
+            f'{hotel.title} {hotel.city}' for hotel in room.hotel.all()
+        )
+        yield room.pk, room.title, room.description, hotels
+
+
+class BaseSearchBackend:
+    vendor = None
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def setup(self):
+        raise NotImplementedError
+
+    def index_rooms(self, room_ids):
+        raise NotImplementedError
+
+    def remove_rooms(self, room_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def query(self, text, limit):
+        """Список (room_id, rank, snippet) в порядке релевантности."""
+        raise NotImplementedError
+
+    def search(self, text, limit=SEARCH_RESULTS_LIMIT):
+        if not TOKEN_RE.search(text or ''):
+            return []
+        hits = self.query(text, limit)
+        rooms = HotelRoom.objects.using(self.using).in_bulk(
+            [room_id for room_id, _, _ in hits]
+        )
+        return [
+            SearchResult(rooms[room_id], rank, highlight(snippet))
+            for room_id, rank, snippet in hits
+            if room_id in rooms
+        ]
+
+    def rebuild(self, batch_size=500):
+        self.clear()
+        room_ids = list(
+            HotelRoom.objects.using(self.using)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        for start in range(0, len(room_ids), batch_size):
+            self.index_rooms(room_ids[start:start + batch_size])
+        return len(room_ids)
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    vendor = 'sqlite'
+    table = 'catalog_hotelroom_fts'
+    # Веса колонок для bm25: название важнее отелей, отели - описания
+    weights = (10.0, 1.0, 4.0)
+
+    def setup(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5('
+                'title, description, hotels, '
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def index_rooms(self, room_ids):
+        room_ids = list(room_ids)
+        if not room_ids:
+            return
+        self.remove_rooms(room_ids)
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} '
+                '(rowid, title, description, hotels) VALUES (%s, %s, %s, %s)',
+                list(room_documents(room_ids, self.using)),
+            )
+
+    def remove_rooms(self, room_ids):
+        room_ids = list(room_ids)
+        if not room_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(room_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})',
+                room_ids,
+            )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def match_expression(text):
+        # Каждое слово - отдельная фраза с префиксным поиском, так
+        # пользовательский ввод не ломает синтаксис MATCH
+        return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(text))
+
+    def query(self, text, limit):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({self.table}, {weights}) AS rank, '
+                f"snippet({self.table}, -1, %s, %s, '…', %s) "
+                f'FROM {self.table} WHERE {self.table} MATCH %s '
+                'ORDER BY rank LIMIT %s',
+                [
+                    MATCH_START, MATCH_END, SEARCH_SNIPPET_TOKENS,
+                    self.match_expression(text), limit,
+                ],
+            )
+            # bm25 в SQLite отрицательный: чем меньше, тем релевантнее
+            return [
+                (room_id, -rank, snippet)
+                for room_id, rank, snippet in cursor.fetchall()
+            ]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    vendor = 'postgresql'
+    table = 'catalog_hotelroom_search'
+    config = 'russian'
+
+    def setup(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                'room_id bigint PRIMARY KEY '
+                'REFERENCES catalog_hotelroom (id) ON DELETE CASCADE, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.table}_document_idx '
+                f'ON {self.table} USING gin (document)'
+            )
+
+    def index_rooms(self, room_ids):
+        rows = list(room_documents(room_ids, self.using))
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (room_id, document) VALUES (%s, '
+                f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'C') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'B')) "
+                'ON CONFLICT (room_id) DO UPDATE SET document = EXCLUDED.document',
+                rows,
+            )
+
+    def remove_rooms(self, room_ids):
+        room_ids = list(room_ids)
+        if not room_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE room_id = ANY(%s)',
+                [room_ids],
+            )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+
+    def query(self, text, limit):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT s.room_id, ts_rank(s.document, q) AS rank, '
+                f"ts_headline('{self.config}', r.description, q, %s) "
+                f"FROM {self.table} s "
+                'JOIN catalog_hotelroom r ON r.id = s.room_id, '
+                f"websearch_to_tsquery('{self.config}', %s) q "
+                'WHERE s.document @@ q ORDER BY rank DESC LIMIT %s',
+                [
+                    f'StartSel={MATCH_START}, StopSel={MATCH_END}, '
+                    f'MaxWords={SEARCH_SNIPPET_TOKENS}, MinWords=5',
+                    text,
+                    limit,
+                ],
+            )
+            return cursor.fetchall()
+
+
+BACKENDS = {
+    backend.vendor: backend
+    for backend in (SQLiteFTS5Backend, PostgresSearchBackend)
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend(using='default'):
+    path = getattr(settings, 'CATALOG_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)(using)
+    vendor = connections[using].vendor
+    if vendor not in BACKENDS:
+        raise LookupError(f'Нет бэкенда полнотекстового поиска для {vendor}')
+    return BACKENDS[vendor](using)
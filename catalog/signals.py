@@ -0,0 +1,139 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from tasks.queue import enqueue
+
+from .cache import (
+    HOTEL_LIST_VERSION,
+    ROOM_LIST_VERSION,
+    bump_versions,
+    room_version_key,
+)
+from .facets import invalidate_facet_index
+from .models import Hotel, HotelRoom, RoomRate
+from .pricing import invalidate_quotes
+from .search import get_search_backend
+from .tasks import process_room_image
+
+
+def hotel_rooms_changed(room_ids, using, hotels_changed=False):
+    """Переиндексирует номера и сбрасывает их кеш после смены отелей."""
+    room_ids = list(room_ids)
+    get_search_backend(using).index_rooms(room_ids)
+    keys = [ROOM_LIST_VERSION]
+    if hotels_changed:
+        keys.append(HOTEL_LIST_VERSION)
+    keys += [
+        room_version_key(slug)
+        for slug in HotelRoom.objects.using(using)
+        .filter(pk__in=room_ids).values_list('slug', flat=True)
+    ]
+    transaction.on_commit(partial(bump_versions, keys), using=using)
+
+
+@receiver(pre_save, sender=HotelRoom)
+def remember_room_slug(sender, instance, raw=False, using='default',
+                       **kwargs):
+    if not raw and instance.pk:
+        instance._previous_slug, instance._previous_img = (
+            HotelRoom.objects.using(using).filter(pk=instance.pk)
+            .values_list('slug', 'main_img').first()
+            or (None, None)
+        )
+
+
+@receiver(post_save, sender=HotelRoom)
+def room_saved(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    get_search_backend(using).index_rooms([instance.pk])
+    slugs = {instance.slug, instance.__dict__.pop('_previous_slug', None)}
+    keys = [ROOM_LIST_VERSION] + [
+        room_version_key(slug) for slug in slugs if slug]
+    transaction.on_commit(partial(bump_versions, keys), using=using)
+    previous_img = instance.__dict__.pop('_previous_img', None)
+    if instance.main_img and instance.main_img.name != previous_img:
+        # Перекодирование занимает секунды, его делает воркер очереди
+        enqueue(
+            process_room_image, instance.main_img.name, keys,
+            dedup_key=f'catalog:image:{instance.main_img.name}',
+            using=using,
+        )
+
+
+@receiver(post_delete, sender=HotelRoom)
+def room_deleted(sender, instance, using='default', **kwargs):
+    get_search_backend(using).remove_rooms([instance.pk])
+    transaction.on_commit(
+        partial(bump_versions, [
+            ROOM_LIST_VERSION, room_version_key(instance.slug)]),
+        using=using,
+    )
+
+
+@receiver(m2m_changed, sender=HotelRoom.hotel.through)
+def room_hotels_changed(sender, instance, action, reverse, pk_set,
+                        using='default', **kwargs):
+    if action == 'pre_clear' and reverse:
+        # После очистки со стороны отеля список номеров уже не получить
+        instance._cleared_room_ids = list(
+            instance.hotelroom_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        room_ids = [instance.pk]
+    elif action == 'post_clear':
+        room_ids = instance.__dict__.pop('_cleared_room_ids', [])
+    else:
+        room_ids = pk_set or []
+    hotel_rooms_changed(room_ids, using)
+
+
+@receiver(post_save, sender=Hotel)
+def hotel_saved(sender, instance, created, raw=False, using='default',
+                **kwargs):
+    if raw:
+        return
+    room_ids = [] if created else instance.hotelroom_set.values_list(
+        'pk', flat=True)
+    hotel_rooms_changed(room_ids, using, hotels_changed=True)
+
+
+@receiver(pre_delete, sender=Hotel)
+def remember_hotel_rooms(sender, instance, **kwargs):
+    instance._deleted_room_ids = list(
+        instance.hotelroom_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Hotel)
+def hotel_deleted(sender, instance, using='default', **kwargs):
+    hotel_rooms_changed(
+        instance.__dict__.pop('_deleted_room_ids', []), using,
+        hotels_changed=True,
+    )
+
+
+@receiver(post_save, sender=HotelRoom)
+@receiver(post_delete, sender=HotelRoom)
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+@receiver(m2m_changed, sender=HotelRoom.hotel.through)
+def invalidate_facets(sender, using='default', **kwargs):
+    # Сброс после коммита, иначе кеш может пересобраться из старых данных
+    transaction.on_commit(invalidate_facet_index, using=using)
+
+
+@receiver(post_save, sender=RoomRate)
+@receiver(post_delete, sender=RoomRate)
+def rate_changed(sender, instance, using='default', **kwargs):
+    transaction.on_commit(invalidate_quotes, using=using)
@@ -0,0 +1,13 @@
+"""Задачи очереди каталога."""
+from .cache import bump_versions
+from .images import generate_derivatives
+
+
+def process_room_image(name, version_keys):
+    """Готовит копии изображения и сбрасывает версии страниц номера.
+
+    Фрагменты, закешированные до появления копий, выводились без srcset,
+    поэтому после генерации версии сбрасываются ещё раз.
+    """
+    generate_derivatives(name)
+    bump_versions(version_keys)
@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def stylesheet_bundle(name):
+    """<link> на бандл из STATIC_BUNDLES или на его исходные файлы.
+
+    Бандл собирает collectstatic, поэтому без STATIC_PIPELINE
+    (разработка, тесты) подключаются исходные файлы по отдельности.
+    """
+    if getattr(settings, 'STATIC_PIPELINE', False):
+        sources = [name]
+    else:
+        sources = settings.STATIC_BUNDLES[name]
+    return format_html_join(
+        '\n    ', '<link rel="stylesheet" href="{}">',
+        ((static(source),) for source in sources),
+    )
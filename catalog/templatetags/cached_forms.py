@@ -0,0 +1,12 @@
+from django import template
+
+from hotel.forms import render_form
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def crispy_cached(context, form):
+    """{% crispy form %}, но пустая форма берётся из кеша разметки."""
+    return render_form(form, context)
@@ -0,0 +1,40 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from hotel.constants import IMAGE_DEFAULT_SIZES
+
+from catalog.images import derivative_names, has_derivatives
+
+
+register = template.Library()
+
+
+def build_srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in urls)
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes=IMAGE_DEFAULT_SIZES,
+                     loading='lazy'):
+    """<picture> с WebP и уменьшенными копиями в srcset."""
+    if not image:
+        return ''
+    storage = getattr(image, 'storage', default_storage)
+    if not has_derivatives(image.name, storage):
+        # Копии ещё не готовы: отдаём оригинал, а не битый srcset
+        return format_html(
+            '<img src="{}" alt="{}" loading="{}">', image.url, alt, loading)
+    names = derivative_names(image.name)
+    webp_srcset = build_srcset(
+        (width, storage.url(webp_name)) for width, _, webp_name in names)
+    srcset = build_srcset(
+        (width, storage.url(same_format_name))
+        for width, same_format_name, _ in names)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="{}">'
+        '</picture>',
+        webp_srcset, sizes, image.url, srcset, sizes, alt, loading,
+    )
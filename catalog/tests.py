@@ -1,3 +1,750 @@
-from django.test import TestCase
+import random
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from booking.forms import BookingCreateForm
+from booking.models import Booking
+from catalog.cache import cache_stats
+from catalog.images import derivative_name, generate_derivatives
+from catalog.facets import FacetSelection, facet_cache_keys
+from catalog.models import Hotel, HotelRoom, RoomRate
+from catalog.pricing import Quote, nightly_prices, quote_rooms, quote_stay
+from catalog.search import get_search_backend
+from tasks.models import Task
+from tasks.queue import run_pending_tasks
+
+
+User = get_user_model()
+
+
+def create_room(title, price=1000, guests=2, hotel=None):
+    room = HotelRoom.objects.create(
+        title=title,
+        max_number_of_guests=guests,
+        description=f'Описание {title}',
+        price=price,
+        main_img=f'{title}/room.jpg',
+    )
+    if hotel is not None:
+        room.hotel.add(hotel)
+    return room
+
+
+class AvailabilitySearchTest(TestCase):
+    """Тесты поиска свободных номеров по датам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.guest = User.objects.create(
+            email='guest@example.com', first_name='Гость', last_name='Тестовый'
+        )
+        cls.moscow = Hotel.objects.create(
+            title='Москва', country='RU', city='Москва')
+        cls.spb = Hotel.objects.create(
+            title='Нева', country='RU', city='Санкт-Петербург')
+        cls.booked = create_room('booked', hotel=cls.moscow)
+        cls.free = create_room('free', hotel=cls.moscow)
+        cls.small = create_room('small', guests=1, hotel=cls.spb)
+        Booking.objects.create(
+            guest=cls.guest,
+            room=cls.booked,
+            check_in_date=cls.today + timedelta(days=5),
+            check_out_date=cls.today + timedelta(days=10),
+            guest_count=1,
+            total_price=5000,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def dates(self, start, end):
+        return self.today + timedelta(days=start), self.today + timedelta(days=end)
+
+    def test_overlapping_booking_excludes_room(self):
+        """Тест что пересекающаяся бронь исключает номер"""
+        for start, end in ((4, 6), (6, 8), (9, 12), (1, 20)):
+            rooms = HotelRoom.objects.available(*self.dates(start, end))
+            self.assertNotIn(self.booked, rooms)
+            self.assertIn(self.free, rooms)
+
+    def test_adjacent_stays_are_available(self):
+        """Тест что выезд в день заезда не считается пересечением"""
+        self.assertIn(
+            self.booked, HotelRoom.objects.available(*self.dates(1, 5)))
+        self.assertIn(
+            self.booked, HotelRoom.objects.available(*self.dates(10, 12)))
+
+    def test_guests_filter(self):
+        """Тест фильтра по количеству гостей"""
+        rooms = HotelRoom.objects.available(*self.dates(1, 2), guests=2)
+        self.assertNotIn(self.small, rooms)
+
+    def test_city_filter_has_no_duplicates(self):
+        """Тест фильтра по городу без дублей"""
+        self.free.hotel.add(
+            Hotel.objects.create(title='Арбат', country='RU', city='Москва'))
+        rooms = HotelRoom.objects.available(
+            *self.dates(1, 2)).in_hotel(city='Москва')
+        self.assertEqual(list(rooms), [self.booked, self.free])
+
+    def test_list_view_search(self):
+        """Тест режима поиска в списке номеров"""
+        check_in, check_out = self.dates(6, 8)
+        # Страница номеров, COUNT для кеша итога, номера поиска и индекс
+        # для фасетов, тарифы номеров страницы и список отелей для формы
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('rooms'), {
+                'check_in': check_in.isoformat(),
+                'check_out': check_out.isoformat(),
+                'guests': 2,
+                'cursor': 'garbage',
+            })
+        self.assertEqual(list(response.context['rooms']), [self.free])
+        self.assertIn('guests=2', response.context['query_params'])
+        self.assertNotIn('cursor=', response.context['query_params'])
+
+    def test_facet_counts_follow_search(self):
+        """Тест что счётчики фасетов считаются по найденным номерам"""
+        check_in, check_out = self.dates(6, 8)
+        response = self.client.get(reverse('rooms'), {
+            'check_in': check_in.isoformat(),
+            'check_out': check_out.isoformat(),
+            'guests': 1,
+        })
+        counts = {
+            facet: {value.value: value.count for value in values}
+            for facet, _, values in response.context['facets']
+        }
+        # Занятый на эти даты номер не учитывается
+        self.assertEqual(
+            counts['location'], {'Москва': 1, 'Санкт-Петербург': 1})
+        self.assertEqual(counts['capacity'], {'1': 1, '2': 1})
+
+    def test_list_view_invalid_search_lists_all(self):
+        """Тест что невалидный поиск не фильтрует список"""
+        check_in, check_out = self.dates(8, 6)
+        response = self.client.get(reverse('rooms'), {
+            'check_in': check_in.isoformat(),
+            'check_out': check_out.isoformat(),
+            'guests': 1,
+        })
+        self.assertEqual(len(response.context['rooms']), 3)
+        self.assertTrue(response.context['search_form'].errors)
+
+
+class CursorPaginationTest(TestCase):
+    """Тесты курсорной пагинации каталога"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rooms = [create_room(f'room-{number:02}') for number in range(25)]
+        for number in range(25):
+            Hotel.objects.create(
+                title=f'hotel-{number:02}',
+                country=('RU', 'USA')[number % 2],
+                city='Город',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url_name):
+        pages = []
+        cursor = None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            response = self.client.get(reverse(url_name), params)
+            page = response.context['page_obj']
+            pages.append([str(obj.title) for obj in page])
+            if not page.has_next():
+                return pages, page
+            cursor = page.next_cursor
+
+    def test_forward_walk_matches_ordering(self):
+        """Тест что проход вперёд отдаёт все номера по порядку"""
+        pages, _ = self.walk('rooms')
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(
+            sum(pages, []), [room.title for room in self.rooms])
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Тест что курсор назад возвращает предыдущую страницу"""
+        first = self.client.get(reverse('rooms')).context['page_obj']
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            reverse('rooms'), {'cursor': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            reverse('rooms'), {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_deep_page_costs_same_as_first(self):
+        """Тест что глубокая страница не требует COUNT и OFFSET"""
+        first = self.client.get(reverse('rooms')).context['page_obj']
+        second = self.client.get(
+            reverse('rooms'), {'cursor': first.next_cursor}
+        ).context['page_obj']
+        # Страница номеров и список отелей для формы поиска
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('rooms'), {'cursor': second.next_cursor})
+        self.assertEqual(response.context['page_obj'].approximate_total, 25)
+        self.assertContains(response, 'previous')
+
+    def test_hotel_list_uses_country_title_ordering(self):
+        """Тест пагинации отелей по (country, title)"""
+        pages, last = self.walk('hotel')
+        self.assertEqual([len(page) for page in pages], [20, 5])
+        self.assertEqual(
+            sum(pages, []),
+            list(Hotel.objects.values_list('title', flat=True)),
+        )
+        self.assertIsNone(last.approximate_total)
+
+
+class FullTextSearchTest(TestCase):
+    """Тесты полнотекстового поиска по номерам и отелям"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hotel = Hotel.objects.create(
+            title='Астория', country='RU', city='Санкт-Петербург')
+        cls.suite = create_room('Люкс', hotel=cls.hotel)
+        cls.suite.description = 'Просторный номер с видом на Исаакиевский собор'
+        cls.suite.save()
+        cls.standard = create_room('Стандарт')
+
+    def search(self, text):
+        return [
+            result.room for result in get_search_backend().search(text)]
+
+    def test_search_by_description_and_title(self):
+        """Тест поиска по описанию и названию"""
+        self.assertEqual(self.search('исаакиевский'), [self.suite])
+        self.assertEqual(self.search('Стандарт'), [self.standard])
+
+    def test_search_by_prefix_and_city(self):
+        """Тест поиска по префиксу слова и городу отеля"""
+        self.assertEqual(self.search('петербург'), [self.suite])
+        self.assertEqual(self.search('Просто'), [self.suite])
+
+    def test_title_ranks_above_description(self):
+        """Тест что совпадение в названии релевантнее описания"""
+        self.standard.description = 'Почти как люкс, но дешевле'
+        self.standard.save()
+        self.assertEqual(self.search('люкс'), [self.suite, self.standard])
+
+    def test_hotel_changes_are_reindexed(self):
+        """Тест переиндексации при изменении отелей и связей"""
+        self.hotel.city = 'Москва'
+        self.hotel.save()
+        self.assertEqual(self.search('москва'), [self.suite])
+        self.hotel.hotelroom_set.add(self.standard)
+        self.assertEqual(len(self.search('москва')), 2)
+        self.hotel.hotelroom_set.clear()
+        self.assertEqual(self.search('москва'), [])
+        self.suite.hotel.add(self.hotel)
+        self.hotel.delete()
+        self.assertEqual(self.search('москва'), [])
+
+    def test_deleted_room_is_removed(self):
+        """Тест удаления номера из индекса"""
+        self.standard.delete()
+        self.assertEqual(self.search('Стандарт'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Тест что спецсимволы запроса не ломают поиск"""
+        self.assertEqual(self.search('"люкс" OR (NEAR'), [])
+        self.assertEqual(self.search('***'), [])
+
+    def test_search_view_highlights_snippet(self):
+        """Тест выдачи со сниппетом в представлении поиска"""
+        response = self.client.get(reverse('search'), {'q': 'собор'})
+        self.assertEqual(
+            [result.room for result in response.context['results']],
+            [self.suite],
+        )
+        self.assertContains(response, '<mark>собор</mark>')
+
+    def test_rebuild_command(self):
+        """Тест полной перестройки индекса"""
+        get_search_backend().clear()
+        self.assertEqual(self.search('люкс'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertEqual(self.search('люкс'), [self.suite])
+        self.assertIn('2', out.getvalue())
+
+
+class FacetFilterTest(TestCase):
+    """Тесты фасетных фильтров каталога"""
+
+    @classmethod
+    def setUpTestData(cls):
+        moscow = Hotel.objects.create(title='Москва', country='RU', city='Москва')
+        kazan = Hotel.objects.create(title='Казань', country='RU', city='Казань')
+        york = Hotel.objects.create(title='York', country='USA', city='New York')
+        cls.cheap = create_room('cheap', price=2000, guests=1, hotel=moscow)
+        cls.middle = create_room('middle', price=5000, guests=2, hotel=kazan)
+        cls.luxury = create_room('luxury', price=20000, guests=4, hotel=york)
+        cls.luxury.hotel.add(moscow)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, query=''):
+        return FacetSelection(QueryDict(query)).counts()
+
+    def test_counts_without_selection(self):
+        """Тест счётчиков без выбранных фильтров"""
+        counts = self.counts()
+        self.assertEqual(counts['country'], {'RU': 3, 'USA': 1})
+        self.assertEqual(counts['location'], {'Москва': 2, 'Казань': 1, 'New York': 1})
+        self.assertEqual(counts['capacity'], {'1': 1, '2': 1, '4': 1})
+        self.assertEqual(
+            counts['price'], {'lt3000': 1, '3000-7000': 1, 'gte15000': 1})
+
+    def test_counts_respect_other_facets(self):
+        """Тест что фасет считается с учётом остальных фильтров"""
+        counts = self.counts('location=Москва&price=gte15000')
+        # Свой фасет не сужается выбором в нём самом
+        self.assertEqual(counts['location'], {'Москва': 1, 'New York': 1})
+        self.assertEqual(counts['price'], {'lt3000': 1, 'gte15000': 1})
+        self.assertEqual(counts['country'], {'RU': 1, 'USA': 1})
+
+    def test_index_is_built_once(self):
+        """Тест что индекс фасетов строится одним запросом и кешируется"""
+        with self.assertNumQueries(1):
+            self.counts()
+        with self.assertNumQueries(0):
+            self.counts('country=RU')
+
+    def test_index_is_invalidated_on_change(self):
+        """Тест сброса кеша при изменении каталога"""
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheap.price = 9000
+            self.cheap.save()
+        self.assertEqual(cache.get_many(facet_cache_keys().values()), {})
+        self.assertEqual(self.counts()['price']['7000-15000'], 1)
+
+    def test_list_view_filters_by_facets(self):
+        """Тест фильтрации списка номеров по фасетам"""
+        response = self.client.get(
+            reverse('rooms'), {'country': 'RU', 'capacity': ['1', '4']})
+        self.assertEqual(
+            list(response.context['rooms']), [self.cheap, self.luxury])
+        response = self.client.get(
+            reverse('rooms'), {'location': 'New York', 'price': 'lt3000'})
+        self.assertEqual(list(response.context['rooms']), [])
+
+
+def image_upload(name='photo.jpg', size=(1600, 1200)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (120, 80, 40)).save(buffer, 'JPEG', quality=95)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+class ImageDerivativesTest(TestCase):
+    """Тесты производных изображений номеров"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_room(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            room = HotelRoom.objects.create(
+                title='Фото',
+                max_number_of_guests=2,
+                description='Номер с фото',
+                price=1000,
+                main_img=image_upload(),
+            )
+        run_pending_tasks()
+        return room
+
+    def test_derivatives_created_on_save(self):
+        """Тест создания копий при сохранении номера"""
+        room = self.create_room()
+        name = room.main_img.name
+        for width in (320, 640, 1024):
+            for extension in ('.jpg', '.webp'):
+                variant = derivative_name(name, width, extension)
+                self.assertTrue(default_storage.exists(variant), variant)
+        with default_storage.open(derivative_name(name, 640, '.webp')) as file:
+            self.assertEqual(Image.open(file).size, (640, 480))
+
+    def test_existing_derivatives_are_skipped(self):
+        """Тест что готовые копии не перекодируются без force"""
+        room = self.create_room()
+        self.assertEqual(
+            generate_derivatives(room.main_img.name)['variants'], {})
+        report = generate_derivatives(room.main_img.name, force=True)
+        self.assertEqual(len(report['variants']), 6)
+        self.assertLess(
+            report['variants'][derivative_name(room.main_img.name, 640, '.webp')],
+            report['original'],
+        )
+
+    def test_image_is_processed_only_when_changed(self):
+        """Тест что правка без смены фото не ставит перекодирование"""
+        room = self.create_room()
+        room.price = 1500
+        room.save()
+        self.assertFalse(Task.objects.filter(status=Task.PENDING).exists())
+
+        room.main_img = image_upload()
+        room.save()
+        self.assertEqual(
+            Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    def test_missing_original_is_ignored(self):
+        """Тест что отсутствующий оригинал не ломает генерацию"""
+        report = generate_derivatives('missing/photo.jpg')
+        self.assertEqual(report['variants'], {})
+
+    def test_template_tag_srcset(self):
+        """Тест тега responsive_image"""
+        template = Template(
+            '{% load catalog_images %}'
+            '{% responsive_image room.main_img alt=room.title %}'
+        )
+        room = create_room('no-derivatives')
+        html = template.render(Context({'room': room}))
+        self.assertNotIn('srcset', html)
+        room = self.create_room()
+        html = template.render(Context({'room': room}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('.640w.webp 640w', html)
+        self.assertIn('sizes=', html)
+        self.assertIn('alt="Фото"', html)
+
+    def test_backfill_command_reports_savings(self):
+        """Тест команды догенерации копий с отчётом"""
+        room = self.create_room()
+        for width in (320, 640, 1024):
+            default_storage.delete(
+                derivative_name(room.main_img.name, width, '.webp'))
+        out = StringIO()
+        call_command('generate_image_derivatives', workers=1, stdout=out)
+        self.assertTrue(default_storage.exists(
+            derivative_name(room.main_img.name, 1024, '.webp')))
+        self.assertIn('обработано: 1', out.getvalue())
+        self.assertIn('экономия', out.getvalue())
+
+
+class PageCacheTest(TestCase):
+    """Тесты кеша страниц и фрагментов каталога"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hotel = Hotel.objects.create(
+            title='Астория', country='RU', city='Санкт-Петербург')
+        cls.room = create_room('Люкс', hotel=cls.hotel)
+
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+        self.detail_url = reverse('room', kwargs={'slug': self.room.slug})
+
+    def test_repeated_request_is_served_from_cache(self):
+        """Тест что повторный запрос не обращается к БД"""
+        for url in (reverse('rooms'), self.detail_url, reverse('hotel')):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.content, second.content)
+        stats = cache_stats.snapshot()
+        self.assertEqual(stats['rooms'], {'hits': 1, 'misses': 1})
+        self.assertEqual(stats['room'], {'hits': 1, 'misses': 1})
+
+    def test_room_change_invalidates_detail_and_list(self):
+        """Тест сброса кеша при изменении номера"""
+        self.client.get(reverse('rooms'))
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.price = 4321
+            self.room.save()
+        self.assertContains(self.client.get(reverse('rooms')), '4321')
+        self.assertContains(self.client.get(self.detail_url), '4321')
+
+    def test_hotel_change_invalidates_room_fragment(self):
+        """Тест сброса страницы номера при изменении его отеля"""
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotel.city = 'Выборг'
+            self.hotel.save()
+        self.assertContains(self.client.get(self.detail_url), 'Выборг')
+
+    def test_m2m_change_invalidates_room(self):
+        """Тест сброса страницы номера при изменении связи с отелем"""
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.hotel.clear()
+        self.assertNotContains(self.client.get(self.detail_url), 'Астория')
+
+    def test_auth_state_is_part_of_key(self):
+        """Тест что анонимный и вошедший пользователь кешируются раздельно"""
+        self.client.get(self.detail_url)
+        self.client.force_login(User.objects.create(
+            email='cached@example.com', first_name='Кеш', last_name='Кешев'))
+        self.client.get(self.detail_url)
+        self.assertEqual(cache_stats.snapshot()['room']['misses'], 2)
+
+    @override_settings(CATALOG_PAGE_CACHE_DISABLED=['room'])
+    def test_cache_can_be_disabled_per_view(self):
+        """Тест отключения кеша для отдельного представления"""
+        self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url)
+        self.assertIsNotNone(response.context)
+        self.assertNotIn('room', cache_stats.snapshot())
+
+    def test_availability_search_is_not_cached(self):
+        """Тест что поиск по датам всегда считается заново"""
+        today = timezone.now().date()
+        params = {
+            'check_in': today + timedelta(days=1),
+            'check_out': today + timedelta(days=2),
+            'guests': 1,
+        }
+        self.client.get(reverse('rooms'), params)
+        self.assertNotIn('rooms', cache_stats.snapshot())
+
+
+@override_settings(ROOT_URLCONF='hotel.urls_async')
+class AsyncViewsTest(TestCase):
+    """Тесты async-представлений каталога для ASGI"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.hotel = Hotel.objects.create(
+            title='Астория', country='RU', city='Санкт-Петербург')
+        cls.other = Hotel.objects.create(
+            title='Москва', country='RU', city='Москва')
+        cls.room = create_room('Люкс', hotel=cls.hotel)
+        cls.small = create_room('Эконом', guests=1, hotel=cls.other)
+        cls.user = User.objects.create(email='async@example.com')
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return (
+            reverse('rooms'),
+            reverse('room', kwargs={'slug': self.room.slug}),
+            reverse('hotel'),
+        )
+
+    async def test_pages_match_sync_views(self):
+        """Тест что async-страницы совпадают с синхронными"""
+        for url in self.urls():
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.resolver_match.func.view_class.view_is_async)
+            cache.clear()
+            with self.settings(ROOT_URLCONF='hotel.urls'):
+                expected = await sync_to_async(self.client.get)(url)
+            self.assertEqual(response.content, expected.content)
+
+    async def test_search_and_facets(self):
+        """Тест режима поиска и фасетов в async-списке"""
+        response = await self.async_client.get(reverse('rooms'), {
+            'check_in': (self.today + timedelta(days=1)).isoformat(),
+            'check_out': (self.today + timedelta(days=3)).isoformat(),
+            'guests': 2,
+            'hotel': self.hotel.pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Люкс')
+        self.assertNotContains(response, 'Эконом')
+        response = await self.async_client.get(
+            reverse('rooms'), {'capacity': '1'})
+        self.assertContains(response, 'Эконом')
+        self.assertNotContains(response, 'Описание Люкс')
+
+    async def test_authenticated_user_and_missing_room(self):
+        """Тест страниц для вошедшего пользователя и 404"""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        for url in self.urls():
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(
+            reverse('room', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class RatePricingTest(TestCase):
+    """Тесты тарифов и расчёта стоимости проживания"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = create_room('rates', price=1000)
+        cls.other = create_room('rates-other', price=2000)
+        # Понедельник
+        cls.monday = date(2030, 6, 3)
+
+    def setUp(self):
+        cache.clear()
+
+    def add_rate(self, start, end, **kwargs):
+        kwargs.setdefault('room', self.room)
+        kwargs.setdefault('price', 1500)
+        with self.captureOnCommitCallbacks(execute=True):
+            return RoomRate.objects.create(
+                start_date=self.monday + timedelta(days=start),
+                end_date=self.monday + timedelta(days=end),
+                **kwargs,
+            )
+
+    def test_nightly_prices_match_per_night_rules(self):
+        """Тест срезов массива против расчёта каждой ночи отдельно"""
+        generator = random.Random(7)
+        for _ in range(200):
+            check_in = self.monday + timedelta(days=generator.randint(0, 6))
+            nights = generator.randint(1, 30)
+            rates = []
+            for priority in range(generator.randint(0, 4)):
+                start = check_in + timedelta(days=generator.randint(-10, 30))
+                rates.append((
+                    start, start + timedelta(days=generator.randint(1, 20)),
+                    generator.randint(1, 50) * 100,
+                    generator.choice([None, 9999]),
+                    generator.randint(1, 5),
+                ))
+            prices, min_stay = nightly_prices(1000, rates, check_in, nights)
+            expected = []
+            for offset in range(nights):
+                night = check_in + timedelta(days=offset)
+                price = 1000
+                for start, end, rate, weekend, _ in rates:
+                    if start <= night < end:
+                        price = rate
+                        if weekend is not None and night.weekday() in (4, 5):
+                            price = weekend
+                expected.append(price)
+            self.assertEqual(prices, expected)
+            covering = [
+                rate for rate in rates if rate[0] <= check_in < rate[1]]
+            self.assertEqual(
+                min_stay, covering[-1][4] if covering else 1)
+
+    def test_quote_rooms_in_one_query_and_cached(self):
+        """Тест расчёта для нескольких номеров одним запросом с кешем"""
+        self.add_rate(0, 7, price=1200, weekend_price=1800)
+        self.add_rate(5, 6, price=3000, priority=1, min_stay=2)
+        self.add_rate(0, 3, room=self.other, price=2500)
+        check_in = self.monday
+        check_out = self.monday + timedelta(days=7)
+        with self.assertNumQueries(1):
+            quotes = quote_rooms([self.room, self.other], check_in, check_out)
+        # Пн-Чт по 1200, пятница по приоритетному тарифу, суббота 1800
+        self.assertEqual(
+            quotes[self.room.pk], Quote(1200 * 5 + 3000 + 1800, 7, 1))
+        self.assertEqual(quotes[self.other.pk].total, 2500 * 3 + 2000 * 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                quote_rooms([self.room, self.other], check_in, check_out),
+                quotes)
+        self.assertFalse(quote_stay(
+            self.room, self.monday + timedelta(days=5),
+            self.monday + timedelta(days=6)).allowed)
+
+    def test_rate_change_invalidates_quote(self):
+        """Тест что изменение тарифа сбрасывает кеш расчётов"""
+        check_out = self.monday + timedelta(days=2)
+        self.assertEqual(quote_stay(self.room, self.monday, check_out).total,
+                         2000)
+        rate = self.add_rate(0, 1)
+        self.assertEqual(quote_stay(self.room, self.monday, check_out).total,
+                         2500)
+        with self.captureOnCommitCallbacks(execute=True):
+            rate.delete()
+        self.assertEqual(quote_stay(self.room, self.monday, check_out).total,
+                         2000)
+
+    def test_booking_charges_quote(self):
+        """Тест что бронь списывает ту же сумму, что показана в поиске"""
+        self.add_rate(0, 2, price=1700)
+        check_out = self.monday + timedelta(days=3)
+        guest = User.objects.create(email='rates@example.com')
+        booking = Booking.objects.create(
+            guest=guest, room=self.room, check_in_date=self.monday,
+            check_out_date=check_out, guest_count=1,
+        )
+        self.assertEqual(booking.total_price, 1700 * 2 + 1000)
+        Booking.objects.all().delete()
+        response = self.client.get(reverse('rooms'), {
+            'check_in': self.monday.isoformat(),
+            'check_out': check_out.isoformat(),
+            'guests': 1,
+        })
+        self.assertContains(response, f'{1700 * 2 + 1000} ₽ за проживание')
+
+    def test_room_pages_show_charged_price(self):
+        """Тест что страницы номера и брони показывают списанную сумму"""
+        self.add_rate(0, 7, price=1200, weekend_price=1800)
+        dates = {
+            'check_in': self.monday.isoformat(),
+            'check_out': (self.monday + timedelta(days=7)).isoformat(),
+        }
+        total = 1200 * 5 + 1800 * 2
+        response = self.client.get(
+            reverse('room', kwargs={'slug': self.room.slug}), dates)
+        self.assertEqual(response.context['quote'].total, total)
+        self.assertContains(response, f'{total} ₽')
+        self.assertContains(response, '<td>1800 ₽</td>')
+
+        self.client.force_login(
+            User.objects.create(email='shown@example.com'))
+        url = reverse('create_booking', kwargs={'slug': self.room.slug})
+        response = self.client.get(url, dates)
+        self.assertContains(response, f'{total} ₽ за проживание')
+        data = {
+            'check_in_date': dates['check_in'],
+            'check_out_date': dates['check_out'],
+            'guest_count': 1,
+        }
+        hold = self.client.post(
+            reverse('hold_room', kwargs={'slug': self.room.slug}), data)
+        self.assertEqual(hold.json()['total'], total)
+        self.client.post(url, {**data, 'hold': hold.json()['hold']})
+        self.assertEqual(Booking.objects.get().total_price, total)
+
+    def test_booking_form_enforces_min_stay(self):
+        """Тест отказа в брони короче минимального срока"""
+        self.add_rate(0, 7, min_stay=3)
+        form = BookingCreateForm(
+            {
+                'check_in_date': self.monday,
+                'check_out_date': self.monday + timedelta(days=2),
+                'guest_count': 1,
+            },
+            room=self.room,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('check_out_date', form.errors)
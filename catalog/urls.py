@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 
 urlpatterns = [
@@ -14,5 +14,25 @@ urlpatterns = [
         'hotels/',
         views.HotelList.as_view(),
         name='hotel'
-    )
+    ),
+    path(
+        'search/',
+        views.RoomSearchView.as_view(),
+        name='search'
+    ),
+]
+
+# Для ASGI: подключаются в hotel.urls_async перед обычными маршрутами
+async_urlpatterns = [
+    path('', async_views.AsyncHotelRoomListView.as_view(), name='rooms'),
+    path(
+        'catalog/<slug:slug>/',
+        async_views.AsyncHotelRoomDetailView.as_view(),
+        name='room'
+    ),
+    path(
+        'hotels/',
+        async_views.AsyncHotelList.as_view(),
+        name='hotel'
+    ),
 ]
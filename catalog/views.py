@@ -1,7 +1,21 @@
 from django.shortcuts import render
 from django.views import generic
 
+from hotel.constants import CATALOG_FRAGMENT_CACHE_TIMEOUT
+from hotel.pagination import CursorPaginationMixin
+
+from .cache import (
+    HOTEL_LIST_VERSION,
+    ROOM_LIST_VERSION,
+    PageCacheMixin,
+    attach_room_versions,
+    room_version_key,
+)
+from .facets import FacetSelection
+from .forms import AvailabilitySearchForm, StayDatesForm
 from .models import Hotel, HotelRoom
+from .pricing import RATES_VERSION, quote_rooms, quote_stay, room_rates
+from .search import get_search_backend
 
 
 CATALOG_TEMPLATE_DIR = 'catalog/'
@@ -20,20 +34,139 @@ def index(request):
     )
 
 
-class HotelRoomListView(generic.ListView):
+class HotelRoomListView(PageCacheMixin, CursorPaginationMixin,
+                        generic.ListView):
     model = HotelRoom
     context_object_name = 'rooms'
     paginate_by = 10
+    cursor_approximate_total = True
+    search_form_class = AvailabilitySearchForm
+
+    def get_cache_version_keys(self):
+        return [ROOM_LIST_VERSION]
+
+    def page_cache_enabled(self, request):
+        # Результаты поиска по датам зависят от броней, их не кешируем
+        return (
+            super().page_cache_enabled(request)
+            and not request.GET.get('check_in')
+        )
+
+    def get_search_form(self):
+        if not hasattr(self, '_search_form'):
+            # Режим поиска включается, только если переданы даты
+            data = self.request.GET if self.request.GET.get('check_in') else None
+            self._search_form = self.search_form_class(data)
+        return self._search_form
+
+    def get_facet_selection(self):
+        if not hasattr(self, '_facet_selection'):
+            self._facet_selection = FacetSelection(self.request.GET)
+        return self._facet_selection
+
+    def get_searched_queryset(self):
+        """Номера после поиска по датам, до фасетных фильтров."""
+        queryset = super().get_queryset()
+        form = self.get_search_form()
+        if form.is_bound and form.is_valid():
+            queryset = form.filter_queryset(queryset)
+        return queryset
+
+    def get_queryset(self):
+        return self.get_facet_selection().filter_queryset(
+            self.get_searched_queryset())
+
+    def get_facet_room_ids_queryset(self):
+        """pk номеров для счётчиков фасетов; None - весь каталог."""
+        form = self.get_search_form()
+        if not (form.is_bound and form.is_valid()):
+            return None
+        return self.get_searched_queryset().order_by().values_list(
+            'pk', flat=True)
+
+    def get_facet_room_ids(self):
+        queryset = self.get_facet_room_ids_queryset()
+        return None if queryset is None else list(queryset)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_form'] = self.get_search_form()
+        context['facets'] = self.get_facet_selection().facets(
+            room_ids=self.get_facet_room_ids())
+        context['fragment_cache_timeout'] = CATALOG_FRAGMENT_CACHE_TIMEOUT
+        attach_room_versions(context['rooms'])
+        self.attach_quotes(context['rooms'])
+        return context
 
+    def attach_quotes(self, rooms):
+        """Проставляет номерам стоимость проживания на даты поиска."""
+        form = self.get_search_form()
+        if not (form.is_bound and form.is_valid()):
+            return
+        quotes = quote_rooms(
+            rooms, form.cleaned_data['check_in'],
+            form.cleaned_data['check_out'])
+        for room in rooms:
+            room.quote = quotes[room.pk]
 
-class HotelRoomDetailView(generic.DetailView):
+
+class HotelRoomDetailView(PageCacheMixin, generic.DetailView):
     model = HotelRoom
     context_object_name = 'room'
 
-    def get_queryset(self):
-        return HotelRoom.objects.prefetch_related('hotel')
+    def get_cache_version_keys(self):
+        return [room_version_key(self.kwargs['slug']), RATES_VERSION]
+
+    def page_cache_enabled(self, request):
+        # Стоимость на выбранные даты не кешируем, как и поиск
+        return (
+            super().page_cache_enabled(request)
+            and not request.GET.get('check_in')
+        )
+
+    def get_pricing(self):
+        """Тарифы номера и стоимость на даты ?check_in=&check_out=.
+
+        Стоимость считает quote_stay(), как и при создании брони,
+        поэтому показанная сумма совпадает со списанной.
+        """
+        data = self.request.GET if self.request.GET.get('check_in') else None
+        form = StayDatesForm(data)
+        quote = None
+        if form.is_bound and form.is_valid():
+            quote = quote_stay(
+                self.object, form.cleaned_data['check_in'],
+                form.cleaned_data['check_out'])
+        return {
+            'stay_form': form,
+            'quote': quote,
+            'rates': room_rates(self.object),
+        }
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Отели номера читаются в шаблоне только при промахе фрагмента
+        context['fragment_cache_timeout'] = CATALOG_FRAGMENT_CACHE_TIMEOUT
+        attach_room_versions([self.object])
+        context.update(self.get_pricing())
+        return context
 
-class HotelList(generic.ListView):
+
+class HotelList(PageCacheMixin, CursorPaginationMixin, generic.ListView):
     model = Hotel
     context_object_name = 'hotels'
+    paginate_by = 20
+
+    def get_cache_version_keys(self):
+        return [HOTEL_LIST_VERSION]
+
+
+class RoomSearchView(generic.TemplateView):
+    template_name = f'{CATALOG_TEMPLATE_DIR}hotelroom_search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        context['results'] = get_search_backend().search(query)
+        return context
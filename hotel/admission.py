@@ -0,0 +1,265 @@
+"""Контроль допуска для дорогих представлений.
+
+Для имён URL из ADMISSION_LIMITS запросы с указанными методами
+проходят через корзину токенов на клиента (IP или пользователя)
+и ограничение числа одновременных запросов к маршруту. Лишние
+запросы сразу получают 429 или 503 с Retry-After, не доходя до
+хеширования пароля или блокировки БД.
+
+Состояние задаётся ADMISSION_STATE_BACKEND: LocalAdmissionState
+считает в памяти процесса, CacheAdmissionState - в общем кеше Django,
+тогда лимиты общие для всех процессов.
+"""
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.module_loading import import_string
+
+from hotel.async_auth import aload_session_and_user
+from hotel.metrics import registry
+
+
+ADMISSION_REJECTED = registry.counter(
+    'admission_rejected_total', 'Запросы, отклонённые контролем допуска.',
+    ('route', 'reason'),
+)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): число запросов за период в секундах."""
+    count, _, period = rate.partition('/')
+    try:
+        return int(count), PERIODS[period]
+    except (KeyError, ValueError):
+        raise ValueError(f'Некорректный лимит {rate!r}, ожидается N/s|m|h')
+
+
+class LocalAdmissionState:
+    """Корзины токенов и счётчики одновременных запросов процесса.
+
+    Простоявшие корзины удаляются раз в prune_interval секунд
+    и сразу, если корзин больше max_buckets.
+    """
+
+    max_buckets = 100_000
+    prune_interval = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._active = {}
+        self._pruned_at = time.monotonic()
+
+    def take(self, key, count, period, burst):
+        """Берёт токен; возвращает 0 или секунды до появления токена."""
+        refill = count / period
+        now = time.monotonic()
+        with self._lock:
+            if (now - self._pruned_at >= self.prune_interval
+                    or len(self._buckets) > self.max_buckets):
+                self._prune(now)
+            tokens, updated, _ = self._buckets.get(key, (burst, now, 0))
+            tokens = min(burst, tokens + (now - updated) * refill)
+            # Через burst / refill секунд простоя корзина снова полна
+            idle = burst / refill
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now, idle)
+                return 0
+            self._buckets[key] = (tokens, now, idle)
+        return (1 - tokens) / refill
+
+    def _prune(self, now):
+        # Полная корзина равна новой, её можно не хранить
+        self._buckets = {
+            key: value for key, value in self._buckets.items()
+            if now - value[1] < value[2]
+        }
+        self._pruned_at = now
+
+    def acquire(self, route, limit):
+        with self._lock:
+            active = self._active.get(route, 0)
+            if active >= limit:
+                return False
+            self._active[route] = active + 1
+            return True
+
+    def release(self, route):
+        with self._lock:
+            self._active[route] -= 1
+
+
+class CacheAdmissionState:
+    """Лимиты в общем кеше Django (Redis, Memcached).
+
+    Кеш даёт атомарными только add и incr, поэтому вместо корзины
+    токенов считается фиксированное окно: count запросов за period,
+    burst не используется. Счётчик одновременных запросов живёт
+    slot_timeout секунд, чтобы слоты упавшего процесса освободились.
+    """
+
+    slot_timeout = 60
+
+    def take(self, key, count, period, burst):
+        now = time.time()
+        window = int(now // period)
+        window_key = f'admission:rate:{key}:{window}'
+        cache.add(window_key, 0, period)
+        try:
+            used = cache.incr(window_key)
+        except ValueError:
+            return 0
+        if used <= count:
+            return 0
+        return (window + 1) * period - now
+
+    def acquire(self, route, limit):
+        key = f'admission:active:{route}'
+        cache.add(key, 0, self.slot_timeout)
+        try:
+            if cache.incr(key) <= limit:
+                return True
+            cache.decr(key)
+        except ValueError:
+            return True
+        return False
+
+    def release(self, route):
+        try:
+            cache.decr(f'admission:active:{route}')
+        except ValueError:
+            pass
+
+
+def client_ip(request):
+    """IP клиента для лимитов.
+
+    В ADMISSION_CLIENT_IP_HEADER каждый прокси дописывает адрес справа,
+    а левые записи задаёт сам клиент. Поэтому берётся запись, которую
+    дописал самый внешний из ADMISSION_TRUSTED_PROXIES доверенных
+    прокси; если записей меньше, используется REMOTE_ADDR.
+    """
+    header = getattr(settings, 'ADMISSION_CLIENT_IP_HEADER', None)
+    trusted = getattr(settings, 'ADMISSION_TRUSTED_PROXIES', 1)
+    if header and trusted > 0 and request.META.get(header):
+        # X-Forwarded-For: клиент, прокси1, прокси2
+        addresses = [
+            address.strip() for address in request.META[header].split(',')]
+        if len(addresses) >= trusted and addresses[-trusted]:
+            return addresses[-trusted]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def rejected_response(status, retry_after, message):
+    response = HttpResponse(
+        message, status=status, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class AdmissionControlMiddleware:
+    """Ограничивает частоту и параллельность запросов по ADMISSION_LIMITS.
+
+    Лимит имени URL - словарь: rate ('10/m'), burst (размер корзины,
+    по умолчанию число из rate), key ('ip' или 'user' - пользователь,
+    а для анонимов IP), concurrency (одновременных запросов в процессе
+    или во всех процессах с общим кешем) и methods (по умолчанию
+    ('POST',)). Должен стоять после AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.state = import_string(getattr(
+            settings, 'ADMISSION_STATE_BACKEND',
+            'hotel.admission.LocalAdmissionState'))()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        route, limit = self.get_limit(request)
+        if limit is None:
+            return self.get_response(request)
+        rejected = self.admit(request, route, limit)
+        if rejected is not None:
+            return rejected
+        try:
+            return self.get_response(request)
+        finally:
+            self.leave(route, limit)
+
+    async def __acall__(self, request):
+        route, limit = self.get_limit(request)
+        if limit is None:
+            return await self.get_response(request)
+        if limit.get('key') == 'user':
+            await aload_session_and_user(request)
+        rejected = self.admit(request, route, limit)
+        if rejected is not None:
+            return rejected
+        try:
+            return await self.get_response(request)
+        finally:
+            self.leave(route, limit)
+
+    def get_limit(self, request):
+        limits = getattr(settings, 'ADMISSION_LIMITS', {})
+        if not limits:
+            return None, None
+        # Безопасные запросы не разрешаются повторно: лимиты обычно
+        # только на POST
+        if not any(
+                request.method in limit.get('methods', ('POST',))
+                for limit in limits.values()):
+            return None, None
+        try:
+            match = resolve(
+                request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return None, None
+        limit = limits.get(match.view_name)
+        if limit is None or request.method not in limit.get(
+                'methods', ('POST',)):
+            return None, None
+        return match.view_name, limit
+
+    def client_key(self, request, limit):
+        if limit.get('key') == 'user' and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{client_ip(request)}'
+
+    def admit(self, request, route, limit):
+        if 'rate' in limit:
+            count, period = parse_rate(limit['rate'])
+            retry_after = self.state.take(
+                f'{route}:{self.client_key(request, limit)}',
+                count, period, limit.get('burst', count),
+            )
+            if retry_after:
+                ADMISSION_REJECTED.inc(route=route, reason='rate')
+                return rejected_response(
+                    429, retry_after, 'Слишком много запросов, '
+                    'повторите позже.')
+        concurrency = limit.get('concurrency')
+        if concurrency and not self.state.acquire(route, concurrency):
+            ADMISSION_REJECTED.inc(route=route, reason='concurrency')
+            return rejected_response(
+                503, limit.get('retry_after', 1),
+                'Сервер перегружен, повторите позже.')
+        return None
+
+    def leave(self, route, limit):
+        if limit.get('concurrency'):
+            self.state.release(route)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class HotelConfig(AppConfig):
+    """Общие для проекта команды управления, проверки и тесты."""
+
+    name = 'hotel'
+
+    def ready(self):
+        from . import checks  # noqa: F401
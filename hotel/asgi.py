@@ -9,8 +9,27 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hotel.settings')
 
+
+class HotelASGIHandler(ASGIHandler):
+    """Запросы ASGI разрешаются по ASGI_ROOT_URLCONF."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        urlconf = getattr(settings, 'ASGI_ROOT_URLCONF', None)
+        if request is not None and urlconf:
+            request.urlconf = urlconf
+        return request, error_response
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return HotelASGIHandler()
+
+
 application = get_asgi_application()
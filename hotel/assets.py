@@ -0,0 +1,233 @@
+"""Сборка и раздача статики без отдельного веб-сервера.
+
+При collectstatic PipelineStaticFilesStorage склеивает и минифицирует
+бандлы из STATIC_BUNDLES, добавляет хеш содержимого в имена файлов
+(ManifestStaticFilesStorage) и рядом с текстовыми файлами кладёт
+сжатые копии .gz и .br (brotli - если установлен пакет Brotli).
+
+StaticFilesMiddleware отдаёт собранное из STATIC_ROOT: выбирает сжатую
+копию по Accept-Encoding, а файлам с хешем в имени ставит кеширование
+на год. Включается настройкой STATIC_SERVE.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import (
+    FileResponse,
+    HttpResponseNotFound,
+    HttpResponseNotModified,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+# Меньшие файлы сжатие почти не уменьшает
+COMPRESS_MIN_SIZE = 256
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Сжатые копии в порядке предпочтения: кодировка и суффикс файла
+COMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+MUTABLE_MAX_AGE = 60
+
+# Строки и url(...) в CSS не трогаются
+CSS_PROTECTED = re.compile(
+    r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\))''')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACES_AROUND = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(css):
+    parts = CSS_PROTECTED.split(CSS_COMMENT.sub('', css))
+    for index in range(0, len(parts), 2):
+        code = ' '.join(parts[index].split())
+        code = CSS_SPACES_AROUND.sub(r'\1', code)
+        # Пробел перед «:» значим в селекторах («a :hover»), после - нет
+        parts[index] = code.replace(': ', ':').replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def build_bundle(storage, sources):
+    """Склеивает исходные файлы бандла в порядке перечисления."""
+    chunks = []
+    for source in sources:
+        with storage.open(source) as file:
+            chunks.append(file.read().decode())
+    return minify_css('\n'.join(chunks))
+
+
+def compress_file(storage, name):
+    """Кладёт рядом с файлом .gz и .br, если они меньше оригинала."""
+    with storage.open(name) as file:
+        content = file.read()
+    if len(content) < COMPRESS_MIN_SIZE:
+        return []
+    compressed = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressed.append(('.br', brotli.compress(content)))
+    created = []
+    for suffix, data in compressed:
+        if len(data) >= len(content):
+            continue
+        if storage.exists(name + suffix):
+            storage.delete(name + suffix)
+        storage._save(name + suffix, ContentFile(data))
+        created.append(name + suffix)
+    return created
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме запрещённых через q=0."""
+    encodings = set()
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+class PipelineStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        bundles = getattr(settings, 'STATIC_BUNDLES', {})
+        for name, sources in bundles.items():
+            content = build_bundle(self, sources)
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(content.encode()))
+            paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run, **options)
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                for compressed in compress_file(self, name):
+                    yield compressed, compressed, True
+
+
+class StaticFilesMiddleware:
+    """Раздаёт STATIC_ROOT раньше остальных middleware.
+
+    Должен стоять сразу после SecurityMiddleware: запросы к статике не
+    читают сессию и пользователя.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'STATIC_SERVE', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        if not self.prefix.startswith('/'):
+            self.prefix = '/' + self.prefix
+        self.root = Path(settings.STATIC_ROOT)
+        self._immutable = None
+        self._files = {}
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self.serve(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    @property
+    def immutable(self):
+        # Имена с хешем из манифеста collectstatic
+        if self._immutable is None:
+            hashed = getattr(staticfiles_storage, 'hashed_files', {})
+            self._immutable = frozenset(hashed.values())
+        return self._immutable
+
+    def find(self, name):
+        """Путь, размер, время изменения и сжатые копии файла."""
+        found = self._files.get(name)
+        if found is not None:
+            return found
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            # Промахи не запоминаются, иначе кеш растёт от любых адресов
+            return None
+        stat = os.stat(path)
+        found = self._files[name] = (path, stat.st_size, stat.st_mtime, {
+            encoding: path + suffix
+            for encoding, suffix in COMPRESSED_VARIANTS
+            if os.path.isfile(path + suffix)
+        })
+        return found
+
+    def serve(self, request):
+        if request.method not in ('GET', 'HEAD') or not (
+                request.path_info.startswith(self.prefix)):
+            return None
+        name = request.path_info[len(self.prefix):]
+        for _, suffix in COMPRESSED_VARIANTS:
+            # Сжатая копия отдаётся только по Accept-Encoding на адрес
+            # оригинала: напрямую она ушла бы с типом оригинала и без
+            # Content-Encoding
+            if name.endswith(suffix) and self.find(name[:-len(suffix)]):
+                return HttpResponseNotFound()
+        found = self.find(name)
+        if found is None:
+            return None
+        path, size, mtime, variants = found
+        if not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            return HttpResponseNotModified()
+        content_type, _ = mimetypes.guess_type(name)
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = next(
+            (encoding for encoding, _ in COMPRESSED_VARIANTS
+             if encoding in variants and encoding in accepted),
+            None,
+        )
+        if encoding:
+            path = variants[encoding]
+            size = os.path.getsize(path)
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if variants:
+            response['Vary'] = 'Accept-Encoding'
+        response['Content-Length'] = size
+        response['Last-Modified'] = http_date(mtime)
+        if name in self.immutable:
+            response['Cache-Control'] = (
+                f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+        else:
+            response['Cache-Control'] = f'public, max-age={MUTABLE_MAX_AGE}'
+        return response
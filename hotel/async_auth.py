@@ -0,0 +1,31 @@
+"""Сессия и пользователь для async-представлений.
+
+В Django 4.2 request.user и request.session загружаются синхронно при
+первом обращении, а в async-коде это SynchronousOnlyOperation. Здесь
+сессия и пользователь читаются заранее за один переход в поток
+(и вовсе без него, если куки сессии нет), после чего шаблоны
+и middleware работают с уже загруженными данными.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+
+
+def load_session_and_user(request):
+    request.session.keys()
+    if not hasattr(request, '_cached_user'):
+        # Тот же атрибут читает AuthenticationMiddleware
+        request._cached_user = auth.get_user(request)
+    return request._cached_user
+
+
+async def aload_session_and_user(request):
+    if hasattr(request, '_cached_user'):
+        return request._cached_user
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        # Без ключа сессия пустая и не читается из хранилища
+        request.session.keys()
+        request._cached_user = AnonymousUser()
+        return request._cached_user
+    return await sync_to_async(load_session_and_user)(request)
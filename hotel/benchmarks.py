@@ -0,0 +1,12 @@
+"""Общие части команд замера производительности."""
+import math
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию замера, чтобы не оставлять данных."""
+
+
+def percentile(values, rank):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
@@ -0,0 +1,32 @@
+"""Проверка, что кеш Django общий для всех процессов приложения."""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def cache_is_shared(alias='default'):
+    """Видна ли запись в кеш другому экземпляру того же бэкенда.
+
+    Второй экземпляр создаётся заново, как в другом процессе. LocMemCache
+    с тем же LOCATION делит хранилище только внутри процесса, поэтому
+    бэкенды из PROCESS_LOCAL_CACHE_BACKENDS отсекаются без проверки.
+    Недоступный кеш тоже считается не общим.
+    """
+    backend = settings.CACHES[alias]['BACKEND']
+    if backend in settings.PROCESS_LOCAL_CACHE_BACKENDS:
+        return False
+    key = f'hotel:shared-cache-probe:{uuid.uuid4().hex}'
+    token = uuid.uuid4().hex
+    writer = caches[alias]
+    reader = caches.create_connection(alias)
+    try:
+        writer.set(key, token, 30)
+        try:
+            return reader.get(key) == token
+        finally:
+            writer.delete(key)
+    except Exception:
+        return False
+    finally:
+        reader.close()
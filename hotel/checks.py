@@ -0,0 +1,40 @@
+"""Системные проверки настроек проекта."""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .caches import cache_is_shared
+
+CACHE_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+PROFILE_CACHE_BACKEND = 'user.backends.CachedProfileBackend'
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Кеш сессий и профилей только в памяти процесса - ошибка.
+
+    Выход или смена пароля сбрасывают сессию и версию профиля лишь в
+    своём процессе, остальные продолжают пускать по старым данным.
+    """
+    users = []
+    if settings.SESSION_ENGINE in CACHE_SESSION_ENGINES:
+        users.append(f'SESSION_ENGINE = {settings.SESSION_ENGINE!r}')
+    if PROFILE_CACHE_BACKEND in settings.AUTHENTICATION_BACKENDS:
+        users.append(f'{PROFILE_CACHE_BACKEND} в AUTHENTICATION_BACKENDS')
+    if not users or cache_is_shared():
+        return []
+    return [
+        Error(
+            'Кеш по умолчанию не общий для процессов: '
+            + ', '.join(users) + '.',
+            hint=(
+                "Настройте в CACHES общий бэкенд (файлы, Redis, "
+                "Memcached) или используйте SESSION_STRATEGY = 'db' "
+                "без CachedProfileBackend."
+            ),
+            id='hotel.E001',
+        )
+    ]
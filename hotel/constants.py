@@ -6,3 +6,52 @@ NAME_MAX_LENGTH = 150
 EMAIL_MAX_LENGTH = 254
 DESCRIPTION_MAX_LENGTH = 1000
 MAX_GUESTS_VALUE = 5
+CURSOR_COUNT_CACHE_TIMEOUT = 60
+SEARCH_RESULTS_LIMIT = 50
+SEARCH_SNIPPET_TOKENS = 16
+FACET_INDEX_CACHE_TIMEOUT = 60 * 60
+PRICE_BANDS = (
+    ('lt3000', 0, 3000, 'до 3 000 ₽'),
+    ('3000-7000', 3000, 7000, '3 000 - 7 000 ₽'),
+    ('7000-15000', 7000, 15000, '7 000 - 15 000 ₽'),
+    ('gte15000', 15000, None, 'от 15 000 ₽'),
+)
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1024)
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_WEBP_QUALITY = 75
+IMAGE_DEFAULT_SIZES = '(max-width: 576px) 100vw, 33vw'
+IMAGE_DERIVATIVE_CACHE_TIMEOUT = 60 * 5
+CATALOG_PAGE_CACHE_TIMEOUT = 60 * 10
+CATALOG_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+METRICS_SIZE_BUCKETS = (
+    100, 1000, 10_000, 50_000, 100_000, 500_000, 1_000_000,
+)
+METRICS_COLLECTOR_CACHE_SECONDS = 15
+PROFILE_HISTORY_PAGE_SIZE = 12
+PROFILE_CACHE_SIZE = 10_000
+PROFILE_CACHE_TIMEOUT = 60 * 5
+FORM_CHROME_CACHE_TIMEOUT = 60 * 60
+ANALYTICS_REBUILD_WINDOW_DAYS = 366
+CALENDAR_CACHE_TIMEOUT = 60 * 10
+CALENDAR_DEFAULT_MONTHS = 6
+CALENDAR_MAX_MONTHS = 12
+CALENDAR_BATCH_LIMIT = 100
+CALENDAR_HTTP_MAX_AGE = 30
+QUOTE_CACHE_TIMEOUT = 60 * 10
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+BOOKING_RETRY_ATTEMPTS = 5
+BOOKING_RETRY_BACKOFF = 0.05
+BOOKING_RETRY_BACKOFF_MAX = 1
+BOOKING_HOLD_TTL = 60 * 10
+BOOKING_HOLD_SWEEP_BATCH = 1_000
+TASK_NAME_MAX_LENGTH = 200
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BACKOFF = 10
+TASK_RETRY_BACKOFF_MAX = 60 * 60
+TASK_LEASE_SECONDS = 60 * 5
+TASK_WORKER_THREADS = 4
+TASK_POLL_INTERVAL = 1
+TASK_DONE_RETENTION_DAYS = 7
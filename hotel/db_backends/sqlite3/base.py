@@ -0,0 +1,37 @@
+"""SQLite с выбором режима BEGIN для транзакций.
+
+OPTIONS['transaction_mode'] задаёт режим для всех транзакций
+(DEFERRED, IMMEDIATE или EXCLUSIVE), immediate_atomic() - для одного
+блока. BEGIN IMMEDIATE сразу берёт блокировку записи, и конкурирующие
+писатели ждут busy_timeout, а не падают с "database is locked" при
+повышении блокировки чтения до записи.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'Недопустимый transaction_mode {mode!r}, ожидается один из '
+                f'{", ".join(TRANSACTION_MODES)}.'
+            )
+        self.transaction_mode = mode.upper() if mode else None
+        # Выставляется immediate_atomic() на время внешнего BEGIN
+        self.begin_immediate = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        mode = 'IMMEDIATE' if self.begin_immediate else self.transaction_mode
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,214 @@
+"""Маршрутизация чтения на реплики БД.
+
+Чтения моделей из DATABASE_REPLICA_APPS и все чтения в представлениях
+с ReplicaReadsMixin уходят на реплики из DATABASE_REPLICAS. Запись
+всегда идёт в default. После записи сессия закрепляется за primary
+на DATABASE_PIN_SECONDS, чтобы пользователь сразу видел свои изменения.
+Недоступная реплика исключается на DATABASE_REPLICA_RETRY_SECONDS.
+"""
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from hotel.async_auth import aload_session_and_user
+
+
+logger = logging.getLogger(__name__)
+
+PIN_SESSION_KEY = '_db_pinned_until'
+
+
+@dataclass
+class RoutingState:
+    pinned: bool = False
+    replica_reads: bool = False
+    wrote: bool = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def current_state():
+    return _state.get()
+
+
+@contextmanager
+def routing_state(**kwargs):
+    token = _state.set(RoutingState(**kwargs))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def pin_to_primary():
+    """Все чтения внутри блока идут в primary."""
+    state = current_state()
+    if state is None:
+        with routing_state(pinned=True):
+            yield
+        return
+    pinned, state.pinned = state.pinned, True
+    try:
+        yield
+    finally:
+        state.pinned = pinned
+
+
+class ReplicaHealth:
+    """Реплики, на которых не удалось открыть соединение."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._down_until = {}
+
+    def is_healthy(self, alias):
+        with self._lock:
+            down_until = self._down_until.get(alias)
+        if down_until is not None and time.monotonic() < down_until:
+            return False
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as error:
+            self.mark_down(alias, error)
+            return False
+        with self._lock:
+            self._down_until.pop(alias, None)
+        return True
+
+    def mark_down(self, alias, error=None):
+        retry = getattr(settings, 'DATABASE_REPLICA_RETRY_SECONDS', 30)
+        logger.warning(
+            'Реплика %s недоступна, чтение идёт в primary %s с: %s',
+            alias, retry, error,
+        )
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + retry
+
+    def reset(self):
+        with self._lock:
+            self._down_until.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def get_replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', ())
+
+    def read_from_replica(self, model):
+        state = current_state()
+        if state is not None and (state.pinned or state.wrote):
+            return False
+        # Внутри транзакции читаем то, что в ней же записано
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return False
+        if state is not None and state.replica_reads:
+            return True
+        return model._meta.app_label in getattr(
+            settings, 'DATABASE_REPLICA_APPS', ())
+
+    def db_for_read(self, model, **hints):
+        replicas = self.get_replicas()
+        if not replicas or not self.read_from_replica(model):
+            return None
+        start = next(self._counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if replica_health.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = current_state()
+        # Запись самой сессии (вход, выход, сброс после смены пароля)
+        # не закрепляет её: иначе сброшенная сессия создаётся заново
+        # ради одного ключа
+        if state is not None and model._meta.app_label != 'sessions':
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и primary
+        databases = {DEFAULT_DB_ALIAS, *self.get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Закрепляет сессию за primary после записи и на небезопасных методах.
+
+    Должен стоять после SessionMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_state(pinned=self.is_pinned(request)) as state:
+            request.db_routing = state
+            response = self.get_response(request)
+        self.pin_after_write(request, state)
+        return response
+
+    async def __acall__(self, request):
+        # Сессия нужна до представления; пользователь читается тем же
+        # переходом в поток
+        if getattr(request, 'session', None) is not None:
+            await aload_session_and_user(request)
+        with routing_state(pinned=self.is_pinned(request)) as state:
+            request.db_routing = state
+            response = await self.get_response(request)
+        self.pin_after_write(request, state)
+        return response
+
+    @staticmethod
+    def is_pinned(request):
+        session = getattr(request, 'session', None)
+        pinned_until = (
+            session.get(PIN_SESSION_KEY, 0) if session is not None else 0)
+        return (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or pinned_until > time.time()
+        )
+
+    @staticmethod
+    def pin_after_write(request, state):
+        session = getattr(request, 'session', None)
+        if state.wrote and session is not None:
+            session[PIN_SESSION_KEY] = time.time() + getattr(
+                settings, 'DATABASE_PIN_SECONDS', 5)
+
+
+class ReplicaReadsMixin:
+    """Все чтения представления идут на реплику, если сессия не закреплена."""
+
+    def dispatch(self, request, *args, **kwargs):
+        # Флаг живёт до конца запроса: ленивые queryset выполняются
+        # уже при рендеринге шаблона
+        state = getattr(request, 'db_routing', None)
+        if state is not None:
+            state.replica_reads = True
+        return super().dispatch(request, *args, **kwargs)
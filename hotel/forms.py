@@ -0,0 +1,47 @@
+"""Кеш HTML несвязанных crispy-форм.
+
+Разметка пустой формы одинакова для всех запросов, кроме
+CSRF-токена: она рендерится один раз с заглушкой вместо токена,
+а в запросе подставляется только токен. Значения полей и атрибуты
+виджетов (например, min у дат) входят в ключ кеша. Связанные формы
+с данными и ошибками рендерятся как обычно.
+"""
+import hashlib
+
+from crispy_forms.utils import render_crispy_form
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from hotel.constants import FORM_CHROME_CACHE_TIMEOUT
+
+
+CSRF_PLACEHOLDER = 'csrf0token0placeholder0for0cached0form0chrome'
+
+
+def form_chrome_key(form):
+    form_class = type(form)
+    state = (
+        form_class.__module__,
+        form_class.__qualname__,
+        form.prefix,
+        [
+            (name, form[name].value(), sorted(field.widget.attrs.items()))
+            for name, field in form.fields.items()
+        ],
+    )
+    digest = hashlib.md5(repr(state).encode()).hexdigest()
+    return f'form-chrome:{digest}'
+
+
+def render_form(form, context):
+    """Аналог {% crispy form %} с кешем разметки несвязанной формы."""
+    csrf_token = context.get('csrf_token')
+    if form.is_bound or csrf_token is None:
+        return render_crispy_form(form, context=context.flatten())
+    key = form_chrome_key(form)
+    html = cache.get(key)
+    if html is None:
+        html = render_crispy_form(
+            form, context={'csrf_token': CSRF_PLACEHOLDER})
+        cache.set(key, html, FORM_CHROME_CACHE_TIMEOUT)
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, str(csrf_token)))
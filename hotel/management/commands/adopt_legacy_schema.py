@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, migrations
+from django.db.migrations.executor import MigrationExecutor
+
+# Приложения, схему которых до появления миграций создавал
+# migrate --run-syncdb
+LEGACY_APPS = ('booking', 'catalog', 'user')
+
+
+class Command(BaseCommand):
+    help = (
+        'Отмечает применёнными миграции booking, catalog и user, чьи '
+        'таблицы, поля, индексы и ограничения уже есть в базе. Нужна '
+        'один раз для базы, созданной через migrate --run-syncdb.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        executor = MigrationExecutor(connection)
+        loader = executor.loader
+        applied = set(loader.applied_migrations)
+        plan = executor.migration_plan(loader.graph.leaf_nodes())
+        adopted = 0
+        for migration, _ in plan:
+            key = (migration.app_label, migration.name)
+            if migration.app_label not in LEGACY_APPS:
+                continue
+            parents = {node.key for node in loader.graph.node_map[key].parents}
+            # После первой отсутствующей миграции следующие не трогаем:
+            # их применит обычный migrate
+            if not parents <= applied:
+                continue
+            state = loader.project_state(key, at_end=True)
+            if not self.schema_exists(connection, migration, state):
+                continue
+            executor.recorder.record_applied(*key)
+            applied.add(key)
+            adopted += 1
+            self.stdout.write(f'Отмечена применённой: {key[0]}.{key[1]}')
+        self.stdout.write(f'Отмечено миграций: {adopted}')
+
+    @staticmethod
+    def schema_exists(connection, migration, state):
+        """Есть ли в базе всё, что создаёт миграция.
+
+        Операции без собственной схемы (AlterField, опции модели) не
+        проверяются; миграция только из них считается отсутствующей.
+        """
+        introspection = connection.introspection
+        found = False
+        with connection.cursor() as cursor:
+            tables = set(introspection.table_names(cursor))
+            for operation in migration.operations:
+                if isinstance(operation, migrations.CreateModel):
+                    name = operation.name
+                elif isinstance(operation, (
+                        migrations.AddField, migrations.AddIndex,
+                        migrations.AddConstraint)):
+                    name = operation.model_name
+                else:
+                    continue
+                model = state.apps.get_model(migration.app_label, name)
+                table = model._meta.db_table
+                if table not in tables:
+                    return False
+                if isinstance(operation, migrations.AddField):
+                    field = model._meta.get_field(operation.name)
+                    if field.many_to_many:
+                        through = field.remote_field.through._meta.db_table
+                        if through not in tables:
+                            return False
+                    elif field.column not in {
+                            column.name for column in
+                            introspection.get_table_description(
+                                cursor, table)}:
+                        return False
+                elif isinstance(operation, migrations.AddIndex):
+                    if operation.index.name not in \
+                            introspection.get_constraints(cursor, table):
+                        return False
+                elif isinstance(operation, migrations.AddConstraint):
+                    if operation.constraint.name not in \
+                            introspection.get_constraints(cursor, table):
+                        return False
+                found = True
+        return found
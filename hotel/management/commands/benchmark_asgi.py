@@ -0,0 +1,155 @@
+import asyncio
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from hotel.benchmarks import percentile
+
+
+HOST = 'testserver'
+
+
+def wsgi_environ(url):
+    parts = urlsplit(url)
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def asgi_scope(url):
+    parts = urlsplit(url)
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(),
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает обработку страниц каталога через WSGI (пул потоков) '
+        'и ASGI (async-представления) при заданном числе одновременных '
+        'запросов: запросов в секунду, задержки и пик памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append',
+            help='Адрес страницы, можно несколько раз. '
+                 'По умолчанию список номеров и отелей.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[10, 100, 500],
+            help='Число одновременных запросов.',
+        )
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Потоков WSGI-сервера (как --threads у gunicorn).',
+        )
+
+    def handle(self, *args, **options):
+        from hotel.asgi import application as asgi_application
+        from hotel.wsgi import application as wsgi_application
+
+        urls = options['url'] or ['/', '/hotels/']
+        self.stdout.write(
+            f"{'сервер':<8}{'одновременно':>14}{'запросов/с':>12}"
+            f"{'p50, мс':>10}{'p95, мс':>10}{'память, КиБ':>13}{'ошибки':>8}"
+        )
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST]):
+            for concurrency in options['concurrency']:
+                for name, run in (
+                    ('wsgi', lambda: self.run_wsgi(
+                        wsgi_application, urls, options['requests'],
+                        min(concurrency, options['threads']))),
+                    ('asgi', lambda: asyncio.run(self.run_asgi(
+                        asgi_application, urls, options['requests'],
+                        concurrency))),
+                ):
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    timings, errors = run()
+                    elapsed = time.perf_counter() - started
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    self.stdout.write(
+                        f'{name:<8}{concurrency:>14}'
+                        f'{len(timings) / elapsed:>12.0f}'
+                        f'{percentile(timings, 50) * 1000:>10.1f}'
+                        f'{percentile(timings, 95) * 1000:>10.1f}'
+                        f'{peak / 1024:>13.0f}{errors:>8}'
+                    )
+
+    @staticmethod
+    def run_wsgi(application, urls, total, threads):
+        # Сверх числа потоков запросы ждут в очереди, как у WSGI-сервера
+        def call(number):
+            statuses = []
+            started = time.perf_counter()
+            body = application(
+                wsgi_environ(urls[number % len(urls)]),
+                lambda status, headers, exc_info=None: statuses.append(status),
+            )
+            b''.join(body)
+            body.close()
+            return time.perf_counter() - started, statuses[0][:3] != '200'
+
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(call, range(total)))
+        return sorted(timing for timing, _ in results), sum(
+            error for _, error in results)
+
+    @staticmethod
+    async def run_asgi(application, urls, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def call(number):
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                started = time.perf_counter()
+                await application(
+                    asgi_scope(urls[number % len(urls)]), receive, send)
+                failed = messages[0]['status'] != 200
+                return time.perf_counter() - started, failed
+
+        results = await asyncio.gather(
+            *(call(number) for number in range(total)))
+        return sorted(timing for timing, _ in results), sum(
+            error for _, error in results)
@@ -0,0 +1,68 @@
+import copy
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import RequestContext, Template
+from django.test import RequestFactory
+
+from booking.forms import BookingCreateForm
+from hotel.benchmarks import percentile
+from user.forms import LoginForm, SignUpForm
+
+
+FORMS = {
+    'booking': BookingCreateForm,
+    'login': LoginForm,
+    'signup': SignUpForm,
+}
+
+CRISPY = Template('{% load crispy_forms_tags %}{% crispy form %}')
+CACHED = Template('{% load cached_forms %}{% crispy_cached form %}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает создание и рендеринг форм: helper на каждый экземпляр '
+        'и полный {% crispy %} (как было) против helper на класс '
+        'и {% crispy_cached %}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cache.clear()
+        factory = RequestFactory()
+        self.stdout.write(
+            f"{'форма':<10}{'было, мкс':>12}{'стало, мкс':>12}"
+            f"{'ускорение':>11}")
+        for name, form_class in FORMS.items():
+            before = self.measure(
+                factory, form_class, CRISPY, options['iterations'],
+                per_instance_helper=True)
+            after = self.measure(
+                factory, form_class, CACHED, options['iterations'])
+            self.stdout.write(
+                f'{name:<10}{before:>12.0f}{after:>12.0f}'
+                f'{before / after:>10.1f}x'
+            )
+
+    @staticmethod
+    def measure(factory, form_class, template, iterations,
+                per_instance_helper=False):
+        timings = []
+        for _ in range(iterations):
+            request = factory.get('/')
+            started = time.perf_counter()
+            form = (
+                form_class(request) if form_class is LoginForm
+                else form_class()
+            )
+            if per_instance_helper:
+                # Прежняя сборка FormHelper и Layout в __init__
+                form.helper = copy.deepcopy(form_class.helper)
+            template.render(RequestContext(request, {'form': form}))
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        return percentile(timings, 50)
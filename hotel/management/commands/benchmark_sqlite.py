@@ -0,0 +1,175 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from hotel.sqlite_profile import PRODUCTION_PRAGMAS, apply_pragmas
+
+
+ROOMS = 200
+
+# Схема повторяет реестр ночей: уникальность (номер, ночь) на уровне БД
+SCHEMA = '''
+CREATE TABLE booking (
+    id INTEGER PRIMARY KEY,
+    room_id INTEGER NOT NULL,
+    check_in_date TEXT NOT NULL,
+    check_out_date TEXT NOT NULL
+);
+CREATE TABLE room_night (
+    id INTEGER PRIMARY KEY,
+    room_id INTEGER NOT NULL,
+    booking_id INTEGER NOT NULL REFERENCES booking (id),
+    date TEXT NOT NULL,
+    UNIQUE (room_id, date)
+);
+CREATE INDEX booking_room_dates ON booking (room_id, check_in_date,
+                                            check_out_date);
+'''
+
+PROFILES = {
+    # Django по умолчанию: журнал отката, отложенный BEGIN, ожидание 5 с
+    'default': {'pragmas': {}, 'begin': 'BEGIN'},
+    'production': {'pragmas': PRODUCTION_PRAGMAS, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность SQLite с параллельными '
+        'писателями и читателями для профиля по умолчанию и рабочего '
+        'профиля (WAL, busy_timeout, BEGIN IMMEDIATE).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+            help='Число писателей и столько же читателей в прогоне.',
+        )
+        parser.add_argument('--duration', type=float, default=3.0)
+        parser.add_argument(
+            '--profile', choices=tuple(PROFILES), action='append',
+            help='Профиль для замера, можно несколько раз. По умолчанию оба.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'профиль':<12}{'потоки':>8}{'записей/с':>12}"
+            f"{'чтений/с':>12}{'locked':>9}{'конфликты':>11}"
+        )
+        for name in options['profile'] or PROFILES:
+            for threads in options['threads']:
+                result = self.run(
+                    PROFILES[name], threads, options['duration'])
+                self.stdout.write(
+                    f"{name:<12}{threads:>8}"
+                    f"{result['writes'] / options['duration']:>12.0f}"
+                    f"{result['reads'] / options['duration']:>12.0f}"
+                    f"{result['locked']:>9}{result['conflicts']:>11}"
+                )
+
+    def run(self, profile, threads, duration):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            setup = self.connect(path, profile)
+            setup.executescript(SCHEMA)
+            setup.close()
+            result = {'writes': 0, 'reads': 0, 'locked': 0, 'conflicts': 0}
+            lock = threading.Lock()
+            barrier = threading.Barrier(threads * 2)
+            deadline = []
+
+            def worker(target, seed):
+                connection = self.connect(path, profile)
+                counts = dict.fromkeys(result, 0)
+                generator = random.Random(seed)
+                barrier.wait()
+                if not deadline:
+                    deadline.append(time.monotonic() + duration)
+                try:
+                    while time.monotonic() < deadline[0]:
+                        target(connection, generator, counts, profile)
+                finally:
+                    connection.close()
+                    with lock:
+                        for key, value in counts.items():
+                            result[key] += value
+
+            workers = [
+                threading.Thread(target=worker, args=(self.write, number))
+                for number in range(threads)
+            ] + [
+                threading.Thread(target=worker, args=(self.read, -number))
+                for number in range(1, threads + 1)
+            ]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            return result
+
+    @staticmethod
+    def connect(path, profile):
+        connection = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False)
+        apply_pragmas(connection, profile['pragmas'])
+        return connection
+
+    @staticmethod
+    def stay(generator):
+        check_in = date(2030, 1, 1) + timedelta(
+            days=generator.randint(0, 3_000))
+        return check_in, check_in + timedelta(days=generator.randint(1, 5))
+
+    def write(self, connection, generator, counts, profile):
+        room = generator.randint(1, ROOMS)
+        check_in, check_out = self.stay(generator)
+        nights = [
+            (check_in + timedelta(days=offset)).isoformat()
+            for offset in range((check_out - check_in).days)
+        ]
+        try:
+            connection.execute(profile['begin'])
+            # Проверка перед записью, как в форме бронирования: при
+            # отложенном BEGIN здесь берётся блокировка чтения
+            connection.execute(
+                'SELECT COUNT(*) FROM room_night '
+                'WHERE room_id = ? AND date >= ? AND date < ?',
+                (room, check_in.isoformat(), check_out.isoformat()),
+            ).fetchone()
+            booking = connection.execute(
+                'INSERT INTO booking (room_id, check_in_date, check_out_date) '
+                'VALUES (?, ?, ?)',
+                (room, check_in.isoformat(), check_out.isoformat()),
+            ).lastrowid
+            connection.executemany(
+                'INSERT INTO room_night (room_id, booking_id, date) '
+                'VALUES (?, ?, ?)',
+                [(room, booking, night) for night in nights],
+            )
+            connection.execute('COMMIT')
+            counts['writes'] += 1
+        except sqlite3.IntegrityError:
+            connection.execute('ROLLBACK')
+            counts['conflicts'] += 1
+        except sqlite3.OperationalError:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            counts['locked'] += 1
+
+    def read(self, connection, generator, counts, profile):
+        check_in, check_out = self.stay(generator)
+        try:
+            connection.execute(
+                'SELECT COUNT(*) FROM booking '
+                'WHERE check_in_date < ? AND check_out_date > ?',
+                (check_out.isoformat(), check_in.isoformat()),
+            ).fetchone()
+            counts['reads'] += 1
+        except sqlite3.OperationalError:
+            counts['locked'] += 1
@@ -0,0 +1,367 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Значения пишутся в шард текущего потока без блокировок: блокировка
+берётся только при первом обращении потока к метрике и при его
+завершении. Шард завершившегося потока вливается в общий итог метрики
+и удаляется, поэтому сервер с потоком на запрос не копит шарды.
+При выгрузке /metrics итог и шарды живых потоков суммируются. Каждый
+процесс WSGI/ASGI сервера хранит свои метрики, их суммирует сам
+Prometheus.
+
+/metrics отдаётся только адресам из METRICS_ALLOWED_IPS или по токену
+METRICS_TOKEN. Коллекторы, считающие значения по БД, выполняются не
+чаще раза в METRICS_COLLECTOR_CACHE_SECONDS.
+"""
+import bisect
+import hmac
+import ipaddress
+import threading
+import time
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from hotel.constants import (
+    METRICS_COLLECTOR_CACHE_SECONDS,
+    METRICS_LATENCY_BUCKETS,
+    METRICS_SIZE_BUCKETS,
+)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class ShardOwner:
+    """Метка шарда в threading.local, живёт столько же, сколько поток."""
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        # Итог шардов завершившихся потоков
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # Данные threading.local удаляются при завершении потока,
+            # вместе с ними срабатывает финализатор метки
+            owner = self._local.owner = ShardOwner()
+            weakref.finalize(owner, self._retire, shard)
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._shards = [item for item in self._shards if item is not shard]
+            for key, value in shard.items():
+                self._retired[key] = self._merge(
+                    self._retired.get(key), value)
+
+    def _merge(self, total, value):
+        """Новое значение total + value, total может быть None."""
+        raise NotImplementedError
+
+    def _label_values(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _collect_shards(self):
+        with self._lock:
+            # copy() словаря атомарна под GIL, поток-владелец может писать
+            # дальше. Итог копируется под той же блокировкой, что и шарды:
+            # шард, влитый в итог, не посчитается дважды
+            return [self._retired.copy()] + [
+                shard.copy() for shard in self._shards]
+
+    def values(self):
+        totals = {}
+        for shard in self._collect_shards():
+            for key, value in shard.items():
+                totals[key] = self._merge(totals.get(key), value)
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._retired.clear()
+            for shard in self._shards:
+                shard.clear()
+
+    def expose(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        lines += self.samples()
+        return lines
+
+
+class CounterMetric(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, total, value):
+        return (total or 0) + value
+
+    def value(self, **labels):
+        return self.values().get(self._label_values(labels), 0)
+
+    def samples(self):
+        return [
+            f'{self.name}{format_labels(self.labelnames, key)} {value}'
+            for key, value in sorted(self.values().items())
+        ]
+
+
+class HistogramMetric(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=METRICS_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        state = shard.get(key)
+        if state is None:
+            # [счётчики корзин..., переполнение, сумма]
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _merge(self, total, value):
+        # Список корзин копируется: поток-владелец меняет его на месте
+        if total is None:
+            return list(value)
+        return [left + right for left, right in zip(total, list(value))]
+
+    def count(self, **labels):
+        state = self.values().get(self._label_values(labels))
+        return sum(state[:-1]) if state else 0
+
+    def samples(self):
+        lines = []
+        for key, state in sorted(self.values().items()):
+            cumulative = 0
+            bounds = [str(bucket) for bucket in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, state[:-1]):
+                cumulative += count
+                labels = format_labels(
+                    self.labelnames + ('le',), key + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {state[-1]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = {}
+        self._collected = {}
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(CounterMetric, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), **kwargs):
+        return self._register(
+            HistogramMetric, name, documentation, labelnames, **kwargs)
+
+    def add_collector(self, collector, cached=False):
+        """Функция, возвращающая строки метрик в момент выгрузки.
+
+        Строки коллектора с cached=True (запросы к БД) переиспользуются
+        METRICS_COLLECTOR_CACHE_SECONDS секунд.
+        """
+        with self._lock:
+            self._collectors.setdefault(collector, cached)
+
+    def clear_collected(self):
+        """Забывает сохранённые строки коллекторов."""
+        self._collected.clear()
+
+    def collect(self, collector, cached):
+        now = time.monotonic()
+        if cached:
+            expires, lines = self._collected.get(collector, (0, None))
+            if expires > now:
+                return lines
+        lines = collector()
+        if cached:
+            self._collected[collector] = (
+                now + METRICS_COLLECTOR_CACHE_SECONDS, lines)
+        return lines
+
+    def expose(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        lines = []
+        for metric in metrics:
+            lines += metric.expose()
+        for collector, cached in collectors:
+            lines += self.collect(collector, cached)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'Обработанные HTTP-запросы.',
+    ('route', 'method', 'status'),
+)
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Полное время обработки запроса.',
+    ('route', 'method'),
+)
+SQL_LATENCY = registry.histogram(
+    'http_request_sql_seconds', 'Суммарное время SQL за запрос.',
+    ('route',),
+)
+TEMPLATE_LATENCY = registry.histogram(
+    'http_request_template_seconds', 'Время рендеринга TemplateResponse.',
+    ('route',),
+)
+REQUEST_SIZE = registry.histogram(
+    'http_request_size_bytes', 'Размер тела запроса.',
+    ('route',), buckets=METRICS_SIZE_BUCKETS,
+)
+RESPONSE_SIZE = registry.histogram(
+    'http_response_size_bytes', 'Размер тела ответа.',
+    ('route',), buckets=METRICS_SIZE_BUCKETS,
+)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Собирает время запроса, SQL и шаблонов, размеры запроса и ответа.
+
+    Время SQL берётся у QueryBudgetMiddleware, поэтому этот middleware
+    должен стоять раньше него.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, duration):
+        route = route_name(request)
+        REQUESTS.inc(
+            route=route, method=request.method, status=response.status_code)
+        REQUEST_LATENCY.observe(duration, route=route, method=request.method)
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None:
+            SQL_LATENCY.observe(recorder.duration, route=route)
+        template_time = getattr(request, 'template_render_time', None)
+        if template_time is not None:
+            TEMPLATE_LATENCY.observe(template_time, route=route)
+        try:
+            request_size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            request_size = 0
+        REQUEST_SIZE.observe(request_size, route=route)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), route=route)
+
+    def process_template_response(self, request, response):
+        # Шаблон рендерится сразу после этого хука, конец фиксирует
+        # post-render callback. Ответы PageCacheMixin уже отрендерены,
+        # их время он записывает сам
+        if response.is_rendered:
+            return response
+        started = time.perf_counter()
+
+        def finished(rendered):
+            request.template_render_time = time.perf_counter() - started
+
+        response.add_post_render_callback(finished)
+        return response
+
+
+def metrics_allowed(request):
+    """Пускает по токену METRICS_TOKEN или адресу из METRICS_ALLOWED_IPS."""
+    # hotel.admission сам импортирует registry из этого модуля
+    from hotel.admission import client_ip
+
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(),
+            f'Bearer {token}'.encode()):
+        return True
+    try:
+        address = ipaddress.ip_address(client_ip(request))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    )
+
+
+@require_GET
+def metrics_view(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.expose(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
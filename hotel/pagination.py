@@ -0,0 +1,259 @@
+"""Курсорная (keyset) пагинация для ListView.
+
+Вместо OFFSET страница выбирается условием по полям сортировки
+последней показанной записи, поэтому страница N стоит столько же,
+сколько первая, и не требует COUNT(*).
+"""
+import base64
+import functools
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from hotel.constants import CURSOR_COUNT_CACHE_TIMEOUT
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps(
+        {'v': values, 'd': direction}, cls=DjangoJSONEncoder,
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['v'], payload['d']
+    except (ValueError, TypeError, KeyError) as error:
+        raise InvalidCursor(token) from error
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values, direction
+
+
+class CursorPage:
+    cursor_based = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None, approximate_total=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_total = approximate_total
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинатор по уникальному набору полей сортировки.
+
+    К сортировке всегда добавляется pk, чтобы ключ был уникальным.
+    Поля сортировки не должны содержать NULL.
+    """
+
+    def __init__(self, queryset, per_page, ordering,
+                 approximate_total=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        if not {'pk', '-pk'} & set(self.ordering):
+            self.ordering += ('pk',)
+        self.approximate_total = approximate_total
+
+    def get_page(self, token=None):
+        queryset, values, direction = self.page_queryset(token)
+        return self.build_page(list(queryset), values, direction)
+
+    async def aget_page(self, token=None):
+        """get_page для async-представлений: строки и COUNT через async ORM."""
+        queryset, values, direction = self.page_queryset(token)
+        rows = [row async for row in queryset]
+        return self.build_page(
+            rows, values, direction,
+            approximate_total=await self.aget_approximate_total(),
+        )
+
+    def page_queryset(self, token=None, queryset=None):
+        """Срез queryset для страницы: per_page + 1 строка."""
+        try:
+            values, direction = decode_cursor(token) if token else (None, 'next')
+        except InvalidCursor:
+            values, direction = None, 'next'
+        if values is not None and len(values) != len(self.ordering):
+            values, direction = None, 'next'
+        if queryset is None:
+            queryset = self.queryset
+        ordering = self.ordering
+        if direction == 'prev':
+            ordering = tuple(self._reverse(field) for field in ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(ordering, values))
+        return (
+            queryset.order_by(*ordering)[:self.per_page + 1],
+            values,
+            direction,
+        )
+
+    def build_page(self, rows, values, direction, approximate_total=None):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or direction == 'prev':
+                next_cursor = encode_cursor(self._values(rows[-1]), 'next')
+            if values is not None and (has_more or direction == 'next'):
+                previous_cursor = encode_cursor(self._values(rows[0]), 'prev')
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+            approximate_total=(
+                approximate_total if approximate_total is not None
+                else self.get_approximate_total()
+            ),
+        )
+
+    def get_count_cache_key(self):
+        query = str(self.queryset.order_by().query)
+        return 'cursor-count:' + hashlib.md5(query.encode()).hexdigest()
+
+    def get_approximate_total(self):
+        """Общее число записей из кеша: COUNT(*) раз в N секунд."""
+        if not self.approximate_total:
+            return None
+        return cache.get_or_set(
+            self.get_count_cache_key(),
+            self.queryset.order_by().count,
+            CURSOR_COUNT_CACHE_TIMEOUT,
+        )
+
+    async def aget_approximate_total(self):
+        if not self.approximate_total:
+            return None
+        key = self.get_count_cache_key()
+        total = cache.get(key)
+        if total is None:
+            total = await self.queryset.order_by().acount()
+            cache.set(key, total, CURSOR_COUNT_CACHE_TIMEOUT)
+        return total
+
+    def _values(self, obj):
+        return [
+            getattr(obj, field.lstrip('-')) for field in self.ordering
+        ]
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _keyset_filter(ordering, values):
+        """(f1, f2, ...) > (v1, v2, ...) в лексикографическом порядке."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация по нескольким таблицам с общей сортировкой.
+
+    Из каждого queryset берётся per_page + 1 строка за курсором, строки
+    сливаются в памяти. Ключ сортировки (вместе с pk) должен быть
+    уникален среди всех источников.
+    """
+
+    def __init__(self, querysets, per_page, ordering):
+        self.querysets = list(querysets)
+        super().__init__(self.querysets[0], per_page, ordering)
+
+    def get_page(self, token=None):
+        rows = []
+        values, direction = None, 'next'
+        for queryset in self.querysets:
+            sliced, values, direction = self.page_queryset(token, queryset)
+            rows += sliced
+        rows.sort(key=functools.cmp_to_key(self._compare))
+        if direction == 'prev':
+            rows.reverse()
+        return self.build_page(rows[:self.per_page + 1], values, direction)
+
+    def _compare(self, first, second):
+        for field, a, b in zip(
+                self.ordering, self._values(first), self._values(second)):
+            if a != b:
+                result = -1 if a < b else 1
+                return -result if field.startswith('-') else result
+        return 0
+
+
+class CursorPaginationMixin:
+    """Подменяет постраничную пагинацию ListView на курсорную."""
+
+    cursor_kwarg = 'cursor'
+    cursor_ordering = None
+    cursor_approximate_total = False
+
+    def get_cursor_ordering(self, queryset):
+        if self.cursor_ordering:
+            return self.cursor_ordering
+        return (
+            self.get_ordering()
+            or queryset.query.order_by
+            or queryset.model._meta.ordering
+        )
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(
+            queryset,
+            page_size,
+            self.get_cursor_ordering(queryset),
+            approximate_total=self.cursor_approximate_total,
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_query_params(self):
+        """GET-параметры для ссылок на соседние страницы, без курсора."""
+        query_params = self.request.GET.copy()
+        query_params.pop(self.cursor_kwarg, None)
+        query_params.pop(self.page_kwarg, None)
+        return query_params.urlencode()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query_params'] = self.get_query_params()
+        return context
@@ -0,0 +1,149 @@
+"""Учёт SQL-запросов на запрос и бюджеты по именам URL.
+
+QueryBudgetMiddleware считает запросы и время SQL каждого представления,
+копит статистику по именам URL и сравнивает её с QUERY_BUDGETS.
+При QUERY_BUDGET_ENFORCE превышение бюджета - исключение, что
+используется в тестах.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """execute_wrapper, записывающий SQL и длительность запросов."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def record(self):
+        """Контекст, подключающий запись ко всем соединениям."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+def format_budget_report(view_name, queries, budget):
+    lines = [
+        f"Представление '{view_name}' выполнило {len(queries)} SQL-запросов "
+        f'при бюджете {budget} (+{len(queries) - budget}):'
+    ]
+    # Запросы сверх бюджета помечены «+», как добавленные строки в diff
+    for number, (sql, duration) in enumerate(queries, 1):
+        marker = '+' if number > budget else ' '
+        lines.append(f'{marker} {number:3}. [{duration * 1000:.1f} мс] {sql}')
+    repeated = [
+        (count, sql)
+        for sql, count in Counter(sql for sql, _ in queries).most_common()
+        if count > 1
+    ]
+    if repeated:
+        lines.append('Повторяющиеся запросы (вероятно, N+1):')
+        lines += [f'  ×{count} {sql}' for count, sql in repeated]
+    return '\n'.join(lines)
+
+
+class QueryStats:
+    """Накопленные счётчики запросов и времени SQL по именам URL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, count, duration):
+        with self._lock:
+            stats = self._views.setdefault(
+                view_name,
+                {'requests': 0, 'queries': 0, 'sql_time': 0.0,
+                 'max_queries': 0},
+            )
+            stats['requests'] += 1
+            stats['queries'] += count
+            stats['sql_time'] += duration
+            stats['max_queries'] = max(stats['max_queries'], count)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._views.items()}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+query_stats = QueryStats()
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name
+
+
+class QueryBudgetMiddleware:
+    """Учёт запросов только в синхронном режиме.
+
+    В async-режиме ORM выполняет SQL в потоках sync_to_async, и
+    execute_wrapper соединения этого потока запросы не увидит.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        recorder = request.query_recorder = QueryRecorder()
+        # К этому моменту TemplateResponse уже отрендерен обработчиком,
+        # поэтому запросы из шаблонов тоже попадают в запись
+        with recorder.record():
+            response = self.get_response(request)
+        view_name = get_view_name(request)
+        if view_name is None:
+            return response
+        query_stats.record(view_name, len(recorder), recorder.duration)
+        if getattr(settings, 'QUERY_BUDGET_HEADERS', False):
+            response['X-Query-Count'] = str(len(recorder))
+            response['X-Query-Time'] = f'{recorder.duration * 1000:.1f}ms'
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+        if budget is not None and len(recorder) > budget:
+            report = format_budget_report(
+                view_name, recorder.queries, budget)
+            if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
+        return response
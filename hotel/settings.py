@@ -37,9 +37,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'hotel.apps.HotelConfig',
     'catalog.apps.CatalogConfig',
     'user.apps.UserConfig',
     'booking.apps.BookingConfig',
+    'tasks.apps.TasksConfig',
     'bootstrap4',
     'crispy_forms',
     'crispy_bootstrap4'
@@ -51,10 +53,15 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'hotel.assets.StaticFilesMiddleware',
+    'hotel.metrics.MetricsMiddleware',
+    'hotel.queries.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'hotel.db_router.ReplicaPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'hotel.admission.AdmissionControlMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,17 +86,67 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'hotel.wsgi.application'
 
+# Маршруты для запросов через hotel.asgi: каталог на async-представлениях
+ASGI_ROOT_URLCONF = 'hotel.urls_async'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'hotel.db_backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# WAL, busy_timeout и прочие PRAGMA из hotel.sqlite_profile для каждого
+# нового соединения SQLite
+SQLITE_PRODUCTION_PROFILE = False
+
+# Переопределения PRAGMA профиля, например {'mmap_size': 0}
+SQLITE_PRAGMAS = {}
+
+DATABASE_ROUTERS = ['hotel.db_router.ReplicaRouter']
+
+# Алиасы реплик из DATABASES, только для чтения. Пусто - всё в default
+DATABASE_REPLICAS = []
+
+# Приложения, чтения моделей которых всегда идут на реплики
+DATABASE_REPLICA_APPS = ['catalog']
+
+# Сколько секунд после записи сессия читает из primary
+DATABASE_PIN_SECONDS = 5
+
+# Через сколько секунд снова проверять недоступную реплику
+DATABASE_REPLICA_RETRY_SECONDS = 30
+
+# Caches
+
+# Кеш, общий для веб-процессов и воркера очереди задач: на нём держатся
+# cached_db-сессии, сброс кеша профилей, маски календаря и версии
+# страниц каталога. В продакшене - Redis или Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+    }
+}
+
+# Бэкенды, данные которых видны только своему процессу
+PROCESS_LOCAL_CACHE_BACKENDS = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+# Без общего кеша - сессии в БД и без кеша профилей (hotel.checks)
+SHARED_CACHE = (
+    CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS
+)
+
+# Тесты пишут в кеш во временном каталоге, а не в var/cache
+TEST_RUNNER = 'hotel.test_runner.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -133,6 +190,35 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# Сборка статики при collectstatic: бандлы, хеши в именах файлов,
+# сжатые копии .gz/.br; в разработке файлы отдаются как есть
+STATIC_PIPELINE = not DEBUG
+
+STATIC_BUNDLES = {
+    'css/bundle.css': [
+        'css/styles.css',
+        'css/header.css',
+        'css/room_list.css',
+        'css/user.css',
+        'css/room_detail.css',
+    ],
+}
+
+# Раздача STATIC_ROOT приложением (hotel.assets.StaticFilesMiddleware)
+STATIC_SERVE = STATIC_PIPELINE
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'hotel.assets.PipelineStaticFilesStorage' if STATIC_PIPELINE
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -142,10 +228,104 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Catalog caching
+
+# Имена URL, для которых кеш страниц каталога отключён
+CATALOG_PAGE_CACHE_DISABLED = []
+
+# Email
+
+# Письма о бронях отправляет воркер очереди задач; в разработке - в консоль
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+DEFAULT_FROM_EMAIL = 'booking@hotel.local'
+
+# Booking archive
+
+BOOKING_ARCHIVE_RETENTION_DAYS = 365
+
+# Admission control
+
+# Лимиты по именам URL: частота на клиента и одновременные запросы
+ADMISSION_LIMITS = {
+    'login': {'rate': '10/m', 'burst': 5, 'key': 'ip', 'concurrency': 4},
+    'signup': {'rate': '5/m', 'burst': 3, 'key': 'ip', 'concurrency': 2},
+    'create_booking': {
+        'rate': '30/m', 'burst': 10, 'key': 'user', 'concurrency': 8,
+    },
+    'hold_room': {
+        'rate': '60/m', 'burst': 20, 'key': 'user', 'concurrency': 8,
+    },
+}
+
+# hotel.admission.CacheAdmissionState - общие лимиты для всех процессов
+ADMISSION_STATE_BACKEND = 'hotel.admission.LocalAdmissionState'
+
+# Заголовок с IP клиента за доверенным прокси, например
+# 'HTTP_X_FORWARDED_FOR' или 'HTTP_X_REAL_IP'
+ADMISSION_CLIENT_IP_HEADER = None
+
+# Число доверенных прокси перед приложением: IP клиента - запись
+# заголовка, дописанная самым внешним из них (N-я справа)
+ADMISSION_TRUSTED_PROXIES = 1
+
+# Metrics
+
+# Адреса и сети, которым доступен /metrics. IP клиента определяется как
+# для лимитов: с учётом ADMISSION_CLIENT_IP_HEADER
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Токен для заголовка Authorization: Bearer <токен>, пускает с любого
+# адреса. None - только по METRICS_ALLOWED_IPS
+METRICS_TOKEN = None
+
+# SQL query budgets
+
+# Максимум SQL-запросов на запрос по имени URL, включая сессию и пользователя
+QUERY_BUDGETS = {
+    'rooms': 6,
+    'room': 4,
+    'hotel': 3,
+    'search': 4,
+    # С проверкой ключа идемпотентности, снятием удержания, точками
+    # сохранения и двумя задачами очереди: пересчёт календаря и письмо
+    # выполняет воркер
+    'create_booking': 17,
+    'hold_room': 13,
+    'profile': 5,
+}
+
+# Превышение бюджета - исключение (в тестах), иначе предупреждение в лог
+QUERY_BUDGET_ENFORCE = False
+
+# Заголовки X-Query-Count и X-Query-Time в ответах
+QUERY_BUDGET_HEADERS = DEBUG
+
 # User model
 
 AUTH_USER_MODEL = 'user.Profile'
 
+AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+
+if SHARED_CACHE:
+    # ModelBackend оставлен для сессий, созданных до кеша профилей
+    AUTHENTICATION_BACKENDS.insert(0, 'user.backends.CachedProfileBackend')
+
+# Sessions
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    # Чтение из кеша, запись в кеш и БД; при промахе кеша - чтение из БД
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    # Без хранилища: сессия в подписанной куке, её нельзя отозвать
+    # на сервере, размер ограничен размером куки
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SESSION_STRATEGY = 'cached_db' if SHARED_CACHE else 'db'
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
+
 LOGIN_REDIRECT_URL = '/catalog/'
 
 LOGOUT_REDIRECT_URL = '/catalog/'
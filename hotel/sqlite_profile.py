@@ -0,0 +1,63 @@
+"""Профиль SQLite для рабочих установок на одном узле.
+
+Включается настройкой SQLITE_PRODUCTION_PROFILE: каждое новое соединение
+получает PRODUCTION_PRAGMAS, дополненные SQLITE_PRAGMAS. WAL позволяет
+читать параллельно с записью, busy_timeout заставляет писателей ждать
+блокировку вместо немедленной ошибки.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5_000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def get_pragmas():
+    if not getattr(settings, 'SQLITE_PRODUCTION_PROFILE', False):
+        return {}
+    return {**PRODUCTION_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def apply_sqlite_profile(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """transaction.atomic, начинающий внешнюю транзакцию с BEGIN IMMEDIATE.
+
+    На других СУБД и вложенных блоках равен обычному atomic.
+    """
+    connection = transaction.get_connection(using)
+    outermost = not connection.in_atomic_block
+    if outermost:
+        connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            if outermost:
+                connection.begin_immediate = False
+            yield
+    finally:
+        if outermost:
+            connection.begin_immediate = False
@@ -0,0 +1,32 @@
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+FILE_BASED_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner с кешем во временном каталоге.
+
+    Общий кеш разработки в var/cache хранит данные другой базы: тесты
+    не должны их читать и не должны стирать их через cache.clear().
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        caches = {}
+        for alias, config in settings.CACHES.items():
+            if config['BACKEND'] == FILE_BASED_CACHE:
+                location = f'{self.cache_dir.name}/{alias}'
+                config = {**config, 'LOCATION': location}
+            caches[alias] = config
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        self.cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,701 @@
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.models import Booking
+from catalog.cache import cache_stats
+from catalog.models import Hotel, HotelRoom
+from hotel.admission import (
+    ADMISSION_REJECTED,
+    AdmissionControlMiddleware,
+    CacheAdmissionState,
+    LocalAdmissionState,
+    client_ip,
+)
+from hotel.assets import minify_css
+from hotel.caches import cache_is_shared
+from hotel.checks import PROFILE_CACHE_BACKEND, check_shared_cache
+from hotel.db_router import PIN_SESSION_KEY, replica_health
+from hotel.management.commands.adopt_legacy_schema import LEGACY_APPS
+from hotel.metrics import CounterMetric, HistogramMetric, registry
+from hotel.queries import QueryBudgetExceeded, QueryRecorder, query_stats
+
+
+User = get_user_model()
+
+
+def create_room(title='room', price=1000, guests=2, hotel=None):
+    room = HotelRoom.objects.create(
+        title=title,
+        max_number_of_guests=guests,
+        description=f'Описание {title}',
+        price=price,
+        main_img=f'{title}/room.jpg',
+    )
+    if hotel is not None:
+        room.hotel.add(hotel)
+    return room
+
+
+def create_guest(email='guest@example.com'):
+    return User.objects.create(
+        email=email, first_name='Гость', last_name='Тестовый')
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTest(TestCase):
+    """Тесты бюджетов SQL-запросов каталога"""
+
+    @classmethod
+    def setUpTestData(cls):
+        hotel = Hotel.objects.create(
+            title='Астория', country='RU', city='Санкт-Петербург')
+        cls.rooms = [
+            create_room(f'room-{number}', hotel=hotel) for number in range(12)]
+
+    def setUp(self):
+        cache.clear()
+        query_stats.reset()
+
+    def test_catalog_pages_fit_budgets(self):
+        """Тест что страницы каталога укладываются в бюджеты"""
+        today = timezone.now().date()
+        self.client.force_login(User.objects.create(
+            email='budget@example.com', first_name='Бюджет', last_name='Тест'))
+        self.client.get(reverse('rooms'))
+        self.client.get(reverse('rooms'), {
+            'check_in': today + timedelta(days=1),
+            'check_out': today + timedelta(days=3),
+            'guests': 1,
+            'country': 'RU',
+        })
+        self.client.get(
+            reverse('room', kwargs={'slug': self.rooms[0].slug}))
+        self.client.get(reverse('hotel'))
+        self.client.get(reverse('search'), {'q': 'room'})
+        self.assertEqual(query_stats.snapshot()['rooms']['requests'], 2)
+
+    @override_settings(QUERY_BUDGETS={'rooms': 0})
+    def test_exceeded_budget_reports_queries(self):
+        """Тест отчёта о запросах сверх бюджета"""
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            self.client.get(reverse('rooms'))
+        report = str(raised.exception)
+        self.assertIn("'rooms'", report)
+        self.assertIn('+   1.', report)
+        self.assertIn('catalog_hotelroom', report)
+
+    @override_settings(QUERY_BUDGET_HEADERS=True)
+    def test_debug_headers(self):
+        """Тест заголовков с числом и временем запросов"""
+        response = self.client.get(reverse('hotel'))
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertTrue(response['X-Query-Time'].endswith('ms'))
+
+
+class MetricsTest(TestCase):
+    """Тесты метрик в формате Prometheus"""
+
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+
+    def test_metrics_aggregate_across_threads(self):
+        """Тест что значения из разных потоков суммируются"""
+        counter = CounterMetric('test_total', 'Тест.', ('kind',))
+        histogram = HistogramMetric('test_seconds', 'Тест.', buckets=(1, 2))
+
+        def work():
+            for _ in range(100):
+                counter.inc(kind='a')
+                histogram.observe(1.5)
+
+        workers = [threading.Thread(target=work) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(counter.value(kind='a'), 400)
+        self.assertEqual(histogram.count(), 400)
+        samples = histogram.samples()
+        self.assertIn('test_seconds_bucket{le="1"} 0', samples)
+        self.assertIn('test_seconds_bucket{le="2"} 400', samples)
+        self.assertIn('test_seconds_count 400', samples)
+
+    def test_finished_thread_shards_are_merged(self):
+        """Тест что шарды завершившихся потоков не накапливаются"""
+        counter = CounterMetric('test_total', 'Тест.')
+        histogram = HistogramMetric('test_seconds', 'Тест.', buckets=(1,))
+        counter.inc()
+
+        def work():
+            counter.inc()
+            histogram.observe(0.5)
+
+        for _ in range(50):
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+        self.assertEqual(len(counter._shards), 1)
+        self.assertEqual(histogram._shards, [])
+        self.assertEqual(counter.value(), 51)
+        self.assertEqual(histogram.count(), 50)
+        counter.reset()
+        self.assertEqual(counter.value(), 0)
+
+    def test_endpoint_exposes_view_metrics(self):
+        """Тест что /metrics отдаёт время представлений и кеш страниц"""
+        create_room('metrics')
+        self.client.get(reverse('rooms'))
+        self.client.get(reverse('rooms'))
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_bucket'
+            '{route="rooms",method="GET",le="+Inf"}', body)
+        self.assertIn('http_request_sql_seconds_count{route="rooms"}', body)
+        self.assertIn(
+            'http_request_template_seconds_count{route="rooms"}', body)
+        self.assertIn('http_response_size_bytes_sum{route="rooms"}', body)
+        self.assertIn(
+            'catalog_page_cache_requests_total'
+            '{view="rooms",result="hits"} 1', body)
+        self.assertIn('catalog_page_cache_hit_ratio{view="rooms"} 0.5', body)
+
+    def test_endpoint_is_restricted(self):
+        """Тест что /metrics доступен только своим адресам и по токену"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.post(url).status_code, 405)
+        outside = {'REMOTE_ADDR': '203.0.113.5'}
+        self.assertEqual(self.client.get(url, **outside).status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=['203.0.113.0/24']):
+            self.assertEqual(
+                self.client.get(url, **outside).status_code, 200)
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer wrong', **outside,
+            ).status_code, 403)
+            self.assertEqual(self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer secret', **outside,
+            ).status_code, 200)
+
+    def test_database_collectors_are_cached(self):
+        """Тест что частые выгрузки не повторяют запросы к БД"""
+        registry.clear_collected()
+        with CaptureQueriesContext(connection) as queries:
+            registry.expose()
+        self.assertGreater(len(queries), 0)
+        with self.assertNumQueries(0):
+            registry.expose()
+
+
+class StaticPipelineTest(TestCase):
+    """Тесты сборки статики и её раздачи приложением"""
+
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(
+            STATIC_ROOT=root,
+            STATIC_PIPELINE=True,
+            STATIC_SERVE=True,
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {
+                    'BACKEND': 'hotel.assets.PipelineStaticFilesStorage'},
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command(
+            'collectstatic', interactive=False, verbosity=0,
+            ignore_patterns=['admin/*'],
+        )
+        self.bundle_url = staticfiles_storage.url('css/bundle.css')
+
+    def get_static(self, url, **headers):
+        response = self.client.get(url, **headers)
+        content = b''.join(response.streaming_content)
+        response.close()
+        return response, content
+
+    def test_bundle_is_hashed_minified_and_compressed(self):
+        """Тест бандла с хешем в имени и сжатой копией"""
+        name = staticfiles_storage.stored_name('css/bundle.css')
+        self.assertRegex(name, r'^css/bundle\.[0-9a-f]{12}\.css$')
+        with staticfiles_storage.open(name) as file:
+            bundle = file.read()
+        for source in settings.STATIC_BUNDLES['css/bundle.css']:
+            with open(finders.find(source), encoding='utf-8') as file:
+                selector = file.read().split('{')[0].strip()
+            self.assertIn(selector.encode(), bundle)
+        self.assertNotIn(b'\n', bundle)
+        with staticfiles_storage.open(name + '.gz') as file:
+            self.assertEqual(gzip.decompress(file.read()), bundle)
+
+    def test_page_links_single_bundle(self):
+        """Тест что страница подключает один бандл вместо пяти файлов"""
+        response = self.client.get(reverse('rooms'))
+        self.assertContains(response, self.bundle_url, count=1)
+        self.assertNotContains(response, 'css/header.css')
+
+    def test_serving_negotiates_encoding_and_caches(self):
+        """Тест раздачи сжатой копии и заголовков кеширования"""
+        response, content = self.get_static(
+            self.bundle_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/css')
+        plain, plain_content = self.get_static(
+            self.bundle_url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(content), plain_content)
+        # Файл без хеша кешируется ненадолго
+        unhashed, _ = self.get_static('/static/css/styles.css')
+        self.assertNotIn('immutable', unhashed['Cache-Control'])
+        not_modified = self.client.get(
+            self.bundle_url,
+            HTTP_IF_MODIFIED_SINCE=plain['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(
+            self.client.get('/static/../manage.py').status_code, 404)
+        # Прямой запрос сжатой копии не отдаёт gzip под видом CSS
+        self.assertEqual(
+            self.client.get(self.bundle_url + '.gz').status_code, 404)
+
+    def test_minify_css_keeps_strings_and_selectors(self):
+        """Тест что минификация не меняет строки и пробел перед :hover"""
+        css = '/* c */ a :hover { content: "a  ;  b" ; }\n\nb > i , u { x: 1 }'
+        self.assertEqual(
+            minify_css(css), 'a :hover{content:"a  ;  b"}b>i,u{x:1}')
+
+
+def add_database(test, alias, name):
+    """Подключает на время теста файл SQLite под алиасом alias."""
+    connections.settings[alias] = connections.configure_settings({
+        'default': connections.settings['default'],
+        alias: {'ENGINE': 'hotel.db_backends.sqlite3', 'NAME': name},
+    })[alias]
+
+    def remove():
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+    test.addCleanup(remove)
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    """Тесты чтения с реплики на двух файлах SQLite"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        add_database(self, 'replica', os.path.join(directory.name, 'r.db'))
+        # Путь в несуществующем каталоге: соединение не откроется
+        add_database(
+            self, 'broken',
+            os.path.join(directory.name, 'missing', 'b.db'))
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(Hotel)
+            editor.create_model(HotelRoom)
+        cache.clear()
+        replica_health.reset()
+        self.addCleanup(replica_health.reset)
+        self.today = timezone.now().date()
+        self.room = create_room('primary-room')
+        # Строка есть только на реплике: по ней видно, куда ушло чтение
+        HotelRoom.objects.using('replica').bulk_create([HotelRoom(
+            title='replica-room', slug='replica-room',
+            max_number_of_guests=2, description='', price=1000,
+            main_img='replica-room/room.jpg',
+        )])
+        self.guest = create_guest()
+
+    def get_room(self, slug):
+        return self.client.get(reverse('room', kwargs={'slug': slug}))
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_catalog_reads_go_to_replica(self):
+        """Тест что каталог читается с реплики"""
+        self.assertEqual(self.get_room('replica-room').status_code, 200)
+        self.assertEqual(self.get_room('primary-room').status_code, 404)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_session_is_pinned_after_booking(self):
+        """Тест что после брони сессия читает свои записи из primary"""
+        self.client.force_login(self.guest)
+        response = self.client.post(
+            reverse('create_booking', kwargs={'slug': self.room.slug}),
+            {
+                'check_in_date': self.today + timedelta(days=1),
+                'check_out_date': self.today + timedelta(days=2),
+                'guest_count': 1,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_SESSION_KEY, self.client.session)
+        self.assertEqual(self.get_room('primary-room').status_code, 200)
+        self.assertEqual(self.get_room('replica-room').status_code, 404)
+        session = self.client.session
+        session[PIN_SESSION_KEY] = 0
+        session.save()
+        self.assertEqual(self.get_room('replica-room').status_code, 200)
+
+    @override_settings(DATABASE_REPLICAS=['broken', 'replica'])
+    def test_unhealthy_replica_is_skipped(self):
+        """Тест что недоступная реплика пропускается"""
+        with self.assertLogs('hotel.db_router', 'WARNING'):
+            for _ in range(3):
+                self.assertEqual(
+                    self.get_room('replica-room').status_code, 200)
+        self.assertFalse(replica_health.is_healthy('broken'))
+
+    @override_settings(DATABASE_REPLICAS=['broken'])
+    def test_falls_back_to_primary(self):
+        """Тест что без живых реплик чтение идёт в primary"""
+        with self.assertLogs('hotel.db_router', 'WARNING'):
+            self.assertEqual(self.get_room('primary-room').status_code, 200)
+
+
+class SQLiteProfileTest(TransactionTestCase):
+    """Тесты рабочего профиля SQLite"""
+
+    @override_settings(
+        SQLITE_PRODUCTION_PROFILE=True, SQLITE_PRAGMAS={'mmap_size': 0})
+    def test_profile_is_applied_to_new_connections(self):
+        """Тест PRAGMA на новом соединении"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        add_database(self, 'profiled', os.path.join(directory.name, 'p.db'))
+        with connections['profiled'].cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'busy_timeout', 'synchronous',
+                             'mmap_size', 'temp_store')
+            }
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal',
+            'busy_timeout': 5000,
+            'synchronous': 1,
+            'mmap_size': 0,
+            'temp_store': 2,
+        })
+
+    def test_booking_starts_immediate_transaction(self):
+        """Тест что бронь пишется в транзакции BEGIN IMMEDIATE"""
+        room = create_room()
+        guest = create_guest()
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            Booking.objects.create(
+                guest=guest,
+                room=room,
+                check_in_date=timezone.now().date() + timedelta(days=1),
+                check_out_date=timezone.now().date() + timedelta(days=2),
+                guest_count=1,
+            )
+        # Цена по тарифам читается до транзакции, запись брони - первой
+        # в ней
+        queries = [sql for sql, _ in recorder.queries]
+        begin = queries.index('BEGIN IMMEDIATE')
+        self.assertTrue(
+            queries[begin + 1].startswith('INSERT INTO "booking_booking"'))
+        # Обычные транзакции по-прежнему отложенные
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            room.save()
+        self.assertNotIn(
+            'BEGIN IMMEDIATE', [sql for sql, _ in recorder.queries])
+
+    def test_benchmark_command(self):
+        """Тест прогона замера пропускной способности"""
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', threads=[2], duration=0.2,
+            profile=['production'], stdout=out,
+        )
+        self.assertIn('production', out.getvalue())
+
+
+class AdmissionControlTest(TestCase):
+    """Тесты ограничения частоты и параллельности запросов"""
+
+    limits = {
+        'login': {'rate': '2/m', 'key': 'ip', 'concurrency': 1},
+        'create_booking': {'rate': '60/m', 'burst': 1, 'key': 'user'},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = create_room()
+        cls.guest = create_guest()
+        cls.other = create_guest('other@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.override = override_settings(ADMISSION_LIMITS=self.limits)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def login(self, client=None):
+        return (client or self.client).post(reverse('login'), {
+            'username': 'guest@example.com', 'password': 'wrong'})
+
+    def test_login_flood_gets_429(self):
+        """Тест отказа с Retry-After сверх лимита входов с одного IP"""
+        rejected = ADMISSION_REJECTED.value(route='login', reason='rate')
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(
+            ADMISSION_REJECTED.value(route='login', reason='rate'),
+            rejected + 1)
+        # GET страницы входа не ограничен
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+
+    def test_booking_limit_is_per_user(self):
+        """Тест что лимит бронирований считается отдельно по пользователям"""
+        url = reverse('create_booking', kwargs={'slug': self.room.slug})
+        check_in = timezone.now().date() + timedelta(days=1)
+        data = {
+            'check_in_date': check_in,
+            'check_out_date': check_in + timedelta(days=2),
+            'guest_count': 1,
+        }
+        self.client.force_login(self.guest)
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(self.client.post(url, data).status_code, 429)
+        self.client.force_login(self.other)
+        # Даты заняты первым гостем, но запрос допущен до формы
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+
+    def test_concurrency_limit_gets_503(self):
+        """Тест отказа при превышении одновременных запросов к маршруту"""
+        factory = RequestFactory()
+        responses = []
+
+        def view(request):
+            # Второй вход, пока первый запрос ещё обрабатывается
+            nested = factory.post(reverse('login'))
+            nested.user = AnonymousUser()
+            responses.append(middleware(nested))
+            return HttpResponse()
+
+        middleware = AdmissionControlMiddleware(view)
+        request = factory.post(reverse('login'))
+        request.user = AnonymousUser()
+        self.assertEqual(middleware(request).status_code, 200)
+        self.assertEqual(responses[0].status_code, 503)
+        self.assertIn('Retry-After', responses[0])
+        # Слот освобождается после ответа
+        self.assertTrue(middleware.state.acquire('login', 1))
+
+    def test_token_bucket_refills(self):
+        """Тест пополнения корзины токенов со временем"""
+        state = LocalAdmissionState()
+        with mock.patch('hotel.admission.time.monotonic', return_value=0):
+            self.assertEqual(state.take('key', 1, 10, 1), 0)
+            self.assertEqual(state.take('key', 1, 10, 1), 10)
+        with mock.patch('hotel.admission.time.monotonic', return_value=10):
+            self.assertEqual(state.take('key', 1, 10, 1), 0)
+
+    def test_idle_buckets_are_pruned(self):
+        """Тест что простоявшие корзины удаляются без отказов"""
+        with mock.patch('hotel.admission.time.monotonic', return_value=0):
+            state = LocalAdmissionState()
+            for number in range(100):
+                state.take(f'ip:{number}', 10, 60, 10)
+        self.assertEqual(len(state._buckets), 100)
+        with mock.patch('hotel.admission.time.monotonic', return_value=60):
+            self.assertEqual(state.take('ip:new', 10, 60, 10), 0)
+        self.assertEqual(list(state._buckets), ['ip:new'])
+
+    @override_settings(ADMISSION_CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_forwarded_for_uses_trusted_proxy_entry(self):
+        """Тест что поддельный X-Forwarded-For не обходит лимит по IP"""
+        for number in range(2):
+            self.client.post(
+                reverse('login'),
+                {'username': 'guest@example.com', 'password': 'wrong'},
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{number}, 203.0.113.7',
+            )
+        response = self.client.post(
+            reverse('login'),
+            {'username': 'guest@example.com', 'password': 'wrong'},
+            HTTP_X_FORWARDED_FOR='10.0.0.99, 203.0.113.7',
+        )
+        self.assertEqual(response.status_code, 429)
+        request = RequestFactory().get(
+            '/', HTTP_X_FORWARDED_FOR='10.0.0.1, 198.51.100.2, 203.0.113.7')
+        with self.settings(ADMISSION_TRUSTED_PROXIES=2):
+            self.assertEqual(client_ip(request), '198.51.100.2')
+        with self.settings(ADMISSION_TRUSTED_PROXIES=4):
+            self.assertEqual(client_ip(request), '127.0.0.1')
+
+    def test_shared_cache_state(self):
+        """Тест лимитов в общем кеше"""
+        state = CacheAdmissionState()
+        self.assertEqual(state.take('key', 2, 60, 2), 0)
+        self.assertEqual(state.take('key', 2, 60, 2), 0)
+        self.assertGreater(state.take('key', 2, 60, 2), 0)
+        self.assertTrue(state.acquire('route', 1))
+        self.assertFalse(state.acquire('route', 1))
+        state.release('route')
+        self.assertTrue(state.acquire('route', 1))
+
+
+class MigrationsTest(TestCase):
+    """Тесты что схема всех приложений описана миграциями"""
+
+    def test_models_match_migrations(self):
+        """Тест что изменения моделей не остались без миграции"""
+        out = StringIO()
+        try:
+            call_command(
+                'makemigrations', check=True, dry_run=True, stdout=out)
+        except SystemExit:
+            self.fail(f'Нет миграции для изменений:\n{out.getvalue()}')
+
+
+class AdoptLegacySchemaTest(TestCase):
+    """Тесты перевода базы без миграций на миграции"""
+
+    def forget_migrations(self):
+        records = MigrationRecorder.Migration.objects.filter(
+            app__in=LEGACY_APPS)
+        names = set(records.values_list('app', 'name'))
+        records.delete()
+        return names
+
+    def adopted(self):
+        return set(
+            MigrationRecorder.Migration.objects
+            .filter(app__in=LEGACY_APPS).values_list('app', 'name')
+        )
+
+    def test_existing_schema_is_adopted(self):
+        """Тест что миграции с готовой схемой отмечаются применёнными"""
+        names = self.forget_migrations()
+        out = StringIO()
+        call_command('adopt_legacy_schema', stdout=out)
+        self.assertEqual(self.adopted(), names)
+        self.assertIn(f'Отмечено миграций: {len(names)}', out.getvalue())
+
+    def test_missing_schema_is_left_to_migrate(self):
+        """Тест что миграция без схемы в базе не отмечается"""
+        names = self.forget_migrations()
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX booking_guest_checkout_idx')
+        call_command('adopt_legacy_schema', stdout=StringIO())
+        # Без индекса 0003 не отмечена, а с ней и все следующие
+        missing = {
+            (app, name) for app, name in names
+            if app == 'booking' and name >= '0003'
+        }
+        self.assertEqual(self.adopted(), names - missing)
+
+
+class SharedCacheTest(TestCase):
+    """Тесты проверки общего для процессов кеша"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def file_cache(self):
+        return {
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+            }
+        }
+
+    def local_cache(self):
+        return {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'shared-cache-test',
+            }
+        }
+
+    def test_file_cache_is_shared(self):
+        """Тест что запись в файловый кеш видна второму экземпляру"""
+        with override_settings(CACHES=self.file_cache()):
+            self.assertTrue(cache_is_shared())
+            # Проба удаляется за собой
+            self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_local_cache_is_not_shared(self):
+        """Тест что кеш в памяти процесса не считается общим"""
+        with override_settings(CACHES=self.local_cache()):
+            self.assertFalse(cache_is_shared())
+
+    def test_unreachable_cache_is_not_shared(self):
+        """Тест что кеш, в который не пишется, не считается общим"""
+        with override_settings(CACHES=self.file_cache()):
+            with mock.patch(
+                    'django.core.cache.backends.filebased.FileBasedCache.set',
+                    side_effect=OSError):
+                self.assertFalse(cache_is_shared())
+
+    def test_check_rejects_local_cache(self):
+        """Тест что cached_db и кеш профилей без общего кеша - ошибка"""
+        with override_settings(
+                CACHES=self.local_cache(),
+                SESSION_ENGINE=settings.SESSION_ENGINES['cached_db'],
+                AUTHENTICATION_BACKENDS=[PROFILE_CACHE_BACKEND]):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['hotel.E001'])
+        self.assertIn('SESSION_ENGINE', errors[0].msg)
+        self.assertIn(PROFILE_CACHE_BACKEND, errors[0].msg)
+
+    def test_check_allows_db_sessions(self):
+        """Тест что сессии в БД без кеша профилей не требуют общего кеша"""
+        with override_settings(
+                CACHES=self.local_cache(),
+                SESSION_ENGINE=settings.SESSION_ENGINES['db'],
+                AUTHENTICATION_BACKENDS=[
+                    'django.contrib.auth.backends.ModelBackend']):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_check_allows_shared_cache(self):
+        """Тест что с общим кешем cached_db и кеш профилей допустимы"""
+        with override_settings(
+                CACHES=self.file_cache(),
+                SESSION_ENGINE=settings.SESSION_ENGINES['cached_db'],
+                AUTHENTICATION_BACKENDS=[PROFILE_CACHE_BACKEND]):
+            self.assertEqual(check_shared_cache(None), [])
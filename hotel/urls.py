@@ -19,12 +19,15 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
 
+from hotel.metrics import metrics_view
+
 
 urlpatterns = [
     path('', include('catalog.urls')),
     path('auth/', include('user.urls')),
     path('booking/', include('booking.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,15 @@
+"""URL configuration для ASGI.
+
+Каталог обслуживают async-представления, остальные маршруты общие
+с hotel.urls.
+"""
+from django.urls import include, path
+
+from catalog.urls import async_urlpatterns
+from hotel.urls import urlpatterns as sync_urlpatterns
+
+
+urlpatterns = [
+    path('', include(async_urlpatterns)),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,132 @@
+// Подсказки занятых дат в форме бронирования.
+//
+// Календарь номера приходит масками по месяцам: бит d - 1 - ночь
+// на d-е число. Поле выезда ограничивается первой занятой ночью после
+// заезда, а выбор с занятыми ночами помечается как ошибка формы.
+// Свободные даты сразу удерживаются за гостем до отправки формы,
+// а стоимость проживания обновляется по ответу удержания.
+(function () {
+  'use strict';
+
+  const DAY = 24 * 60 * 60 * 1000;
+  const MAX_STAY_DAYS = 366;
+
+  const form = document.querySelector('form[data-calendar-url]');
+  if (!form || !window.fetch) {
+    return;
+  }
+  const checkIn = form.querySelector('[name="check_in_date"]');
+  const checkOut = form.querySelector('[name="check_out_date"]');
+  const guests = form.querySelector('[name="guest_count"]');
+  const hold = form.querySelector('[name="hold"]');
+  const quote = document.querySelector('[data-quote]');
+  let calendar = null;
+  let holdRequest = 0;
+
+  function parse(value) {
+    return value ? new Date(value + 'T00:00:00Z') : null;
+  }
+
+  function format(day) {
+    return day.toISOString().slice(0, 10);
+  }
+
+  function isBooked(day) {
+    const index = (day.getUTCFullYear() - calendar.year) * 12
+      + day.getUTCMonth() - calendar.month;
+    if (index < 0 || index >= calendar.months.length) {
+      return false;
+    }
+    return ((calendar.months[index] >>> (day.getUTCDate() - 1)) & 1) === 1;
+  }
+
+  function firstBooked(from, to) {
+    for (let time = from.getTime(); time < to.getTime(); time += DAY) {
+      const day = new Date(time);
+      if (isBooked(day)) {
+        return day;
+      }
+    }
+    return null;
+  }
+
+  function validate() {
+    checkIn.setCustomValidity('');
+    checkOut.setCustomValidity('');
+    const from = parse(checkIn.value);
+    if (!calendar || !from) {
+      return;
+    }
+    if (isBooked(from)) {
+      checkIn.setCustomValidity('Номер занят в эту ночь');
+    }
+    const next = new Date(from.getTime() + DAY);
+    const taken = firstBooked(
+      next, new Date(from.getTime() + MAX_STAY_DAYS * DAY));
+    checkOut.min = format(next);
+    // Выезд возможен в день, с которого номер снова занят
+    checkOut.max = taken ? format(taken) : '';
+    const to = parse(checkOut.value);
+    const conflict = to && firstBooked(from, to);
+    if (conflict) {
+      checkOut.setCustomValidity(
+        'Номер занят в ночь на ' + conflict.toLocaleDateString('ru-RU'));
+    }
+  }
+
+  function takeHold() {
+    if (!form.dataset.holdUrl || !checkIn.value || !checkOut.value
+        || !checkIn.validity.valid || !checkOut.validity.valid) {
+      return;
+    }
+    // Ответ на устаревший выбор дат не применяется
+    const request = ++holdRequest;
+    fetch(form.dataset.holdUrl, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: {'X-Requested-With': 'XMLHttpRequest'},
+      credentials: 'same-origin',
+    })
+      .then((response) => response.json().then((data) => [response, data]))
+      .then(([response, data]) => {
+        if (request !== holdRequest) {
+          return;
+        }
+        if (response.status === 201) {
+          hold.value = data.hold;
+          // Сумма считается сервером так же, как при создании брони
+          if (quote) {
+            quote.textContent = data.total + ' ₽ за проживание, ночей: '
+              + data.nights;
+          }
+        } else if (response.status === 409) {
+          checkOut.setCustomValidity(data.error);
+          checkOut.reportValidity();
+        }
+      })
+      .catch(() => {});
+  }
+
+  function changed() {
+    validate();
+    takeHold();
+  }
+
+  fetch(form.dataset.calendarUrl + '?months=' + form.dataset.calendarMonths)
+    .then((response) => (response.ok ? response.json() : null))
+    .then((data) => {
+      if (!data) {
+        return;
+      }
+      const [year, month] = data.start.split('-').map(Number);
+      calendar = {year: year, month: month - 1, months: data.months};
+      validate();
+    })
+    .catch(() => {});
+
+  checkIn.addEventListener('change', changed);
+  checkOut.addEventListener('change', changed);
+  if (guests) {
+    guests.addEventListener('change', takeHold);
+  }
+})();
@@ -0,0 +1,32 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Очередь задач: просмотр и повторный запуск упавших"""
+    list_display = (
+        'name', 'status', 'attempts', 'run_at', 'finished_at', 'worker'
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedup_key')
+    date_hierarchy = 'created_at'
+    list_per_page = 50
+    show_full_result_count = False
+    actions = ('retry_tasks',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Запустить заново')
+    def retry_tasks(self, request, queryset):
+        updated = queryset.filter(status=Task.FAILED).update(
+            status=Task.PENDING, attempts=0, run_at=timezone.now(),
+            finished_at=None,
+        )
+        self.message_user(request, f'Поставлено в очередь задач: {updated}')
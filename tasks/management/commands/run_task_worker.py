@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.caches import cache_is_shared
+from hotel.constants import TASK_POLL_INTERVAL, TASK_WORKER_THREADS
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркер очереди задач: пул потоков выполняет задачи '
+        'из таблицы Task до SIGTERM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=TASK_WORKER_THREADS)
+        parser.add_argument(
+            '--poll-interval', type=float, default=TASK_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, секунды.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        # Маски календаря и версии страниц, которые пишут задачи, должны
+        # попасть в кеш веб-процессов, а не в память воркера
+        if not cache_is_shared():
+            raise CommandError(
+                'Кеш по умолчанию не общий для процессов: настройте в '
+                'CACHES файловый кеш, Redis или Memcached.'
+            )
+        worker = Worker(options['threads'], options['poll_interval'])
+        if not options['burst']:
+            worker.install_signal_handlers()
+        processed = worker.run(burst=options['burst'])
+        self.stdout.write(f'Выполнено задач: {processed}')
@@ -0,0 +1,64 @@
+from django.db import models
+from django.utils import timezone
+
+from hotel.constants import TASK_MAX_ATTEMPTS, TASK_NAME_MAX_LENGTH
+
+
+class Task(models.Model):
+    """Отложенный вызов функции для воркера run_task_worker.
+
+    name - путь к функции, args и kwargs - её аргументы в JSON.
+    Среди ожидающих задач dedup_key уникален: повторная постановка
+    с тем же ключом не создаёт вторую задачу.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Функция', max_length=TASK_NAME_MAX_LENGTH)
+    args = models.JSONField('Аргументы', default=list, blank=True)
+    kwargs = models.JSONField(
+        'Именованные аргументы', default=dict, blank=True)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING)
+    dedup_key = models.CharField(
+        'Ключ дедупликации',
+        max_length=TASK_NAME_MAX_LENGTH,
+        null=True,
+        blank=True,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток', default=TASK_MAX_ATTEMPTS)
+    run_at = models.DateTimeField('Запуск не раньше', default=timezone.now)
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    worker = models.CharField('Воркер', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('-created_at',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('dedup_key',),
+                condition=models.Q(status='pending'),
+                name='unique_pending_task_dedup_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=('status', 'run_at'), name='task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
@@ -0,0 +1,287 @@
+"""Очередь задач в БД без внешнего брокера.
+
+enqueue() записывает задачу в таблицу Task той же БД, что и данные.
+Внутри транзакции задача фиксируется вместе с ними: после отката она
+не выполнится, а после коммита не потеряется. Воркер run_task_worker
+забирает готовые задачи короткой транзакцией и выполняет их в пуле
+потоков.
+
+Взятая задача арендуется на TASK_LEASE_SECONDS: если воркер упал,
+по истечении аренды её заберёт другой. Поэтому задача может
+выполниться повторно и должна быть идемпотентной. Ошибка возвращает
+задачу в очередь с экспоненциальной паузой, после max_attempts
+попыток она остаётся в состоянии failed.
+
+Задачи пишут в кеш по умолчанию то, что читают веб-процессы (маски
+календаря, версии страниц каталога), поэтому run_task_worker
+запускается только с общим для процессов кешем.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from hotel.constants import (
+    TASK_LEASE_SECONDS,
+    TASK_RETRY_BACKOFF,
+    TASK_RETRY_BACKOFF_MAX,
+)
+from hotel.metrics import format_labels, registry
+from hotel.sqlite_profile import immediate_atomic
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+TASKS_PROCESSED = registry.counter(
+    'tasks_processed_total', 'Выполненные задачи по результату.',
+    ('task', 'result'),
+)
+TASK_DURATION = registry.histogram(
+    'task_duration_seconds', 'Время выполнения задачи.', ('task',),
+)
+
+
+def task_name(func):
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def to_json(value):
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def enqueue(func, *args, dedup_key=None, delay=0, max_attempts=None,
+            using='default', **kwargs):
+    """Ставит вызов func(*args, **kwargs) в очередь.
+
+    func - функция уровня модуля или путь к ней, аргументы должны
+    сериализоваться в JSON (даты приходят в задачу строками ISO).
+    Если ожидает задача с тем же dedup_key, новая не создаётся.
+    """
+    task = Task(
+        name=task_name(func),
+        # Аргументы сразу приводятся к JSON, чтобы ошибка типа
+        # возникла у вызывающего, а не в воркере
+        args=to_json(args),
+        kwargs=to_json(kwargs),
+        dedup_key=dedup_key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if max_attempts is not None:
+        task.max_attempts = max_attempts
+    # INSERT ... ON CONFLICT DO NOTHING не прерывает транзакцию
+    # вызывающего при совпадении ключа
+    Task.objects.using(using).bulk_create(
+        [task], ignore_conflicts=dedup_key is not None)
+
+
+def retry_delay(attempts):
+    """Пауза перед попыткой attempts + 1, со случайной долей."""
+    pause = min(
+        TASK_RETRY_BACKOFF * 2 ** (attempts - 1), TASK_RETRY_BACKOFF_MAX)
+    return pause * random.uniform(0.5, 1)
+
+
+def worker_name():
+    return (
+        f'{socket.gethostname()}:{os.getpid()}:'
+        f'{threading.current_thread().name}'
+    )
+
+
+def claim_tasks(limit, worker=None, using='default'):
+    """Забирает до limit готовых задач и арендует их за воркером."""
+    if limit <= 0:
+        return []
+    worker = worker or worker_name()
+    now = timezone.now()
+    connection = transaction.get_connection(using)
+    with immediate_atomic(using=using):
+        due = (
+            Task.objects.using(using)
+            .filter(
+                Q(status=Task.PENDING, run_at__lte=now)
+                # Аренда упавшего воркера истекла
+                | Q(status=Task.RUNNING, locked_until__lte=now)
+            )
+            .order_by('run_at', 'pk')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        tasks = list(due[:limit])
+        if not tasks:
+            return []
+        locked_until = now + timedelta(seconds=TASK_LEASE_SECONDS)
+        Task.objects.using(using).filter(
+            pk__in=[task.pk for task in tasks]
+        ).update(
+            status=Task.RUNNING,
+            locked_until=locked_until,
+            worker=worker,
+            # Попытка засчитывается при взятии: задача, роняющая
+            # воркер, не будет браться бесконечно
+            attempts=F('attempts') + 1,
+        )
+    for task in tasks:
+        task.status = Task.RUNNING
+        task.locked_until = locked_until
+        task.worker = worker
+        task.attempts += 1
+    return tasks
+
+
+def finish_task(task, using='default', **fields):
+    """Записывает итог задачи, если её аренду никто не перехватил."""
+    return Task.objects.using(using).filter(
+        pk=task.pk, status=Task.RUNNING, worker=task.worker,
+    ).update(locked_until=None, **fields)
+
+
+def call_task(task):
+    """Вызывает функцию задачи, возвращает текст ошибки или None."""
+    try:
+        import_string(task.name)(*task.args, **task.kwargs)
+    except Exception:
+        logger.warning(
+            'Задача %s (%s) завершилась ошибкой, попытка %s из %s',
+            task.pk, task.name, task.attempts, task.max_attempts,
+            exc_info=True,
+        )
+        return traceback.format_exc()
+    return None
+
+
+def give_up(task, using='default'):
+    """Проваливает задачу, аренда которой истекала на каждой попытке."""
+    # Воркер падал или зависал на задаче: ещё одна попытка его уронит
+    finish_task(
+        task, using,
+        status=Task.FAILED, finished_at=timezone.now(),
+        last_error='Воркер не завершил ни одной попытки',
+    )
+    TASKS_PROCESSED.inc(task=task.name, result='failed')
+    return False
+
+
+def record_result(task, error, duration, using='default'):
+    """Записывает итог вызова задачи, True при успехе."""
+    if error is None:
+        finish_task(
+            task, using,
+            status=Task.DONE, last_error='', finished_at=timezone.now(),
+        )
+        result = 'done'
+    else:
+        result = retry_or_fail(task, error, using)
+    TASK_DURATION.observe(duration, task=task.name)
+    TASKS_PROCESSED.inc(task=task.name, result=result)
+    return result == 'done'
+
+
+def run_task(task, using='default'):
+    """Выполняет взятую задачу и записывает результат, True при успехе."""
+    if task.attempts > task.max_attempts:
+        return give_up(task, using)
+    started = time.perf_counter()
+    error = call_task(task)
+    return record_result(
+        task, error, time.perf_counter() - started, using)
+
+
+def retry_or_fail(task, error, using='default'):
+    if task.attempts >= task.max_attempts:
+        finish_task(
+            task, using,
+            status=Task.FAILED, last_error=error, finished_at=timezone.now(),
+        )
+        return 'failed'
+    run_at = timezone.now() + timedelta(seconds=retry_delay(task.attempts))
+    try:
+        with transaction.atomic(using=using):
+            finish_task(
+                task, using,
+                status=Task.PENDING, last_error=error, run_at=run_at,
+            )
+    except IntegrityError:
+        # Пока задача выполнялась, поставлена такая же: повтор не нужен
+        Task.objects.using(using).filter(pk=task.pk).delete()
+        return 'superseded'
+    return 'retry'
+
+
+def run_pending_tasks(limit=None, using='default'):
+    """Выполняет готовые задачи в текущем потоке, возвращает их число.
+
+    Для тестов и ручного запуска без воркера.
+    """
+    done = 0
+    while limit is None or done < limit:
+        batch = claim_tasks(
+            100 if limit is None else min(100, limit - done), using=using)
+        if not batch:
+            break
+        for task in batch:
+            run_task(task, using)
+        done += len(batch)
+    return done
+
+
+def purge_finished(before, using='default'):
+    """Удаляет выполненные задачи, завершённые раньше before."""
+    deleted, _ = Task.objects.using(using).filter(
+        status=Task.DONE, finished_at__lt=before).delete()
+    return deleted
+
+
+def queue_stats(now=None, using='default'):
+    """Число задач по состояниям и возраст самой старой готовой."""
+    now = now or timezone.now()
+    counts = dict(
+        Task.objects.using(using).order_by()
+        .values_list('status').annotate(Count('pk'))
+    )
+    oldest = (
+        Task.objects.using(using)
+        .filter(status=Task.PENDING, run_at__lte=now)
+        .aggregate(oldest=Min('run_at'))['oldest']
+    )
+    lag = (now - oldest).total_seconds() if oldest else 0.0
+    return counts, lag
+
+
+def queue_metrics():
+    """Глубина и отставание очереди для /metrics.
+
+    Считаются по БД: воркер работает отдельным процессом.
+    """
+    counts, lag = queue_stats()
+    lines = [
+        '# HELP task_queue_tasks Задачи в таблице по состоянию.',
+        '# TYPE task_queue_tasks gauge',
+    ]
+    for status, _ in Task.STATUSES:
+        labels = format_labels(('status',), (status,))
+        lines.append(f'task_queue_tasks{labels} {counts.get(status, 0)}')
+    lines += [
+        '# HELP task_queue_lag_seconds Ожидание самой старой готовой задачи.',
+        '# TYPE task_queue_lag_seconds gauge',
+        f'task_queue_lag_seconds {lag}',
+    ]
+    return lines
+
+
+registry.add_collector(queue_metrics, cached=True)
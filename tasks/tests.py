@@ -0,0 +1,212 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from hotel.metrics import registry
+from tasks.models import Task
+from tasks.queue import (
+    TASKS_PROCESSED,
+    claim_tasks,
+    enqueue,
+    purge_finished,
+    queue_stats,
+    run_pending_tasks,
+    run_task,
+)
+from tasks.worker import Worker
+
+
+calls = []
+
+
+def record(*args, **kwargs):
+    calls.append((args, kwargs))
+
+
+def fail(message):
+    raise RuntimeError(message)
+
+
+class TaskQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        day = timezone.now().date()
+        enqueue(record, 1, day, flag=True)
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'tasks.tests.record')
+        self.assertEqual(task.status, Task.PENDING)
+
+        self.assertEqual(run_pending_tasks(), 1)
+        # Аргументы проходят через JSON: дата приходит строкой
+        self.assertEqual(calls, [((1, day.isoformat()), {'flag': True})])
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertEqual(task.attempts, 1)
+        self.assertIsNotNone(task.finished_at)
+        self.assertEqual(run_pending_tasks(), 0)
+
+    def test_unserializable_arguments_fail_on_enqueue(self):
+        with self.assertRaises(TypeError):
+            enqueue(record, object())
+        self.assertFalse(Task.objects.exists())
+
+    def test_rolled_back_enqueue_is_discarded(self):
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                enqueue(record, 1)
+                1 / 0
+        self.assertFalse(Task.objects.exists())
+
+    def test_delayed_task_waits(self):
+        enqueue(record, 1, delay=60)
+        self.assertEqual(run_pending_tasks(), 0)
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(run_pending_tasks(), 1)
+
+    def test_pending_duplicates_are_merged(self):
+        for value in range(3):
+            enqueue(record, value, dedup_key='record')
+        self.assertEqual(Task.objects.count(), 1)
+        run_pending_tasks()
+        self.assertEqual(calls, [((0,), {})])
+
+        # Выполненная задача не мешает поставить ключ снова
+        enqueue(record, 3, dedup_key='record')
+        self.assertEqual(
+            Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    def test_failed_task_is_retried_with_backoff(self):
+        enqueue(fail, 'boom', max_attempts=2)
+        with self.assertLogs('tasks.queue', 'WARNING'):
+            self.assertEqual(run_pending_tasks(), 1)
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('RuntimeError: boom', task.last_error)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(run_pending_tasks(), 0)
+
+        Task.objects.update(run_at=timezone.now())
+        before = TASKS_PROCESSED.value(
+            task='tasks.tests.fail', result='failed')
+        with self.assertLogs('tasks.queue', 'WARNING'):
+            run_pending_tasks()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+        self.assertEqual(
+            TASKS_PROCESSED.value(task='tasks.tests.fail', result='failed'),
+            before + 1,
+        )
+
+    def test_retry_superseded_by_new_task(self):
+        enqueue(fail, 'boom', dedup_key='fail')
+        task, = claim_tasks(1)
+        # Пока задача выполнялась, поставлена такая же
+        enqueue(fail, 'boom', dedup_key='fail')
+        with self.assertLogs('tasks.queue', 'WARNING'):
+            self.assertFalse(run_task(task))
+        self.assertFalse(Task.objects.filter(pk=task.pk).exists())
+        self.assertEqual(
+            Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    def test_expired_lease_is_reclaimed(self):
+        enqueue(record, 1)
+        task, = claim_tasks(1, worker='crashed')
+        self.assertEqual(claim_tasks(1), [])
+
+        Task.objects.update(locked_until=timezone.now())
+        reclaimed, = claim_tasks(1, worker='alive')
+        self.assertEqual(reclaimed.pk, task.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        # Упавший воркер не затирает результат нового
+        self.assertTrue(run_task(reclaimed))
+        self.assertTrue(run_task(task))
+        reclaimed.refresh_from_db()
+        self.assertEqual(reclaimed.worker, 'alive')
+
+    def test_task_crashing_worker_gives_up(self):
+        enqueue(record, 1, max_attempts=1)
+        claim_tasks(1, worker='crashed')
+        Task.objects.update(locked_until=timezone.now())
+        task, = claim_tasks(1)
+        self.assertFalse(run_task(task))
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_purge_keeps_failed_tasks(self):
+        enqueue(record, 1)
+        enqueue(fail, 'boom', max_attempts=1)
+        with self.assertLogs('tasks.queue', 'WARNING'):
+            run_pending_tasks()
+        self.assertEqual(purge_finished(timezone.now()), 1)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_metrics(self):
+        enqueue(record, 1)
+        Task.objects.update(run_at=timezone.now() - timedelta(seconds=30))
+        counts, lag = queue_stats()
+        self.assertEqual(counts, {Task.PENDING: 1})
+        self.assertGreaterEqual(lag, 30)
+
+        registry.clear_collected()
+        output = registry.expose()
+        self.assertIn('task_queue_tasks{status="pending"} 1', output)
+        self.assertIn('task_queue_tasks{status="failed"} 0', output)
+        self.assertIn('task_queue_lag_seconds 30.', output)
+
+
+class TaskWorkerTest(TransactionTestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_burst_runs_all_tasks_in_threads(self):
+        for value in range(20):
+            enqueue(record, value)
+        enqueue(fail, 'boom', max_attempts=1)
+        worker = Worker(threads=4, poll_interval=0.01)
+        with self.assertLogs('tasks.queue', 'WARNING'):
+            self.assertEqual(worker.run(burst=True), 21)
+        self.assertEqual(
+            sorted(args[0] for args, _ in calls), list(range(20)))
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 20)
+        self.assertEqual(
+            Task.objects.filter(status=Task.FAILED).count(), 1)
+
+    def test_stop_finishes_started_tasks(self):
+        enqueue(record, 1)
+        worker = Worker(threads=2, poll_interval=0.01)
+        with mock.patch.object(
+                Worker, 'purge', side_effect=worker.stop) as purge:
+            self.assertEqual(worker.run(), 1)
+        purge.assert_called_once()
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_command(self):
+        enqueue(record, 1)
+        out = StringIO()
+        call_command('run_task_worker', '--burst', '--threads=2', stdout=out)
+        self.assertIn('Выполнено задач: 1', out.getvalue())
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+    def test_command_requires_shared_cache(self):
+        enqueue(record, 1)
+        with self.assertRaisesMessage(CommandError, 'не общий'):
+            call_command('run_task_worker', '--burst', stdout=StringIO())
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get().status, Task.PENDING)
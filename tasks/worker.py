@@ -0,0 +1,105 @@
+"""Воркер очереди: пул потоков, забирающий задачи из таблицы Task.
+
+Главный поток забирает задачи по числу свободных потоков и ждёт
+завершения любой из них или паузы опроса. Потоки пула только вызывают
+функции задач, а взятие и итоги задач пишет главный поток: служебные
+записи очереди не спорят друг с другом за единственного писателя
+SQLite. SIGTERM и SIGINT останавливают приём новых задач, начатые
+дорабатывают.
+"""
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from hotel.constants import TASK_DONE_RETENTION_DAYS
+
+from .queue import (
+    call_task,
+    claim_tasks,
+    give_up,
+    purge_finished,
+    record_result,
+    worker_name,
+)
+
+
+# Выполненные задачи чистятся не чаще раза в час
+PURGE_INTERVAL = timedelta(hours=1)
+
+
+class Worker:
+
+    def __init__(self, threads, poll_interval, using='default'):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.using = using
+        self.name = worker_name()
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.purged_at = None
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def install_signal_handlers(self):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.stop)
+
+    def execute(self, task):
+        """Выполняется в потоке пула: (задача, ошибка, длительность)."""
+        started = time.perf_counter()
+        try:
+            return task, call_task(task), time.perf_counter() - started
+        finally:
+            # Поток пула живёт долго, соединение закрывается после задачи
+            connections[self.using].close()
+
+    def submit(self, pool, tasks, running):
+        for task in tasks:
+            if task.attempts > task.max_attempts:
+                give_up(task, self.using)
+            else:
+                running.add(pool.submit(self.execute, task))
+
+    def record(self, finished):
+        for future in finished:
+            record_result(*future.result(), using=self.using)
+
+    def purge(self):
+        now = timezone.now()
+        if self.purged_at and now - self.purged_at < PURGE_INTERVAL:
+            return
+        self.purged_at = now
+        purge_finished(
+            now - timedelta(days=TASK_DONE_RETENTION_DAYS), self.using)
+
+    def run(self, burst=False):
+        """Выполняет задачи до остановки, с burst - пока есть готовые."""
+        running = set()
+        with ThreadPoolExecutor(
+                self.threads, thread_name_prefix='task') as pool:
+            while not self.stopping.is_set():
+                close_old_connections()
+                tasks = claim_tasks(
+                    self.threads - len(running), self.name, self.using)
+                self.submit(pool, tasks, running)
+                self.processed += len(tasks)
+                if not tasks and not running:
+                    if burst:
+                        break
+                    self.purge()
+                    self.stopping.wait(self.poll_interval)
+                elif running:
+                    finished, running = wait(
+                        running, timeout=self.poll_interval,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    self.record(finished)
+            # Итоги задач, дорабатывавших после остановки
+            self.record(wait(running).done)
+        return self.processed
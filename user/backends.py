@@ -0,0 +1,118 @@
+"""Бэкенд аутентификации с кешем профилей в памяти процесса.
+
+Профиль из сессии читается на каждом запросе. Здесь он берётся из
+ограниченного LRU-кеша процесса, а актуальность проверяется по версии
+пользователя в общем кеше Django: сохранение, удаление профиля и выход
+увеличивают версию, и копии во всех процессах перестают читаться.
+Изменения в обход сигналов (update(), bulk_update()) видны через
+PROFILE_CACHE_TIMEOUT.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from hotel.constants import PROFILE_CACHE_SIZE, PROFILE_CACHE_TIMEOUT
+
+
+def profile_version_key(user_id):
+    return f'auth:profile:{user_id}:version'
+
+
+class ProfileCache:
+    """LRU-кеш значений полей профиля по id пользователя.
+
+    Хранятся значения полей, а не сам объект: каждый запрос получает
+    свой экземпляр, и кеши прав или изменения атрибутов одного запроса
+    не видны другим.
+    """
+
+    def __init__(self, max_size=PROFILE_CACHE_SIZE,
+                 timeout=PROFILE_CACHE_TIMEOUT):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+        if entry is None:
+            return None
+        version, expires, db, values = entry
+        if time.monotonic() > expires or (
+                cache.get(profile_version_key(user_id)) != version):
+            self.discard(user_id)
+            return None
+        model = get_user_model()
+        fields = [field.attname for field in model._meta.concrete_fields]
+        return model.from_db(db, fields, values)
+
+    def get_version(self, user_id):
+        key = profile_version_key(user_id)
+        cache.add(key, time.time_ns(), None)
+        return cache.get(key)
+
+    def set(self, profile, version):
+        """Кеширует профиль, прочитанный из БД после get_version().
+
+        Версия берётся до чтения из БД: если профиль изменится между
+        чтением и записью в кеш, запись сразу окажется устаревшей.
+        """
+        if self.max_size <= 0:
+            return
+        values = tuple(
+            getattr(profile, field.attname)
+            for field in profile._meta.concrete_fields
+        )
+        entry = (
+            version, time.monotonic() + self.timeout,
+            profile._state.db, values,
+        )
+        with self._lock:
+            self._entries[profile.pk] = entry
+            self._entries.move_to_end(profile.pk)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def invalidate(self, user_id):
+        """Сбрасывает профиль во всех процессах, работающих с общим кешем."""
+        self.discard(user_id)
+        key = profile_version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+profile_cache = ProfileCache()
+
+
+class CachedProfileBackend(ModelBackend):
+    """ModelBackend, читающий пользователя сессии из profile_cache."""
+
+    def get_user(self, user_id):
+        profile = profile_cache.get(user_id)
+        if profile is not None:
+            return profile
+        version = profile_cache.get_version(user_id)
+        profile = super().get_user(user_id)
+        if profile is not None:
+            profile_cache.set(profile, version)
+        return profile
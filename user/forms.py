@@ -26,34 +26,30 @@ class SignUpForm(UserCreationForm):
             'password2'
         )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.layout = Layout(
-            HTML('<div class="my-form">Регистрация</div>'),
-            Field('email'),
-            Field('first_name'),
-            Field('last_name'),
-            Field('password1'),
-            Field('password2'),
-            ButtonHolder(
-                Submit(
-                    'submit', 'Зарегистрироваться', css_class='button white')
-            )
+    helper = FormHelper()
+    helper.layout = Layout(
+        HTML('<div class="my-form">Регистрация</div>'),
+        Field('email'),
+        Field('first_name'),
+        Field('last_name'),
+        Field('password1'),
+        Field('password2'),
+        ButtonHolder(
+            Submit(
+                'submit', 'Зарегистрироваться', css_class='button white')
         )
+    )
 
 
 class LoginForm(AuthenticationForm):
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.layout = Layout(
-            HTML('<div class="my-form">Вход</div>'),
-            Field('username'),
-            Field('password'),
-            ButtonHolder(
-                Submit(
-                    'submit', 'Войти', css_class='button white')
-            )
+    helper = FormHelper()
+    helper.layout = Layout(
+        HTML('<div class="my-form">Вход</div>'),
+        Field('username'),
+        Field('password'),
+        ButtonHolder(
+            Submit(
+                'submit', 'Войти', css_class='button white')
         )
+    )
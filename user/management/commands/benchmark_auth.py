@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from hotel.benchmarks import Rollback, percentile
+from hotel.queries import QueryRecorder
+from user.backends import profile_cache
+
+
+User = get_user_model()
+
+BACKENDS = {
+    'model': 'django.contrib.auth.backends.ModelBackend',
+    'cached': 'user.backends.CachedProfileBackend',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет стоимость состояния входа для каждого способа хранения '
+        'сессий с кешем профилей и без него: запросы к БД и время '
+        'запроса страницы каталога из кеша страниц, где остаётся '
+        'только чтение сессии и пользователя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=5)
+
+    def handle(self, *args, **options):
+        guest = User.objects.filter(is_active=True).order_by('pk').first()
+        if guest is None:
+            raise CommandError(
+                'Нет пользователей для замеров, сначала запустите seed_data.')
+        self.stdout.write(
+            f"{'сессии':<16}{'профиль':<10}{'SQL':>6}"
+            f"{'p50 мс':>10}{'p95 мс':>10}"
+        )
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        for strategy, engine in settings.SESSION_ENGINES.items():
+            for backend, path in BACKENDS.items():
+                # Сессии и last_login от входа откатываются
+                try:
+                    with override_settings(
+                            ALLOWED_HOSTS=hosts, SESSION_ENGINE=engine,
+                            AUTHENTICATION_BACKENDS=[path]), \
+                            transaction.atomic():
+                        queries, timings = self.run(guest, options)
+                        raise Rollback
+                except Rollback:
+                    pass
+                self.stdout.write(
+                    f'{strategy:<16}{backend:<10}{queries:>6}'
+                    f'{percentile(timings, 50):>10.2f}'
+                    f'{percentile(timings, 95):>10.2f}'
+                )
+
+    def run(self, guest, options):
+        cache.clear()
+        profile_cache.clear()
+        client = Client()
+        client.force_login(guest)
+        url = reverse('rooms')
+        timings = []
+        queries = 0
+        for iteration in range(options['warmup'] + options['iterations']):
+            recorder = QueryRecorder()
+            with recorder.record():
+                started = time.perf_counter()
+                client.get(url)
+                elapsed = time.perf_counter() - started
+            if iteration < options['warmup']:
+                continue
+            timings.append(elapsed * 1000)
+            queries = max(queries, len(recorder))
+        timings.sort()
+        return queries, timings
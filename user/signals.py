@@ -0,0 +1,28 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import profile_cache
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_profile(sender, instance, using='default', **kwargs):
+    # Сразу - чтобы этот процесс не отдал старый профиль, и после
+    # коммита - чтобы параллельный запрос не закешировал его до коммита
+    profile_cache.invalidate(instance.pk)
+    transaction.on_commit(
+        partial(profile_cache.invalidate, instance.pk), using=using)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_profile(sender, request, user, **kwargs):
+    if user is not None:
+        profile_cache.invalidate(user.pk)
@@ -1,9 +1,23 @@
-from django.test import TestCase
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
 from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
 
-from user.forms import SignUpForm
-from hotel.constants import NAME_MAX_LENGTH, EMAIL_MAX_LENGTH
+from booking.models import Booking
+from catalog.models import HotelRoom
+from user.backends import ProfileCache, profile_cache
+from user.forms import LoginForm, SignUpForm
+from hotel.constants import (
+    NAME_MAX_LENGTH,
+    EMAIL_MAX_LENGTH,
+    PROFILE_HISTORY_PAGE_SIZE,
+)
 
 
 User = get_user_model()
@@ -338,3 +352,200 @@ class ProfileModelPropertiesTest(TestCase):
         users = User.objects.all()
         self.assertEqual(users[0], user2)
         self.assertEqual(users[1], user1)
+
+
+class PersonalAccountViewTest(TestCase):
+    """Тесты личного кабинета с большой историей бронирований"""
+
+    bookings = 5_000
+    active = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.user = User.objects.create(
+            email='frequent@example.com',
+            first_name='Частый',
+            last_name='Гость',
+        )
+        room = HotelRoom.objects.create(
+            title='history',
+            max_number_of_guests=2,
+            description='Номер для истории',
+            price=1000,
+            main_img='history/room.jpg',
+        )
+        # Брони без реестра ночей: здесь важна только выборка профиля
+        Booking.objects.bulk_create(
+            Booking(
+                guest=cls.user,
+                room=room,
+                check_in_date=today + timedelta(days=2 * offset),
+                check_out_date=today + timedelta(days=2 * offset + 1),
+                guest_count=1,
+                total_price=1000,
+            )
+            for offset in range(cls.active - cls.bookings, cls.active)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_query_count_does_not_grow_with_history(self):
+        """Тест числа запросов при 5000 бронированиях"""
+        self.client.get(reverse('profile'))
+        # Сессия и пользователь из кеша: страница истории, архив,
+        # активные брони
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(len(response.context['bookings']), self.active)
+        history = response.context['bookings_isnt_active']
+        self.assertEqual(len(history), PROFILE_HISTORY_PAGE_SIZE)
+        self.assertContains(response, 'cursor=')
+
+    def test_history_pages_follow_check_out_date(self):
+        """Тест что страницы истории идут от новых к старым без повторов"""
+        response = self.client.get(reverse('profile'))
+        first = list(response.context['bookings_isnt_active'])
+        page = response.context['page_obj']
+        response = self.client.get(
+            reverse('profile'), {'cursor': page.next_cursor})
+        second = list(response.context['bookings_isnt_active'])
+        dates = [booking.check_out_date for booking in first + second]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertFalse({b.pk for b in first} & {b.pk for b in second})
+        self.assertLess(dates[0], timezone.now().date())
+
+
+class AuthStateCacheTest(TestCase):
+    """Тесты кеша сессий и профилей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='cached@example.com',
+            first_name='Кеш',
+            last_name='Профиля',
+        )
+        cls.user.set_password('SecurePassword123!')
+        cls.user.save()
+
+    def setUp(self):
+        cache.clear()
+        profile_cache.clear()
+        self.client.force_login(self.user)
+
+    def test_warm_request_has_no_auth_queries(self):
+        """Тест что сессия и пользователь не читаются из БД повторно"""
+        self.client.get(reverse('rooms'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('rooms'))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_profile_change_is_visible(self):
+        """Тест сброса кеша при изменении профиля"""
+        self.client.get(reverse('rooms'))
+        self.user.first_name = 'Новое'
+        self.user.save()
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.wsgi_request.user.first_name, 'Новое')
+
+    def test_password_change_ends_other_sessions(self):
+        """Тест что смена пароля завершает сессию с кешированным профилем"""
+        self.client.get(reverse('profile'))
+        self.user.set_password('AnotherPassword456!')
+        self.user.save()
+        response = self.client.get(reverse('profile'))
+        self.assertRedirects(
+            response, '/auth/login/?next=/auth/profile/',
+            fetch_redirect_response=False)
+
+    @override_settings(QUERY_BUDGET_ENFORCE=True)
+    def test_profile_fits_query_budget(self):
+        """Тест бюджета запросов профиля после входа и смены пароля"""
+        client = Client()
+        client.post(reverse('login'), {
+            'username': 'cached@example.com',
+            'password': 'SecurePassword123!',
+        })
+        self.assertEqual(client.get(reverse('profile')).status_code, 200)
+        self.user.set_password('AnotherPassword456!')
+        self.user.save()
+        sessions = Session.objects.count()
+        response = client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 302)
+        # Сброшенная сессия не создаётся заново ради закрепления
+        # за primary
+        self.assertEqual(Session.objects.count(), sessions - 1)
+
+    def test_logout_drops_cached_profile(self):
+        """Тест что выход удаляет профиль из кеша"""
+        self.client.get(reverse('rooms'))
+        self.assertEqual(len(profile_cache), 1)
+        self.client.post(reverse('logout'))
+        self.assertIsNone(profile_cache.get(self.user.pk))
+
+    def test_cache_is_bounded(self):
+        """Тест вытеснения давно не используемых профилей"""
+        profiles = ProfileCache(max_size=2)
+        users = [self.user] + [
+            User.objects.create(email=f'lru{number}@example.com')
+            for number in range(2)
+        ]
+        for user in users:
+            profiles.set(user, profiles.get_version(user.pk))
+        self.assertEqual(len(profiles), 2)
+        self.assertIsNone(profiles.get(self.user.pk))
+        cached = profiles.get(users[-1].pk)
+        self.assertEqual(cached.email, users[-1].email)
+        self.assertIsNot(cached, profiles.get(users[-1].pk))
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        """Тест входа с сессией в подписанной куке"""
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('rooms'))
+        with self.assertNumQueries(0):
+            response = client.get(reverse('rooms'))
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        self.assertEqual(client.get(reverse('profile')).status_code, 200)
+
+
+class CachedFormRenderingTest(TestCase):
+    """Тесты общего helper и кеша разметки форм"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_helper_is_shared_between_instances(self):
+        """Тест что FormHelper создаётся один раз на класс"""
+        self.assertIs(SignUpForm().helper, SignUpForm().helper)
+        self.assertIs(LoginForm().helper, LoginForm().helper)
+
+    def test_cached_form_keeps_csrf_working(self):
+        """Тест входа через форму из кеша при проверке CSRF"""
+        user = User.objects.create(email='csrf@example.com')
+        user.set_password('SecurePassword123!')
+        user.save()
+        for _ in range(2):
+            client = Client(enforce_csrf_checks=True)
+            page = client.get(reverse('login'))
+            token = re.search(
+                r'name="csrfmiddlewaretoken" value="([^"]+)"',
+                page.content.decode()).group(1)
+            response = client.post(reverse('login'), {
+                'username': 'csrf@example.com',
+                'password': 'SecurePassword123!',
+                'csrfmiddlewaretoken': token,
+            })
+            self.assertEqual(response.status_code, 302)
+
+    def test_bound_form_renders_errors(self):
+        """Тест что форма с ошибками не берётся из кеша"""
+        self.client.get(reverse('signup'))
+        response = self.client.post(reverse('signup'), {
+            'email': 'not-an-email'})
+        self.assertContains(response, 'not-an-email')
+        self.assertContains(response, 'invalid-feedback')
@@ -3,12 +3,15 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import (
     CreateView,
-    DetailView,
+    ListView,
 )
 from django.urls import reverse_lazy
 from django.utils import timezone
 
 from .forms import SignUpForm, LoginForm
+from hotel.constants import PROFILE_HISTORY_PAGE_SIZE
+from hotel.db_router import ReplicaReadsMixin
+from hotel.pagination import CursorPaginationMixin, MergedCursorPaginator
 
 
 User = get_user_model()
@@ -28,22 +31,39 @@ class ProfileLogoutView(LogoutView):
     pass
 
 
-class PersonalAccountView(LoginRequiredMixin, DetailView):
-    context_object_name = 'user'
+class PersonalAccountView(LoginRequiredMixin, ReplicaReadsMixin,
+                          CursorPaginationMixin, ListView):
+    """Профиль с активными бронями и постраничной историей.
+
+    Активные брони выбираются одним запросом, страница истории - по
+    запросу к рабочей и к архивной таблице броней, все с
+    select_related('room'). Общей выборки нет: активных броней может
+    быть сколько угодно, а история листается по ключу (дата выезда, pk)
+    с LIMIT в каждой таблице, и её строки сливает MergedCursorPaginator.
+    Так страница не зависит от длины истории и размера архива.
+    """
+
+    template_name = 'user/profile_detail.html'
+    context_object_name = 'bookings_isnt_active'
     login_url = '/auth/login/'
+    paginate_by = PROFILE_HISTORY_PAGE_SIZE
+    cursor_ordering = ('-check_out_date', '-pk')
+
+    def get_bookings(self):
+        return self.request.user.bookings.select_related('room')
+
+    def get_queryset(self):
+        return self.get_bookings().filter(
+            check_out_date__lt=timezone.now().date())
+
+    def get_cursor_paginator(self, queryset, page_size):
+        archived = self.request.user.archived_bookings.select_related('room')
+        return MergedCursorPaginator(
+            [queryset, archived], page_size, self.cursor_ordering)
 
-    def get_object(self):
-        return User.objects.prefetch_related(
-            'bookings',
-            'bookings__room').get(id=self.request.user.id)
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        today = timezone.now().date()
-        context['bookings'] = self.request.user.bookings.filter(
-            check_out_date__gte=today
-        )
-        context['bookings_isnt_active'] = self.request.user.bookings.filter(
-            check_out_date__lt=today
-        )
+        context['bookings'] = self.get_bookings().filter(
+            check_out_date__gte=timezone.now().date()
+        ).order_by('check_in_date', 'pk')
         return context